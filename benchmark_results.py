@@ -0,0 +1,535 @@
+#!/usr/bin/env python3
+
+# Script to benchmark the processing of benchmark results
+
+# Copyright (C) 2020 Embecosm Limited
+#
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Benchmark the embres result processing pipeline
+
+Synthetic corpora of results are generated, modelled on the files in the
+results directory, but with varied architectures, clock rates and sets of
+benchmarks. Every file is valid against the schema, with scores consistent
+with its detailed results. Corpora are kept in the work directory, so they
+need only be generated once.
+
+Each phase of the pipeline (enumerate, parse, validate, sort, render tables
+and render details) is timed for each corpus in a fresh process, so the peak
+memory of each can be recorded. Results can be saved as a baseline, and later
+runs compared against it.
+
+The start up time of process_results.py is also measured, both to print its
+help and to process a single results file, since it is run many times for
+quick previews. This is held to a budget, as a multiple of the time to start
+Python itself, so that it does not depend on the speed of the machine.
+
+Finally, the results selected with --top are checked against the start of
+each full ordering, with some of the results having no speed score.
+"""
+
+# System packages
+import argparse
+import io
+import json
+import math
+import os
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Local packages
+import embres
+from embres.data import Result, ResultDetails
+from embres.writer import BufferedWriter
+
+# The phases we time, in order
+PHASES = [
+    'enumerate',
+    'parse',
+    'validate',
+    'sort',
+    'render tables',
+    'render details',
+]
+
+# The invocations of process_results.py whose start up time we measure
+STARTUP = ['help', 'single file']
+
+# Architecture families to spread the synthetic results across
+ARCHS = ['ARC', 'Arm', 'MIPS', 'RV32', 'RV64', 'x86', 'Xtensa']
+
+# Nominal clock rates to choose from
+CLOCKS = [1, 16, 32, 48, 64, 100, 160, 200, 480]
+
+
+def build_parser(rootdir):
+    """
+    Build a parser for all the arguments
+    """
+    parser = argparse.ArgumentParser(
+        description='Benchmark the processing of benchmark results'
+    )
+
+    parser.add_argument(
+        '--sizes',
+        type=str,
+        default='1000,10000,100000',
+        help='Comma separated list of the number of results in each corpus',
+    )
+    parser.add_argument(
+        '--workdir',
+        type=str,
+        default=os.path.join(tempfile.gettempdir(), 'embres-bench'),
+        help='Directory in which to hold corpora and generated output',
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=1,
+        help='Seed for generating the synthetic corpora',
+    )
+    parser.add_argument(
+        '--baseline',
+        type=str,
+        default=os.path.join(rootdir, 'benchmark-baseline.json'),
+        help='File holding the baseline against which to compare',
+    )
+    parser.add_argument(
+        '--save-baseline',
+        action='store_true',
+        help='Save the results of this run as the baseline',
+    )
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=0.25,
+        help='Relative slow down from the baseline treated as a regression',
+    )
+    parser.add_argument(
+        '--check',
+        action='store_true',
+        help='Exit with an error if any phase has regressed, or start up is ' +
+        'over budget',
+    )
+    parser.add_argument(
+        '--startup-runs',
+        type=int,
+        default=20,
+        help='Number of runs over which to take the median start up time, ' +
+        '0 to not measure start up',
+    )
+    parser.add_argument(
+        '--startup-budget',
+        type=float,
+        default=5.0,
+        help='Most time process_results.py may take to start up, as a ' +
+        'multiple of the time to start Python',
+    )
+    parser.add_argument(
+        '--measure',
+        type=str,
+        default=None,
+        help=argparse.SUPPRESS,
+    )
+
+    return parser
+
+
+def geo_stats(vals):
+    """
+    Geometric mean and geometric standard deviation of a list of values,
+    computed as the Embench scripts do, rounded as in the results files.
+    """
+    logs = [math.log(val) for val in vals]
+    mean = sum(logs) / len(logs)
+    var = sum((val - mean) ** 2 for val in logs) / len(logs)
+    return round(math.exp(mean), 2), round(math.exp(math.sqrt(var)), 2)
+
+
+def synthesize(rng, idx, template):
+    """
+    Create a synthetic result, modelled on the supplied template.
+    """
+    json_data = json.loads(json.dumps(template))
+    arch = rng.choice(ARCHS)
+    mhz = rng.choice(CLOCKS)
+
+    json_data['description'] = f'{arch} synthetic result {idx}'
+    json_data['architecture family'] = arch
+    json_data['date/time'] = time.strftime(
+        '%Y-%m-%d %H:%M:%S+00:00',
+        time.gmtime(1546300800 + rng.randrange(2 * 365 * 86400))
+    )
+    pinfo = json_data['platform information']
+    pinfo['nominal clock rate (MHz)'] = mhz
+    pinfo['processor version'] = f'synthetic {rng.randrange(100)}'
+
+    # Choose a subset of the benchmarks, plus perhaps some new ones
+    benchmarks = list(
+        template['absolute size results']['detailed results']
+    )
+    benchmarks = rng.sample(
+        benchmarks, rng.randint(len(benchmarks) // 2, len(benchmarks))
+    )
+    benchmarks.extend(
+        f'synthetic-{num}' for num in range(rng.randrange(6))
+    )
+
+    for kind in ['size', 'speed']:
+        tabs = template[f'absolute {kind} results']['detailed results']
+        trel = template[f'relative {kind} results']['detailed results']
+        absres = dict()
+        relres = dict()
+        for bench in benchmarks:
+            factor = rng.lognormvariate(0.0, 0.2)
+            absval = tabs.get(bench, rng.randint(500, 10000))
+            relval = trel.get(bench, rng.uniform(0.5, 2.0))
+            absres[bench] = max(1, round(absval * factor))
+            if kind == 'size':
+                relres[bench] = max(0.01, round(relval * factor, 2))
+            else:
+                relres[bench] = max(0.01, round(relval / factor, 2))
+
+        geomean, geosd = geo_stats(list(relres.values()))
+        json_data[f'absolute {kind} results'] = {'detailed results': absres}
+        json_data[f'relative {kind} results'] = {
+            'detailed results': relres,
+            'geometric mean': geomean,
+            'geometric standard deviation': geosd,
+        }
+
+    return json_data
+
+
+def generate_corpus(rootdir, corpusdir, count, seed):
+    """
+    Generate a corpus of count results in corpusdir, unless it already
+    exists. A marker file records a complete corpus.
+    """
+    marker = os.path.join(corpusdir, '.complete')
+    try:
+        with open(marker) as fileh:
+            if json.load(fileh) == {'count': count, 'seed': seed}:
+                return
+    except (OSError, ValueError):
+        pass
+
+    print(f'Generating corpus of {count} results in {corpusdir}')
+    os.makedirs(corpusdir, exist_ok=True)
+    for name in os.listdir(corpusdir):
+        os.remove(os.path.join(corpusdir, name))
+
+    resdir = os.path.join(rootdir, 'results')
+    templates = []
+    for name in sorted(os.listdir(resdir)):
+        if name.endswith('.json'):
+            with open(os.path.join(resdir, name)) as fileh:
+                templates.append(json.load(fileh))
+
+    rng = random.Random(seed)
+    for idx in range(count):
+        json_data = synthesize(rng, idx, rng.choice(templates))
+        resf = os.path.join(corpusdir, f'synth-{idx:06}.json')
+        with open(resf, 'w') as fileh:
+            json.dump(json_data, fileh, indent=1)
+
+    with open(marker, 'w') as fileh:
+        json.dump({'count': count, 'seed': seed}, fileh)
+
+
+def measure(rootdir, corpusdir, outdir):
+    """
+    Time each phase of the pipeline on the corpus in corpusdir, writing any
+    output to outdir. Returns a dictionary of the measurements.
+    """
+    log = embres.Logger(os.path.join(outdir, 'logs'), 'bench')
+    absdetailsdir = os.path.join(outdir, 'details')
+    os.makedirs(absdetailsdir, exist_ok=True)
+    timings = dict()
+
+    start = time.perf_counter()
+    filelist = embres.ResultSet.collate_files(rootdir, log, corpusdir, [])
+    timings['enumerate'] = time.perf_counter() - start
+
+    # Parse and validate each file in turn, timing each separately.
+    results = []
+    timings['parse'] = 0.0
+    timings['validate'] = 0.0
+    for resf in filelist:
+        start = time.perf_counter()
+        json_data = ResultDetails(resf).json_data()
+        parsed = time.perf_counter()
+        Result.validate(json_data)
+        results.append(Result(resf, Result.summarize(json_data)))
+        timings['parse'] += parsed - start
+        timings['validate'] += time.perf_counter() - parsed
+
+    reslist = embres.ResultSet.from_results(results)
+    readme = embres.Readme(
+        io.StringIO('== Benchmark ==\n'),
+        BufferedWriter(os.path.join(outdir, 'README.mediawiki')),
+        absdetailsdir,
+        'details'
+    )
+
+    start = time.perf_counter()
+    perms = reslist.rankings([table[1:] for table in readme.TABLES])
+    timings['sort'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    readme.write_header()
+    for (title, _, _, _), perm in zip(readme.TABLES, perms):
+        readme.write_table(title, reslist, perm)
+    readme.close()
+    timings['render tables'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    readme.write_all_details(reslist)
+    timings['render details'] = time.perf_counter() - start
+
+    # Everything in files per second, and the peak memory
+    files = len(filelist)
+    return {
+        'files': files,
+        'phases': {
+            phase: {
+                'seconds': secs,
+                'files per second': files / secs if secs else None,
+            }
+            for phase, secs in timings.items()
+        },
+        'peak rss (kB)': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def check_top(corpusdir, count=50, top=(3, 50)):
+    """
+    Check that TopRankings selects the same results, in the same order, as
+    the start of each ordering of the README tables from ResultSet.rankings
+    (or of each architecture family's part of it), for each number of
+    results in top. The first count results in corpusdir are used, every
+    fifth without its speed score. Returns True if so.
+    """
+    names = sorted(name for name in os.listdir(corpusdir)
+                   if name.endswith('.json'))[:count]
+    results = []
+    for idx, name in enumerate(names):
+        res = Result(os.path.join(corpusdir, name))
+        if idx % 5 == 0:
+            desc, arch, version, mhz, size, _, date_time = res.summary()
+            res = Result(res.details().resfile(),
+                         (desc, arch, version, mhz, size, None, date_time))
+        results.append(res)
+
+    orderings = [table[1:] for table in embres.Readme.TABLES]
+    perms = embres.ResultSet.from_results(results).rankings(orderings)
+    for num in top:
+        ranking = embres.TopRankings(orderings, num)
+        for res in results:
+            ranking.add(res)
+        selected, top_perms = ranking.result_set()
+
+        for (_, _, by_arch), perm, top_perm in zip(orderings, perms,
+                                                   top_perms):
+            listed = dict()
+            expected = []
+            for idx in perm:
+                group = results[idx].arch() if by_arch else None
+                listed[group] = listed.get(group, 0) + 1
+                if listed[group] <= num:
+                    expected.append(results[idx])
+
+            if [selected.results()[idx] for idx in top_perm] != expected:
+                return False
+
+    return True
+
+
+def run_one(corpusdir, workdir):
+    """
+    Measure the corpus in corpusdir in a fresh process, so that peak memory
+    is for this corpus alone. The measurement is the last line of output.
+    """
+    outdir = os.path.join(workdir, 'output')
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--measure', corpusdir,
+         '--workdir', outdir],
+        stdout=subprocess.PIPE, check=True, universal_newlines=True
+    )
+    return json.loads(proc.stdout.splitlines()[-1])
+
+
+def measure_startup(rootdir, workdir, runs):
+    """
+    Time process_results.py printing its help and processing a single
+    results file, each the median of runs fresh processes. A copy of the
+    script is run in the work directory, so it does not replace our README.
+    Returns a dictionary of the times in seconds, with the time to start
+    Python doing nothing as 'python'.
+    """
+    scratchdir = os.path.join(workdir, 'startup')
+    os.makedirs(scratchdir, exist_ok=True)
+    for name in ['process_results.py', 'README-header.mediawiki']:
+        shutil.copy(os.path.join(rootdir, name), scratchdir)
+
+    resdir = os.path.join(rootdir, 'results')
+    resfile = min(name for name in os.listdir(resdir)
+                  if name.endswith('.json'))
+    script = os.path.join(scratchdir, 'process_results.py')
+    commands = {
+        'python': [sys.executable, '-c', 'pass'],
+        'help': [sys.executable, script, '--help'],
+        'single file': [sys.executable, script, '--resdir', resdir, resfile],
+    }
+
+    # The copy of the script must still find our embres package
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [rootdir] + [path for path in [env.get('PYTHONPATH')] if path]
+    )
+
+    times = dict()
+    for name, cmd in commands.items():
+        secs = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run(cmd, stdout=subprocess.DEVNULL, env=env,
+                           check=True)
+            secs.append(time.perf_counter() - start)
+        times[name] = statistics.median(secs)
+
+    return times
+
+
+def report_startup(times, baseline, tolerance, budget):
+    """
+    Print the start up times, compared against the baseline if we have one.
+    Returns True if any is slower than the baseline by more than the
+    tolerance, or takes more than budget times as long as starting Python.
+    """
+    regressed = False
+    print(f'\nStart up of process_results.py, Python itself ' +
+          f'{times["python"] * 1000:.1f} ms')
+    print(f'  {"Invocation":16} {"ms":>10} {"x Python":>10} ' +
+          f'{"vs baseline":>12}')
+    for name in STARTUP:
+        multiple = times[name] / times['python']
+        cmp = ''
+        if baseline and baseline.get(name):
+            ratio = times[name] / baseline[name]
+            cmp = f'{ratio:11.2f}x'
+            if ratio > 1.0 + tolerance:
+                cmp += ' REGRESSION'
+                regressed = True
+        if multiple > budget:
+            cmp += f' OVER BUDGET ({budget:.1f}x)'
+            regressed = True
+        print(f'  {name:16} {times[name] * 1000:10.1f} {multiple:9.2f}x ' +
+              f'{cmp}')
+
+    return regressed
+
+
+def report(runs, baseline, tolerance):
+    """
+    Print the measurements of each run, compared against the baseline if we
+    have one. Returns True if any phase is slower than the baseline by more
+    than the tolerance.
+    """
+    regressed = False
+    for size, run in runs.items():
+        base = baseline.get(size) if baseline else None
+        print(f'\n{run["files"]} results, ' +
+              f'peak RSS {run["peak rss (kB)"] / 1024:.1f} MiB')
+        print(f'  {"Phase":16} {"Seconds":>10} {"Files/s":>12} ' +
+              f'{"vs baseline":>12}')
+        for phase in PHASES:
+            secs = run['phases'][phase]['seconds']
+            rate = run['phases'][phase]['files per second']
+            rate = f'{rate:12.0f}' if rate else f'{"-":>12}'
+            cmp = ''
+            if base and base['phases'][phase]['seconds']:
+                ratio = secs / base['phases'][phase]['seconds']
+                cmp = f'{ratio:11.2f}x'
+                if ratio > 1.0 + tolerance:
+                    cmp += ' REGRESSION'
+                    regressed = True
+            print(f'  {phase:16} {secs:10.3f} {rate} {cmp}')
+
+    return regressed
+
+
+def main():
+    """
+    Main program to drive benchmarking.
+    """
+    rootdir = os.path.abspath(os.path.dirname(__file__))
+    args = build_parser(rootdir).parse_args()
+
+    # In a child process just measuring one corpus
+    if args.measure:
+        print(json.dumps(measure(rootdir, args.measure, args.workdir)))
+        return 0
+
+    try:
+        sizes = [int(size) for size in args.sizes.split(',')]
+    except ValueError:
+        print(f'ERROR: Invalid corpus sizes {args.sizes}')
+        return 1
+
+    runs = dict()
+    for size in sizes:
+        corpusdir = os.path.join(args.workdir, f'corpus-{size}')
+        generate_corpus(rootdir, corpusdir, size, args.seed)
+        runs[str(size)] = run_one(corpusdir, args.workdir)
+
+    startup = None
+    if args.startup_runs > 0:
+        startup = measure_startup(rootdir, args.workdir, args.startup_runs)
+
+    baseline = dict()
+    try:
+        with open(args.baseline) as fileh:
+            baseline = json.load(fileh)
+    except (OSError, ValueError):
+        pass
+
+    regressed = report(runs, baseline.get('runs'), args.tolerance)
+    if not check_top(os.path.join(args.workdir, f'corpus-{sizes[0]}')):
+        print('\nERROR: Results selected with --top differ from the full ' +
+              'orderings')
+        regressed = True
+
+    if startup:
+        regressed = report_startup(
+            startup, baseline.get('startup'), args.tolerance,
+            args.startup_budget
+        ) or regressed
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as fileh:
+            json.dump({'python': sys.version, 'runs': runs,
+                       'startup': startup}, fileh, indent=1)
+        print(f'\nBaseline saved to {args.baseline}')
+
+    if args.check and regressed:
+        return 1
+
+    return 0
+
+
+# Make sure we have new enough Python and only run if this is the main package
+embres.check_python_version(3, 7)
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+
+# Script to compare new benchmark results with all results
+
+# Copyright (C) 2020 Embecosm Limited
+#
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Compare new Embench benchmark results with all results
+
+Each new results file is validated exactly as when collating results, and
+its scores are ranked against a summary of the scores of all results (see
+embres.CorpusSummary), written by process_results.py --summary. Only the
+new files are read, so this takes milliseconds however many results there
+are. For example
+
+  ./process_results.py --summary summary
+  ./compare_results.py --baseline ri5cy-rv32imc-gcc-9.2-o2.json \\
+      --max-regression 2 new-result.json
+
+With --baseline, each score and benchmark is compared with that result, and
+with --max-regression, the exit status is 1 if any is worse by more than
+that percentage. The exit status is also 1 if any new results file is not
+valid.
+"""
+
+# System packages
+import os.path
+import sys
+
+# Local packages
+import embres
+
+# For each score compared with the baseline, the block of detailed results
+# it comes from, and whether larger is better.
+BLOCKS = {
+    'Size': ('relative size results', False),
+    'Speed/MHz': ('relative speed results', True),
+}
+
+
+def read_results(rootdir, log, arglist, resfiles, validation):
+    """
+    Read and validate the supplied results files, recording any which are
+    not valid in the supplied ValidationReport. Returns the list of valid
+    results.
+    """
+    return list(embres.ResultSet.stream(
+        rootdir, log, arglist['absresdir'], resfiles, report=validation
+    ))
+
+
+def show_ranks(log, summary, res):
+    """
+    Show the rank of each score of the supplied result against all results,
+    and against all results of its architecture family.
+    """
+    rows = []
+    for score in embres.CorpusSummary.SCORES:
+        if not res.scores()[score]:
+            continue
+
+        value = res.scores()[score].geomean()
+        row = [score, f'{value:.2f}']
+        for arch in [None, res.arch()]:
+            rank, total, percentile = summary.rank(score, value, arch)
+            row.append(f'{rank} of {total}')
+            row.append(None if percentile is None else f'{percentile:.1f}')
+
+        rows.append(row)
+
+    log.table(['Score', 'Value', 'Rank', 'Percentile',
+               f'Rank in {res.arch()}', f'Percentile in {res.arch()}'], rows)
+
+
+def compare(log, res, baseline, max_regression):
+    """
+    Show the change in each score and benchmark of the supplied result from
+    the supplied baseline result, marking those worse by more than
+    max_regression percent, if supplied.
+
+    Returns the number of regressions.
+    """
+    json_data = res.details().json_data()
+    base_data = baseline.details().json_data()
+
+    rows = []
+    regressions = 0
+    for score, (block, larger) in BLOCKS.items():
+        pairs = []
+        if res.scores()[score] and baseline.scores()[score]:
+            pairs.append(('geometric mean', baseline.scores()[score].geomean(),
+                          res.scores()[score].geomean()))
+
+        results = json_data.get(block, {}).get('detailed results', {})
+        base_results = base_data.get(block, {}).get('detailed results', {})
+        pairs.extend((bench, base_results[bench], val)
+                     for bench, val in results.items()
+                     if bench in base_results)
+
+        for bench, base, val in pairs:
+            if not (isinstance(base, (int, float)) and base > 0 and
+                    isinstance(val, (int, float))):
+                continue
+
+            change = (val / base - 1) * 100
+            worse = -change if larger else change
+            regressed = max_regression is not None and worse > max_regression
+            regressions += regressed
+            rows.append([score, bench, f'{base:.2f}', f'{val:.2f}',
+                         f'{change:+.1f}',
+                         'REGRESSION' if regressed else None])
+
+    log.table(['Score', 'Benchmark', 'Baseline', 'New', 'Change %', ''],
+              rows)
+    return regressions
+
+
+def main():
+    """
+    Main program to drive comparing new results.
+    """
+    # Parse the arguments, set up logging and then validate the arguments
+    rootdir = os.path.abspath(os.path.dirname(__file__))
+    args = embres.Args(rootdir, 'compare')
+    log = embres.Logger(args.abslogdir(), 'compare')
+    arglist = args.all_args(log)
+    args.log_args(log)
+
+    summary = embres.CorpusSummary(arglist['abssummarydir'])
+    try:
+        log.debug(f'Summary of {summary.results()} results')
+    except (OSError, ValueError) as ex:
+        log.error(f'ERROR: Unable to read summary of results: {ex}: ' +
+                  f'exiting')
+        sys.exit(1)
+
+    baseline = None
+    if arglist['baseline']:
+        baselines = read_results(rootdir, log, arglist, [arglist['baseline']],
+                                 embres.ValidationReport())
+        if not baselines:
+            log.error(f'ERROR: Baseline result {arglist["baseline"]} is ' +
+                      f'not valid: exiting')
+            sys.exit(1)
+
+        baseline = baselines[0]
+
+    validation = embres.ValidationReport()
+    results = read_results(rootdir, log, arglist, arglist['resfiles'],
+                           validation)
+    try:
+        validation.report(log, arglist['validation_report'])
+    except OSError as osex:
+        log.warning(f'Warning: Unable to write validation report: {osex}')
+
+    regressions = 0
+    for res in results:
+        log.info('')
+        log.info(f'{res.details().resfile()}: {res.desc()}')
+        log.info('')
+        show_ranks(log, summary, res)
+        if baseline:
+            log.info('')
+            regressions += compare(log, res, baseline,
+                                   arglist['max_regression'])
+
+    if regressions:
+        log.info('')
+        log.error(f'ERROR: {regressions} regressions from ' +
+                  f'{baseline.details().resfile()}')
+
+    if regressions or validation.failures() or not results:
+        return 1
+
+    return 0
+
+
+# Make sure we have new enough Python and only run if this is the main package
+embres.check_python_version(3, 7)
+if __name__ == '__main__':
+    sys.exit(main())
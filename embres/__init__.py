@@ -13,10 +13,59 @@
 """
 Import the classes from the embres package. Only the classes we expose to the
 outside world.
+
+Each class is only imported the first time it is used (as embres.ResultSet
+etc), so a script pays only for the modules it needs. In particular
+printing the help needs nothing beyond Args. check_python_version is
+imported straight away, since it must work with any version of Python.
 """
 
-from embres.args import Args
-from embres.data import ResultSet
-from embres.logger import Logger
-from embres.readme import Readme
+# System packages
+from importlib import import_module
+
+# Local packages
 from embres.utils import check_python_version
+
+# The module defining each class we expose
+_MODULES = {
+    'Aggregation': 'embres.aggregate',
+    'Args': 'embres.args',
+    'ResultCache': 'embres.cache',
+    'CsvExport': 'embres.csvexport',
+    'ResultSet': 'embres.data',
+    'ColumnarExport': 'embres.export',
+    'ColumnStore': 'embres.export',
+    'CorpusSummary': 'embres.summary',
+    'ResultFilter': 'embres.filters',
+    'ResultIndex': 'embres.index',
+    'Logger': 'embres.logger',
+    'TopRankings': 'embres.ranking',
+    'Readme': 'embres.readme',
+    'ValidationReport': 'embres.schema',
+    'ScoreMatrix': 'embres.scoring',
+    'Profiler': 'embres.timing',
+    'TrendStore': 'embres.trend',
+    'ResultWatcher': 'embres.watch',
+}
+
+__all__ = sorted(list(_MODULES) + ['check_python_version'])
+
+
+def __getattr__(name):
+    """
+    Import a class we expose the first time it is used. It is then held
+    in the package, so this is only called once for each class.
+    """
+    if name not in _MODULES:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    val = getattr(import_module(_MODULES[name]), name)
+    globals()[name] = val
+    return val
+
+
+def __dir__():
+    """
+    The names in the package, including classes not yet imported.
+    """
+    return sorted(set(globals()) | set(__all__))
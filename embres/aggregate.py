@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+
+# Module to combine repeated runs as part of the embres package
+
+# Copyright (C) 2020 Embecosm Limited
+#
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Module to combine repeated runs of the same configuration into a single
+result, so that the README and details pages grow with the number of
+configurations, rather than the number of runs.
+
+Results are grouped by the values of a list of fields identifying their
+configuration, by default the architecture family, processor version,
+nominal clock rate and tool chain versions and flags. Each group of several
+runs becomes a single result, whose value for each benchmark is the
+geometric mean of its values in the runs, and whose scores are computed
+afresh from those values. The number of runs, and the spread of the runs,
+both of their scores and of each benchmark, are recorded with the result,
+so they are shown on its details page. A configuration with a single run
+keeps its original result.
+
+The per benchmark values of every result are gathered in one pass into a
+ScoreMatrix, so each group is combined a column at a time, and no file is
+read again except for the first run of each group, whose other fields are
+used for the combined result.
+
+A combined result has no file of its own. Its JSON data is held in memory,
+and it is named after the details page of its first run (see
+embres.utils.is_aggregate).
+"""
+
+# System packages
+import json
+import math
+import os
+
+# Local packages
+from embres.data import Result, ResultDetails
+from embres.scoring import ScoreMatrix
+from embres.utils import AGGREGATE_SUFFIX
+
+
+class Aggregation:
+    """
+    A class to combine the results of repeated runs of the same
+    configuration
+    """
+    # The fields identifying a configuration. Each is the name of a field of
+    # the JSON data, with the names of nested fields separated by ': ', as
+    # in the report of results which are not valid.
+    IDENTITY = [
+        'architecture family',
+        'platform information: processor version',
+        'platform information: nominal clock rate (MHz)',
+        'tool chain information: tool chain version',
+        'tool chain information: tool chain flags',
+    ]
+
+    # The blocks of detailed results, with the score computed from them, if
+    # any.
+    BLOCKS = {
+        'absolute size results': None,
+        'relative size results': 'Size',
+        'absolute speed results': None,
+        'relative speed results': 'Speed/MHz',
+    }
+
+    def __init__(self, result_set, identity=None):
+        """
+        Group the results in the supplied ResultSet by configuration, as
+        identified by the list of fields identity, or IDENTITY if None. The
+        JSON data of every result is read once.
+        """
+        self.__identity = list(identity or self.IDENTITY)
+        self.__matrix = ScoreMatrix(
+            result_set, [field.split(': ') for field in self.__identity]
+        )
+
+        # The rows of the matrix for each configuration, in the order the
+        # configurations are first seen.
+        self.__groups = dict()
+        for row, config in enumerate(self.__matrix.values()):
+            self.__groups.setdefault(config, []).append(row)
+
+    @staticmethod
+    def __spread(logs):
+        """
+        A dictionary describing the spread of a sequence of logarithms of
+        values, ignoring NaNs, or None if there are no values at all.
+        """
+        stats = ScoreMatrix.geo_stats(logs)
+        if stats is None:
+            return None
+
+        vals = [math.exp(val) for val in logs if not math.isnan(val)]
+        return {
+            'lowest': round(min(vals), 2),
+            'highest': round(max(vals), 2),
+            'geometric standard deviation': round(stats[1], 3),
+        }
+
+    def __combine(self, rows, details):
+        """
+        Combine the results in the supplied rows of the matrix, which are the
+        runs of one configuration, into a new Result. The details of the
+        first run are supplied, with their contents in hand (see
+        ResultDetails.loaded).
+        """
+        results = self.__matrix.results()
+        runs = [results[row] for row in rows]
+        first = runs[0]
+        json_data = details.json_data_copy()
+        benchmarks = self.__matrix.benchmarks()
+
+        # The spread of the runs, as recorded with the result
+        aggregation = {
+            'runs': len(runs),
+            'grouped by': ', '.join(self.__identity),
+        }
+        score_spread = dict()
+        for score in ['Size', 'Speed/MHz']:
+            spread = self.__spread([
+                math.log(res.scores()[score].geomean())
+                if res.scores()[score] else math.nan
+                for res in runs
+            ])
+            if spread:
+                score_spread[score] = spread
+
+        if score_spread:
+            aggregation['spread of scores between runs'] = score_spread
+
+        # Each benchmark a column at a time. Values are rounded as they are
+        # in results files, to whole numbers if they are in the first run.
+        for block, score in self.BLOCKS.items():
+            if not isinstance(json_data.get(block), dict):
+                continue
+
+            whole = all(isinstance(val, int) for val in
+                        json_data[block].get('detailed results', {}).values())
+            logs = self.__matrix.logs(block)
+            values = dict()
+            bench_spread = dict()
+            means = []
+            for col, bench in enumerate(benchmarks):
+                column = [logs[row][col] for row in rows]
+                stats = ScoreMatrix.geo_stats(column)
+                if stats is None:
+                    continue
+
+                geomean, geosd = stats
+                values[bench] = round(geomean) if whole else round(geomean, 2)
+                bench_spread[bench] = round(geosd, 3)
+                means.append(math.log(geomean))
+
+            json_data[block]['detailed results'] = values
+
+            # Relative results give a score, and their spread between runs
+            # is the same as for the absolute results.
+            if score:
+                stats = ScoreMatrix.geo_stats(means)
+                if stats:
+                    json_data[block]['geometric mean'] = round(stats[0], 2)
+                    json_data[block]['geometric standard deviation'] = round(
+                        stats[1], 2
+                    )
+
+                aggregation[f'spread of {block} between runs'] = bench_spread
+
+        # The runs, by the name of their details page
+        aggregation['runs combined'] = {
+            res.details_page()[:-len('.mediawiki')]: res.date_time() or ''
+            for res in runs
+        }
+
+        # The latest run dates the combination
+        dates = [res.date_time() for res in runs
+                 if isinstance(res.date_time(), str)]
+        if dates:
+            json_data['date/time'] = max(dates)
+
+        json_data['description'] = f'{first.desc()} ({len(runs)} runs)'
+        json_data['aggregation'] = aggregation
+
+        resfile = os.path.join(
+            os.path.dirname(first.details().resfile()),
+            first.details_page()[:-len('.mediawiki')] + AGGREGATE_SUFFIX
+        )
+        return Result(resfile, Result.summarize(json_data),
+                      json.dumps(json_data).encode())
+
+    def configurations(self):
+        """
+        The number of different configurations.
+        """
+        return len(self.__groups)
+
+    def results(self):
+        """
+        Return a new list of results, with one for each configuration, in
+        the order each configuration is first seen. A configuration with a
+        single run keeps its original result.
+        """
+        results = self.__matrix.results()
+        firsts = ResultDetails.loaded(
+            results[rows[0]].details() for rows in self.__groups.values()
+            if len(rows) > 1
+        )
+        try:
+            return [results[rows[0]] if len(rows) == 1
+                    else self.__combine(rows, next(firsts))
+                    for rows in self.__groups.values()]
+        finally:
+            firsts.close()
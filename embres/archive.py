@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+# Module to read results from archives as part of the embres package
+
+# Copyright (C) 2020 Embecosm Limited
+#
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Module to read results files straight out of a tar (optionally compressed)
+or zip archive, without extracting them.
+
+The archive is read in a single sequential pass, each member being read
+into memory and handed to the JSON decoder as it is reached. Nothing is
+written to disk. Members are named as though the archive were a directory
+(see embres.utils.split_archive_path), so the details page of a member is
+named after the member, just as for a file.
+"""
+
+# System packages
+import os
+import posixpath
+import tarfile
+import zipfile
+
+# Local packages
+from embres.utils import (
+    file_fingerprint, record_members, split_archive_path
+)
+
+
+class ResultArchive:
+    """
+    A class to read the results files in an archive
+    """
+    def __init__(self, archive):
+        """
+        Read from the supplied absolute archive file name.
+        """
+        self.__archive = archive
+
+    def __resf(self, member):
+        """
+        The file name by which we know the supplied member name.
+        """
+        return os.path.join(self.__archive, *member.split('/'))
+
+    @staticmethod
+    def __member(name):
+        """
+        The normalized form of the supplied name of a member, without any
+        leading '/'.
+        """
+        return posixpath.normpath(name).lstrip('/')
+
+    @staticmethod
+    def __wanted(member, names):
+        """
+        Whether the supplied member name is of a results file, and if names
+        is not None, whether it is in names, either by its full name within
+        the archive or its base name. Members outside the archive's own
+        tree are never wanted.
+        """
+        if (not member.endswith('.json')) or member.startswith('../'):
+            return False
+
+        return ((names is None) or (member in names)
+                or (posixpath.basename(member) in names))
+
+    def members(self, names=None):
+        """
+        Generator yielding a tuple of the file name (as from
+        embres.utils.split_archive_path) and the contents as bytes of each
+        results file in the archive, in the order they are in the archive.
+        If names is supplied, only members with those names, or base names,
+        are yielded. Otherwise, once all have been yielded, they are recorded
+        as the members of the archive (see embres.utils.record_members).
+
+        Raises OSError if the archive cannot be read, including if it is not
+        a valid archive.
+        """
+        # Once all the members have been read, we know which exist
+        fingerprint = None
+        if names is None:
+            fingerprint = file_fingerprint(self.__archive)
+        else:
+            names = {self.__member(name) for name in names}
+
+        seen = []
+        try:
+            for resf, data in self.__read(names):
+                seen.append(resf)
+                yield resf, data
+        except (tarfile.TarError, zipfile.BadZipFile) as ex:
+            raise OSError(f'Not a valid archive: {ex}') from ex
+
+        if fingerprint is not None:
+            record_members(self.__archive, fingerprint, seen)
+
+    def __read(self, names):
+        """
+        Generator for members, with names normalized, raising
+        tarfile.TarError or zipfile.BadZipFile if the archive is not valid.
+        """
+        if zipfile.is_zipfile(self.__archive):
+            with zipfile.ZipFile(self.__archive) as zipf:
+                for info in zipf.infolist():
+                    member = self.__member(info.filename)
+                    if (not info.is_dir()) and self.__wanted(member, names):
+                        yield self.__resf(member), zipf.read(info)
+            return
+
+        # A stream, so the archive is read strictly in order, however it is
+        # compressed.
+        with tarfile.open(self.__archive, 'r|*') as tarf:
+            for info in tarf:
+                member = self.__member(info.name)
+                if info.isfile() and self.__wanted(member, names):
+                    yield self.__resf(member), tarf.extractfile(info).read()
+
+    @staticmethod
+    def read_member(resf):
+        """
+        Return the contents as bytes of the single member of an archive with
+        the supplied file name. This means finding the member in the
+        archive, which for a compressed tar archive means reading it from the
+        start, so this is only used as a last resort.
+
+        Raises OSError if the member cannot be read, including if the
+        archive is not valid.
+        """
+        archive, member = split_archive_path(resf)
+        if archive is None:
+            raise FileNotFoundError(f'No such archive member: {resf}')
+
+        for _, data in ResultArchive(archive).members([member]):
+            return data
+
+        raise FileNotFoundError(f'No such archive member: {resf}')
@@ -25,36 +25,141 @@ import argparse
 import os
 import re
 import sys
+import time
+
+from embres.filters import ResultFilter
+from embres.utils import is_archive, is_bundle
 
 
 class Args:
     """
     A class to handle argument parsing
+
+    The same class serves each of the tools built on the embres package. The
+    arguments common to all tools are always available, while those for the
+    specific tool are selected by the tool argument to the constructor:
+
+    - 'results': collating results into the README and details pages
+
+    - 'csv': transcribing results to CSV
+
+    - 'query': querying an index of results
+
+    - 'trend': recording the history of results and detecting regressions
+
+    - 'compare': comparing new results with a summary of all results
     """
-    def __init__(self, rootdir):
+    # Description, default results directory (None meaning the root
+    # directory) and which of the optional common arguments it takes, for
+    # each tool. These are the number of jobs, the results cache, hashing
+    # results files to identify changes, selecting results and profiling.
+    ALL_OPTIONS = ('jobs', 'cache', 'cache_hash', 'filter', 'profile')
+    TOOLS = {
+        'results': ('Collate benchmark results', None, ALL_OPTIONS),
+        'csv': ('Transcribe benchmark results to CSV', 'results',
+                ALL_OPTIONS),
+        'query': ('Query an index of benchmark results', 'results',
+                  ('jobs', 'cache_hash', 'filter')),
+        'trend': ('Detect regressions in the history of benchmark results',
+                  'results', ('jobs', 'cache_hash', 'filter')),
+        'compare': ('Compare new benchmark results with all results',
+                    'results', ()),
+    }
+
+    def __init__(self, rootdir, tool='results'):
         """
         Parse the raw arguments. The goal is to get enough information we can
         set up logging. We need to know the root directory, since ultimately
         relative file arguments will be based on this.
         """
-        # Capture the root directory
+        # Capture the root directory and tool
         self.__rootdir = rootdir
+        self.__tool = tool
 
         # Create a parser
-        parser = argparse.ArgumentParser(description='Collate benchmark results')
+        description, resdir, self.__options = self.TOOLS[tool]
+        # No abbreviations, so an option a tool does not take, such as
+        # --cache for the trend tool, is not taken for one it does, such as
+        # --cache-hash.
+        parser = argparse.ArgumentParser(description=description,
+                                         allow_abbrev=False)
 
         # Add the arguments
+        self.__add_common_args(parser, resdir, self.__options)
+        if tool == 'results':
+            self.__add_results_args(parser)
+        elif tool == 'csv':
+            self.__add_csv_args(parser)
+        elif tool == 'query':
+            self.__add_query_args(parser)
+        elif tool == 'trend':
+            self.__add_trend_args(parser)
+        elif tool == 'compare':
+            self.__add_compare_args(parser)
+
+        # Parse the command line
+        self.__raw = parser.parse_args()
+
+        # Mark all private copies as empty for now.
+        self.__cooked = dict()
+        self.__cooked['abslogdir'] = None
+        self.__cooked['absresdir'] = None
+        self.__cooked['detailsdir'] = None
+        self.__cooked['readme_hdr'] = None
+        self.__cooked['readme_file'] = None
+        self.__cooked['resfiles'] = []
+        self.__cooked['jobs'] = None
+        self.__cooked['result_filter'] = None
+        self.__cooked['cachefile'] = None
+        self.__cooked['cache_hash'] = False
+        self.__cooked['incremental'] = False
+        self.__cooked['tables_only'] = False
+        self.__cooked['details_jobs'] = None
+        self.__cooked['atomic'] = False
+        self.__cooked['check_scores'] = False
+        self.__cooked['score_tolerance'] = None
+        self.__cooked['reference'] = None
+        self.__cooked['absexportdir'] = None
+        self.__cooked['abssummarydir'] = None
+        self.__cooked['aggregate'] = False
+        self.__cooked['aggregate_by'] = None
+        self.__cooked['watch'] = False
+        self.__cooked['poll_interval'] = None
+        self.__cooked['debounce'] = None
+        self.__cooked['csvfile'] = None
+        self.__cooked['profile'] = False
+        self.__cooked['profile_stats'] = None
+        self.__cooked['profile_json'] = None
+        self.__cooked['validation_report'] = None
+        self.__cooked['long'] = False
+        self.__cooked['gzip'] = False
+        self.__cooked['indexfile'] = None
+        self.__cooked['update'] = True
+        self.__cooked['score'] = None
+        self.__cooked['top'] = None
+        self.__cooked['benchmark'] = None
+        self.__cooked['sql'] = None
+        self.__cooked['storefile'] = None
+        self.__cooked['window'] = None
+        self.__cooked['min_runs'] = None
+        self.__cooked['sigma'] = None
+        self.__cooked['min_change'] = None
+        self.__cooked['baseline'] = None
+        self.__cooked['max_regression'] = None
+
+    @staticmethod
+    def __add_common_args(parser, resdir, options):
+        """
+        Add the arguments common to all tools, with the supplied default
+        results directory, and those of the optional common arguments (see
+        TOOLS) in options.
+        """
         parser.add_argument(
             '--resdir',
             type=str,
-            default=None,
-            help='Directory holding the results files',
-        )
-        parser.add_argument(
-            '--detailsdir',
-            type=str,
-            default='details',
-            help='Directory holding the detail of results wikified'
+            default=resdir,
+            help='Directory, or .tar, .tar.gz or .zip archive, holding ' +
+            'the results files, or a .jsonl bundle of results',
         )
         parser.add_argument(
             '--logdir',
@@ -62,6 +167,93 @@ class Args:
             default='logs',
             help='Directory in which to store logs',
         )
+        if 'jobs' in options:
+            parser.add_argument(
+                '--jobs',
+                type=int,
+                default=1,
+                help='Number of processes to use reading results files, 0 ' +
+                'to use all available processors',
+            )
+        if 'cache' in options:
+            parser.add_argument(
+                '--cache',
+                type=str,
+                default=None,
+                help='File in which to cache parsed results between runs',
+            )
+        if 'cache_hash' in options:
+            parser.add_argument(
+                '--cache-hash',
+                action='store_true',
+                help='Identify changed results files by a hash of their ' +
+                'contents, rather than their modification time',
+            )
+        if 'filter' in options:
+            parser.add_argument(
+                '--arch',
+                type=str,
+                action='append',
+                default=None,
+                help='Only use results for this architecture family (may ' +
+                'be repeated)',
+            )
+            parser.add_argument(
+                '--embench-version',
+                type=str,
+                action='append',
+                default=None,
+                help='Only use results for this version of Embench (may be ' +
+                'repeated)',
+            )
+            parser.add_argument(
+                '--since',
+                type=str,
+                default=None,
+                help='Only use results dated on or after this date ' +
+                '(YYYY-MM-DD)',
+            )
+            parser.add_argument(
+                '--until',
+                type=str,
+                default=None,
+                help='Only use results dated on or before this date ' +
+                '(YYYY-MM-DD)',
+            )
+            parser.add_argument(
+                '--desc-regex',
+                type=str,
+                default=None,
+                help='Only use results whose description matches this ' +
+                'regular expression',
+            )
+        if 'profile' in options:
+            parser.add_argument(
+                '--profile',
+                action='store_true',
+                help='Report the time taken by each phase of processing',
+            )
+            parser.add_argument(
+                '--profile-stats',
+                type=str,
+                default=None,
+                help='File in which to save Python profiler statistics ' +
+                '(implies --profile)',
+            )
+            parser.add_argument(
+                '--profile-json',
+                type=str,
+                default=None,
+                help='File in which to save the timing report as JSON ' +
+                '(implies --profile)',
+            )
+        parser.add_argument(
+            '--validation-report',
+            type=str,
+            default=None,
+            help='File in which to save the report of results files which ' +
+            'are not valid, as JSON',
+        )
         parser.add_argument(
             'resfiles',
             metavar='result-file',
@@ -70,17 +262,258 @@ class Args:
             help='Specific results files to accumulate',
         )
 
-        # Parse the command line
-        self.__raw = parser.parse_args()
+    @staticmethod
+    def __add_results_args(parser):
+        """
+        Add the arguments for collating results into the README and details
+        pages.
+        """
+        parser.add_argument(
+            '--detailsdir',
+            type=str,
+            default='details',
+            help='Directory holding the detail of results wikified'
+        )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Only regenerate details pages whose results file has ' +
+            'changed',
+        )
+        parser.add_argument(
+            '--details-jobs',
+            type=int,
+            default=1,
+            help='Number of threads to use writing details pages, 0 to use ' +
+            'one per available processor',
+        )
+        parser.add_argument(
+            '--tables-only',
+            action='store_true',
+            help='Only regenerate the README tables, not the details pages',
+        )
+        parser.add_argument(
+            '--atomic',
+            action='store_true',
+            help='Write the README and details pages to temporary files, ' +
+            'which replace the originals when complete',
+        )
+        parser.add_argument(
+            '--check-scores',
+            action='store_true',
+            help='Check the scores in each results file against those ' +
+            'computed from its detailed results',
+        )
+        parser.add_argument(
+            '--score-tolerance',
+            type=float,
+            default=0.01,
+            help='Relative tolerance when checking scores',
+        )
+        parser.add_argument(
+            '--reference',
+            type=str,
+            default=None,
+            help='Name of a result against which to score all results, ' +
+            'instead of the Embench reference platform',
+        )
+        parser.add_argument(
+            '--export',
+            type=str,
+            default=None,
+            help='Directory in which to write all results as a columnar ' +
+            'store',
+        )
+        parser.add_argument(
+            '--summary',
+            type=str,
+            default=None,
+            help='Directory in which to write a summary of the scores of ' +
+            'all results, with which to compare new results',
+        )
+        parser.add_argument(
+            '--aggregate',
+            action='store_true',
+            help='Combine repeated runs of the same configuration into a ' +
+            'single result',
+        )
+        parser.add_argument(
+            '--aggregate-by',
+            type=str,
+            action='append',
+            default=None,
+            help='Field of the results identifying a configuration when ' +
+            'combining runs, with nested fields separated by ": " (may be ' +
+            'repeated, implies --aggregate)',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=None,
+            help='Only list the best TOP results in each table, and the ' +
+            'best TOP of each architecture in the per architecture tables, ' +
+            'holding just those in memory',
+        )
+        parser.add_argument(
+            '--watch',
+            action='store_true',
+            help='Keep running, regenerating the README and details pages ' +
+            'whenever results files change (implies --incremental)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds between checks for changed results files when ' +
+            'watching',
+        )
+        parser.add_argument(
+            '--debounce',
+            type=float,
+            default=1.0,
+            help='Seconds without further changes to wait before ' +
+            'regenerating when watching',
+        )
 
-        # Mark all private copies as empty for now.
-        self.__cooked = dict()
-        self.__cooked['abslogdir'] = None
-        self.__cooked['absresdir'] = None
-        self.__cooked['detailsdir'] = None
-        self.__cooked['readme_hdr'] = None
-        self.__cooked['readme'] = None
-        self.__cooked['resfiles'] = []
+    @staticmethod
+    def __add_csv_args(parser):
+        """
+        Add the arguments for transcribing results to CSV.
+        """
+        parser.add_argument(
+            '--output',
+            type=str,
+            default='summary.csv',
+            help='CSV file to write',
+        )
+        parser.add_argument(
+            '--long',
+            action='store_true',
+            help='Write one row per benchmark per result, rather than one ' +
+            'row per result',
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Compress the CSV file (implied by a .gz suffix)',
+        )
+
+    @staticmethod
+    def __add_query_args(parser):
+        """
+        Add the arguments for querying an index of results.
+        """
+        parser.add_argument(
+            '--index',
+            type=str,
+            default='results.db',
+            help='SQLite database holding the index of results',
+        )
+        parser.add_argument(
+            '--no-update',
+            action='store_true',
+            help='Query the index as it is, without first bringing it up ' +
+            'to date with the results files',
+        )
+        parser.add_argument(
+            '--score',
+            type=str,
+            choices=['size', 'speed', 'speed-mhz'],
+            default='speed-mhz',
+            help='Score by which to rank results',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=20,
+            help='Number of results to show',
+        )
+        parser.add_argument(
+            '--benchmark',
+            type=str,
+            default=None,
+            help='Rank results by their score for this benchmark alone',
+        )
+        parser.add_argument(
+            '--sql',
+            type=str,
+            default=None,
+            help='Run this SQL query against the index instead',
+        )
+
+    @staticmethod
+    def __add_trend_args(parser):
+        """
+        Add the arguments for recording the history of results and detecting
+        regressions.
+        """
+        parser.add_argument(
+            '--store',
+            type=str,
+            default='trends.db',
+            help='SQLite database holding the history of results',
+        )
+        parser.add_argument(
+            '--no-update',
+            action='store_true',
+            help='Check the history as it is, without first appending any ' +
+            'new results files',
+        )
+        parser.add_argument(
+            '--window',
+            type=int,
+            default=10,
+            help='Number of runs before the latest run of each ' +
+            'configuration to compare it with',
+        )
+        parser.add_argument(
+            '--min-runs',
+            type=int,
+            default=3,
+            help='Least number of earlier runs needed to compare the ' +
+            'latest run with',
+        )
+        parser.add_argument(
+            '--sigma',
+            type=float,
+            default=3.0,
+            help='Number of standard deviations from the earlier runs ' +
+            'which is a regression',
+        )
+        parser.add_argument(
+            '--min-change',
+            type=float,
+            default=1.0,
+            help='Least change from the earlier runs, as a percentage, ' +
+            'which is a regression',
+        )
+
+    @staticmethod
+    def __add_compare_args(parser):
+        """
+        Add the arguments for comparing new results with a summary of all
+        results.
+        """
+        parser.add_argument(
+            '--summary',
+            type=str,
+            default='summary',
+            help='Directory holding the summary of all results, as written ' +
+            'by process_results.py --summary',
+        )
+        parser.add_argument(
+            '--baseline',
+            type=str,
+            default=None,
+            help='Result file against which to compare each benchmark',
+        )
+        parser.add_argument(
+            '--max-regression',
+            type=float,
+            default=None,
+            help='Largest percentage by which a score or benchmark may be ' +
+            'worse than the baseline, before failing',
+        )
 
     def abslogdir(self):
         """
@@ -119,7 +552,9 @@ class Args:
     def __absresdir(self, log):
         """
         Private method to sort out the results directory, which should end up
-        as an (existing) absolute directory that is readable.
+        as an (existing) absolute directory that is readable, or a readable
+        archive or bundle file. Only the results and csv tools can read
+        archives.
         """
         # Cache the result
         if not self.__cooked['absresdir']:
@@ -132,8 +567,15 @@ class Args:
             else:
                 absresdir = self.__rootdir
 
-            # Directory exists and is readable?
-            if not os.path.isdir(absresdir):
+            # Directory, archive or bundle exists and is readable?
+            if is_archive(absresdir) and os.path.isfile(absresdir):
+                # The index and the trend store track each results file
+                if self.__tool in ['query', 'trend']:
+                    log.error(f'ERROR: Results archive {resdir} cannot ' +
+                              f'be tracked file by file: exiting')
+                    sys.exit(1)
+            elif not (os.path.isdir(absresdir) or
+                      (is_bundle(absresdir) and os.path.isfile(absresdir))):
                 log.error(f'ERROR: Results directory {resdir} not ' +
                           f'found: exiting')
                 sys.exit(1)
@@ -187,11 +629,13 @@ class Args:
         """
         Private method to sort out the README files. The README header must
         exist and be readable. The new README must be available for writing.
-        The README header is opened for reading and the new README  opened for
-        writing.
+        The README header is opened for reading. The new README is only
+        opened once the results have been read (see process_results.py), so
+        an error before then leaves it untouched, and leaves no temporary
+        file behind if writing atomically.
         """
         # Cache the result
-        if not (self.__cooked['readme_hdr'] and self.__cooked['readme']):
+        if not (self.__cooked['readme_hdr'] and self.__cooked['readme_file']):
             readme_hdr = os.path.join(self.__rootdir, 'README-header.mediawiki')
             readme = os.path.join(self.__rootdir, 'README.mediawiki')
 
@@ -206,15 +650,19 @@ class Args:
                               f'reading: {osex.strerror}')
                     sys.exit(1)
 
-            # Try to open the new README for writing, if it is not already
-            # opened.
-            if not self.__cooked['readme']:
-                try:
-                    self.__cooked['readme'] = open(readme, 'w')
-                except OSError as osex:
-                    log.error(f'ERROR: Could not open {readme} for writing: ' +
-                              f'{osex.strerror}')
-                    sys.exit(1)
+            # Check the new README can be written. Written atomically, it is
+            # replaced by a new file in the same directory.
+            if self.__raw.atomic or not os.path.exists(readme):
+                writable = os.access(os.path.dirname(readme), os.W_OK)
+            else:
+                writable = os.access(readme, os.W_OK)
+
+            if not writable:
+                log.error(f'ERROR: Could not open {readme} for writing: ' +
+                          f'exiting')
+                sys.exit(1)
+
+            self.__cooked['readme_file'] = readme
 
     def __resfiles(self):
         """
@@ -226,6 +674,369 @@ class Args:
             # Enumerate the files
             self.__cooked['resfiles'] = self.__raw.resfiles
 
+    def __jobs(self, log):
+        """
+        Private method to sort out the number of processes to use when
+        reading results. Zero means use all the processors we have.
+        """
+        # Cache the result
+        if not self.__cooked['jobs']:
+            jobs = self.__raw.jobs
+            if jobs < 0:
+                log.error(f'ERROR: Number of jobs {jobs} cannot be ' +
+                          f'negative: exiting')
+                sys.exit(1)
+
+            if jobs == 0:
+                jobs = os.cpu_count() or 1
+
+            self.__cooked['jobs'] = jobs
+
+    def __cache(self, log):
+        """
+        Private method to sort out the cache file. Relative names are relative
+        to the root directory. The file need not exist, but its directory
+        must be writable.
+        """
+        # Cache the result
+        if self.__raw.cache and not self.__cooked['cachefile']:
+            cachefile = self.__raw.cache
+            if os.path.isabs(cachefile):
+                abscachefile = cachefile
+            else:
+                abscachefile = os.path.join(self.__rootdir, cachefile)
+
+            cachedir = os.path.dirname(abscachefile)
+            if not (os.path.isdir(cachedir) and os.access(cachedir, os.W_OK)):
+                log.error(f'ERROR: Unable to write cache file {cachefile}: ' +
+                          f'exiting')
+                sys.exit(1)
+
+            self.__cooked['cachefile'] = abscachefile
+
+    def __scoring(self, log):
+        """
+        Private method to sort out the options for recomputing scores.
+        """
+        tolerance = self.__raw.score_tolerance
+        if tolerance < 0.0:
+            log.error(f'ERROR: Score tolerance {tolerance} cannot be ' +
+                      f'negative: exiting')
+            sys.exit(1)
+
+        self.__cooked['check_scores'] = self.__raw.check_scores
+        self.__cooked['score_tolerance'] = tolerance
+        self.__cooked['reference'] = self.__raw.reference
+
+    def __aggregate(self, log):
+        """
+        Private method to sort out the options for combining repeated runs.
+        Each field identifying a configuration is a path of field names, none
+        of which may be empty.
+        """
+        fields = self.__raw.aggregate_by
+        if fields:
+            for field in fields:
+                if not all(name.strip() for name in field.split(': ')):
+                    log.error(f'ERROR: Field "{field}" to aggregate by is ' +
+                              f'not valid: exiting')
+                    sys.exit(1)
+
+        self.__cooked['aggregate'] = bool(self.__raw.aggregate or fields)
+        self.__cooked['aggregate_by'] = fields
+
+    def __outdir(self, log, outdir, what):
+        """
+        Private method to sort out an output directory, described as what in
+        any diagnostic. Relative names are relative to the root directory.
+        We create it if it does not exist and it must be writable.
+
+        Returns the absolute directory name.
+        """
+        if os.path.isabs(outdir):
+            absoutdir = outdir
+        else:
+            absoutdir = os.path.join(self.__rootdir, outdir)
+
+        if not os.path.isdir(absoutdir):
+            try:
+                os.makedirs(absoutdir)
+            except OSError:
+                log.error(f'ERROR: Unable to create {what} directory ' +
+                          f'{outdir}: exiting')
+                sys.exit(1)
+
+        if not os.access(absoutdir, os.W_OK):
+            log.error(f'ERROR: Unable to write {what} directory ' +
+                      f'{outdir}: exiting')
+            sys.exit(1)
+
+        return absoutdir
+
+    def __exportdir(self, log):
+        """
+        Private method to sort out the export and summary directories.
+        """
+        # Cache the result
+        if self.__raw.export and not self.__cooked['absexportdir']:
+            self.__cooked['absexportdir'] = self.__outdir(
+                log, self.__raw.export, 'export'
+            )
+
+        if self.__raw.summary and not self.__cooked['abssummarydir']:
+            self.__cooked['abssummarydir'] = self.__outdir(
+                log, self.__raw.summary, 'summary'
+            )
+
+    def __filter(self, log):
+        """
+        Private method to sort out the options selecting results.
+        """
+        for opt, date in [('--since', self.__raw.since),
+                          ('--until', self.__raw.until)]:
+            if date is not None:
+                try:
+                    if not re.fullmatch(r'\d{4}-\d{2}-\d{2}', date):
+                        raise ValueError(date)
+                    time.strptime(date, '%Y-%m-%d')
+                except ValueError:
+                    log.error(f'ERROR: {opt} date {date} is not of the ' +
+                              f'form YYYY-MM-DD: exiting')
+                    sys.exit(1)
+
+        if ((self.__raw.since is not None) and
+                (self.__raw.until is not None) and
+                (self.__raw.since > self.__raw.until)):
+            log.error(f'ERROR: --since date {self.__raw.since} is after ' +
+                      f'--until date {self.__raw.until}: exiting')
+            sys.exit(1)
+
+        try:
+            self.__cooked['result_filter'] = ResultFilter(
+                self.__raw.arch, self.__raw.embench_version,
+                self.__raw.since, self.__raw.until, self.__raw.desc_regex
+            )
+        except re.error as rex:
+            log.error(f'ERROR: Invalid description regular expression ' +
+                      f'{self.__raw.desc_regex}: {rex}: exiting')
+            sys.exit(1)
+
+    def __absfile(self, filename):
+        """
+        Private method to make a file name absolute, relative to the root
+        directory. None stays as None.
+        """
+        if filename and not os.path.isabs(filename):
+            return os.path.join(self.__rootdir, filename)
+
+        return filename
+
+    def __profile(self):
+        """
+        Private method to sort out the profiling options. Asking for either
+        output file implies profiling.
+        """
+        self.__cooked['profile_stats'] = self.__absfile(
+            self.__raw.profile_stats
+        )
+        self.__cooked['profile_json'] = self.__absfile(self.__raw.profile_json)
+        self.__cooked['profile'] = bool(
+            self.__raw.profile or self.__cooked['profile_stats'] or
+            self.__cooked['profile_json']
+        )
+
+    def __watch(self, log):
+        """
+        Private method to sort out the options for watching for changed
+        results files.
+        """
+        for opt, val in [('Poll interval', self.__raw.poll_interval),
+                         ('Debounce time', self.__raw.debounce)]:
+            if val < 0.0:
+                log.error(f'ERROR: {opt} {val} cannot be negative: exiting')
+                sys.exit(1)
+
+        if self.__raw.watch and is_archive(self.__cooked['absresdir']):
+            log.error(f'ERROR: Results archive {self.__raw.resdir} cannot ' +
+                      f'be watched: exiting')
+            sys.exit(1)
+
+        self.__cooked['watch'] = self.__raw.watch
+        self.__cooked['poll_interval'] = self.__raw.poll_interval
+        self.__cooked['debounce'] = self.__raw.debounce
+
+    def __top(self, log):
+        """
+        Private method to sort out how many results to list in each table.
+        Only the results listed are kept, so we cannot do anything which
+        needs all the results.
+        """
+        top = self.__raw.top
+        if top is not None:
+            if top < 1:
+                log.error(f'ERROR: Number of results {top} must be ' +
+                          f'positive: exiting')
+                sys.exit(1)
+
+            for opt, val in [('--check-scores', self.__raw.check_scores),
+                             ('--reference', self.__raw.reference),
+                             ('--aggregate', (self.__raw.aggregate or
+                                              self.__raw.aggregate_by)),
+                             ('--export', self.__raw.export),
+                             ('--summary', self.__raw.summary),
+                             ('--watch', self.__raw.watch)]:
+                if val:
+                    log.error(f'ERROR: {opt} cannot be used with --top: ' +
+                              f'exiting')
+                    sys.exit(1)
+
+        self.__cooked['top'] = top
+
+    def __results_args(self, log):
+        """
+        Private method to sort out the arguments for collating results into
+        the README and details pages.
+        """
+        # Details directory
+        self.__detailsdir(log)
+
+        # Whether to keep running, regenerating as results change, whether
+        # to combine repeated runs and how many results to list.
+        self.__watch(log)
+        self.__aggregate(log)
+        self.__top(log)
+
+        # New and old readme files as needed. Note that the README header is
+        # a file handle, but the README is just a file name.
+        self.__readme(log)
+        self.__cooked['atomic'] = self.__raw.atomic
+
+        # How to score the results
+        self.__scoring(log)
+
+        # Where to export them and their summary
+        self.__exportdir(log)
+
+        # Whether to only regenerate changed details pages, or not to
+        # regenerate them at all. Watching needs to be incremental.
+        self.__cooked['incremental'] = (self.__raw.incremental or
+                                        self.__raw.watch)
+        self.__cooked['tables_only'] = self.__raw.tables_only
+
+        # How many threads to use writing details pages
+        details_jobs = self.__raw.details_jobs
+        if details_jobs < 0:
+            log.error(f'ERROR: Number of details jobs {details_jobs} ' +
+                      f'cannot be negative: exiting')
+            sys.exit(1)
+
+        self.__cooked['details_jobs'] = details_jobs or os.cpu_count() or 1
+
+    def __csv_args(self, log):
+        """
+        Private method to sort out the arguments for transcribing results to
+        CSV. The CSV file is relative to the current directory, and we just
+        check we will be able to write it.
+        """
+        csvfile = self.__raw.output
+        csvdir = os.path.dirname(os.path.abspath(csvfile))
+        if not (os.path.isdir(csvdir) and os.access(csvdir, os.W_OK)):
+            log.error(f'ERROR: Unable to write CSV file {csvfile}: exiting')
+            sys.exit(1)
+
+        self.__cooked['csvfile'] = csvfile
+        self.__cooked['long'] = self.__raw.long
+        self.__cooked['gzip'] = (self.__raw.gzip or csvfile.endswith('.gz'))
+
+    def __query_args(self, log):
+        """
+        Private method to sort out the arguments for querying an index of
+        results. Relative index files are relative to the root directory. The
+        file need not exist, but its directory must be writable.
+        """
+        indexfile = self.__absfile(self.__raw.index)
+        indexdir = os.path.dirname(indexfile)
+        if not (os.path.isdir(indexdir) and os.access(indexdir, os.W_OK)):
+            log.error(f'ERROR: Unable to write index {self.__raw.index}: ' +
+                      f'exiting')
+            sys.exit(1)
+
+        if self.__raw.top < 1:
+            log.error(f'ERROR: Number of results {self.__raw.top} must be ' +
+                      f'positive: exiting')
+            sys.exit(1)
+
+        self.__cooked['indexfile'] = indexfile
+        self.__cooked['update'] = not self.__raw.no_update
+        self.__cooked['score'] = {
+            'size': 'Size', 'speed': 'Speed', 'speed-mhz': 'Speed/MHz'
+        }[self.__raw.score]
+        self.__cooked['top'] = self.__raw.top
+        self.__cooked['benchmark'] = self.__raw.benchmark
+        self.__cooked['sql'] = self.__raw.sql
+
+    def __trend_args(self, log):
+        """
+        Private method to sort out the arguments for recording the history
+        of results and detecting regressions. Relative store files are
+        relative to the root directory. The file need not exist, but its
+        directory must be writable.
+        """
+        storefile = self.__absfile(self.__raw.store)
+        storedir = os.path.dirname(storefile)
+        if not (os.path.isdir(storedir) and os.access(storedir, os.W_OK)):
+            log.error(f'ERROR: Unable to write trend store ' +
+                      f'{self.__raw.store}: exiting')
+            sys.exit(1)
+
+        if self.__raw.window < 1:
+            log.error(f'ERROR: Number of runs {self.__raw.window} to ' +
+                      f'compare with must be positive: exiting')
+            sys.exit(1)
+
+        if not 1 <= self.__raw.min_runs <= self.__raw.window:
+            log.error(f'ERROR: Least number of runs {self.__raw.min_runs} ' +
+                      f'must be between 1 and {self.__raw.window}: exiting')
+            sys.exit(1)
+
+        for opt, val in [('--sigma', self.__raw.sigma),
+                         ('--min-change', self.__raw.min_change)]:
+            if val < 0.0:
+                log.error(f'ERROR: {opt} {val} cannot be negative: exiting')
+                sys.exit(1)
+
+        self.__cooked['storefile'] = storefile
+        self.__cooked['update'] = not self.__raw.no_update
+        self.__cooked['window'] = self.__raw.window
+        self.__cooked['min_runs'] = self.__raw.min_runs
+        self.__cooked['sigma'] = self.__raw.sigma
+        self.__cooked['min_change'] = self.__raw.min_change
+
+    def __compare_args(self, log):
+        """
+        Private method to sort out the arguments for comparing new results
+        with a summary of all results. Relative summary directories are
+        relative to the root directory. The baseline is found as for the
+        results files.
+        """
+        if not self.__raw.resfiles:
+            log.error('ERROR: No results files to compare: exiting')
+            sys.exit(1)
+
+        max_regression = self.__raw.max_regression
+        if max_regression is not None and max_regression < 0.0:
+            log.error(f'ERROR: Largest regression {max_regression} cannot ' +
+                      f'be negative: exiting')
+            sys.exit(1)
+
+        if max_regression is not None and not self.__raw.baseline:
+            log.error('ERROR: --max-regression needs --baseline: exiting')
+            sys.exit(1)
+
+        self.__cooked['abssummarydir'] = self.__absfile(self.__raw.summary)
+        self.__cooked['baseline'] = self.__raw.baseline
+        self.__cooked['max_regression'] = max_regression
+
     def all_args(self, log):
         """
         Sort out all the arguments, other than the logdir. Any diagnostics
@@ -235,15 +1046,40 @@ class Args:
         be called multiple times - after the first time, it will just return
         the result from the first call.
         """
-        # Results and details directories
+        # Results directory and all the files to be processed.
         self.__absresdir(log)
-        self.__detailsdir(log)
+        self.__resfiles()
 
-        # New and old readme files as needed. Note that these are file handles.
-        self.__readme(log)
+        # How many processes to use reading them, where to cache them, how
+        # to tell when they change, which to use and whether to time them,
+        # if the tool takes these
+        if 'jobs' in self.__options:
+            self.__jobs(log)
+        if 'cache' in self.__options:
+            self.__cache(log)
+        if 'cache_hash' in self.__options:
+            self.__cooked['cache_hash'] = self.__raw.cache_hash
+        if 'filter' in self.__options:
+            self.__filter(log)
+        if 'profile' in self.__options:
+            self.__profile()
 
-        # Collate all the files to be processed.
-        self.__resfiles()
+        # Where to report those which are not valid
+        self.__cooked['validation_report'] = self.__absfile(
+            self.__raw.validation_report
+        )
+
+        # The arguments specific to the tool
+        if self.__tool == 'results':
+            self.__results_args(log)
+        elif self.__tool == 'csv':
+            self.__csv_args(log)
+        elif self.__tool == 'query':
+            self.__query_args(log)
+        elif self.__tool == 'trend':
+            self.__trend_args(log)
+        elif self.__tool == 'compare':
+            self.__compare_args(log)
 
         return self.__cooked
 
@@ -270,6 +1106,18 @@ class Args:
 
         log.debug('Results directory: ' + self.__cooked['absresdir'])
 
+        if self.__cooked['jobs']:
+            log.debug(f'Processes reading results: {self.__cooked["jobs"]}')
+
+        if self.__cooked['cachefile']:
+            log.debug(f'Results cache: {self.__cooked["cachefile"]}')
+
+        if self.__cooked['indexfile']:
+            log.debug(f'Results index: {self.__cooked["indexfile"]}')
+
+        if self.__cooked['storefile']:
+            log.debug(f'Trend store: {self.__cooked["storefile"]}')
+
         log.debug('Results files to process:')
         for resf in self.__cooked['resfiles']:
             log.debug('  ' + resf)
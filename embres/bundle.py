@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+# Module to read bundles of results as part of the embres package
+
+# Copyright (C) 2020 Embecosm Limited
+#
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Module to read bundles of results in JSON Lines format, where each line is
+the JSON data of one result, exactly as it would be in a results file. Blank
+lines are ignored.
+
+A bundle is read line by line, so it need not fit in memory, and reading a
+thousand results takes one open, rather than a thousand. The result on each
+line is named as though the bundle were a directory holding a file named
+after the line number (see embres.utils.split_bundle_path), so diagnostics
+give the line.
+"""
+
+# System packages
+import os
+
+# Local packages
+from embres.utils import file_fingerprint, record_members, split_bundle_path
+
+
+class ResultBundle:
+    """
+    A class to read the results in a bundle
+    """
+    def __init__(self, bundle):
+        """
+        Read from the supplied absolute bundle file name.
+        """
+        self.__bundle = bundle
+
+    def members(self):
+        """
+        Generator yielding a tuple of the name (as from
+        embres.utils.split_bundle_path) and the JSON text as bytes of each
+        result in the bundle, in order, without its line terminator. Once
+        all have been yielded, they are recorded as the members of the
+        bundle (see embres.utils.record_members).
+
+        Raises OSError if the bundle cannot be read.
+        """
+        fingerprint = file_fingerprint(self.__bundle)
+        seen = []
+        with open(self.__bundle, 'rb') as fileh:
+            for lineno, line in enumerate(fileh, 1):
+                if line.strip():
+                    resf = os.path.join(self.__bundle, str(lineno))
+                    seen.append(resf)
+                    yield resf, line.rstrip(b'\r\n')
+
+        record_members(self.__bundle, fingerprint, seen)
+
+    @staticmethod
+    def read_member(resf):
+        """
+        Return the JSON text as bytes of the single result with the supplied
+        name, without its line terminator. This means reading the bundle up
+        to that line, so this is only used as a last resort.
+
+        Raises OSError if the result cannot be read.
+        """
+        bundle, line = split_bundle_path(resf)
+        if bundle is not None:
+            with open(bundle, 'rb') as fileh:
+                for lineno, data in enumerate(fileh, 1):
+                    if lineno == line:
+                        if data.strip():
+                            return data.rstrip(b'\r\n')
+                        break
+
+        raise FileNotFoundError(f'No such bundle member: {resf}')
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+# Module to cache parsed results as part of the embres package
+
+# Copyright (C) 2020 Embecosm Limited
+#
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Module to provide a persistent cache of parsed results.
+
+Decoding the JSON for every result file on every run dominates the run time
+once there are many results, even though very few of them change between
+runs. The cache holds the summary of each valid result file (see
+Result.summary), keyed by its absolute file name and checked against a
+fingerprint of the file (see embres.utils.file_fingerprint). It is stored as
+a single pickle file.
+"""
+
+# System packages
+import os
+import pickle
+
+# Local packages
+from embres.utils import file_fingerprint, path_exists
+
+
+class ResultCache:
+    """
+    A class to handle the cache of parsed results
+    """
+    # Bump this whenever the format of the cached data changes, or results
+    # are validated differently, so that any old cache is discarded rather
+    # than misinterpreted.
+    VERSION = 4
+
+    def __init__(self, cachefile, log, content_hash=False):
+        """
+        Load the cache from the supplied absolute file name if it exists. A
+        missing, unreadable or out of date cache is not an error, we just
+        start with an empty cache.
+
+        If content_hash is set, files are fingerprinted by a digest of their
+        contents rather than their modification time.
+        """
+        self.__cachefile = cachefile
+        self.__log = log
+        self.__content_hash = content_hash
+
+        # Entries are keyed by file name, with a value of a tuple of the
+        # fingerprint and the summary data.
+        self.__entries = dict()
+        self.__dirty = False
+
+        # Fingerprints computed by lookup, so store need not repeat them.
+        self.__fingerprints = dict()
+
+        try:
+            with open(cachefile, 'rb') as fileh:
+                cache = pickle.load(fileh)
+        except FileNotFoundError:
+            return
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError,
+                ValueError) as ex:
+            log.debug(f'Unable to read cache {cachefile}: {ex}: ignored')
+            return
+
+        if ((not isinstance(cache, dict))
+                or (cache.get('version') != self.VERSION)
+                or (cache.get('content hash') != content_hash)):
+            log.debug(f'Cache {cachefile} is out of date: ignored')
+            return
+
+        self.__entries = cache['entries']
+
+    def lookup(self, resf):
+        """
+        Return the cached summary for the supplied absolute file name, or None
+        if it is not in the cache or the file has changed since it was
+        cached.
+        """
+        try:
+            fingerprint = file_fingerprint(resf, self.__content_hash)
+        except OSError:
+            return None
+
+        self.__fingerprints[resf] = fingerprint
+        entry = self.__entries.get(resf)
+        if entry and (entry[0] == fingerprint):
+            return entry[1]
+
+        return None
+
+    def store(self, resf, summary):
+        """
+        Record the summary data for the supplied absolute file name.
+        """
+        fingerprint = self.__fingerprints.pop(resf, None)
+        if not fingerprint:
+            try:
+                fingerprint = file_fingerprint(resf, self.__content_hash)
+            except OSError:
+                return
+
+        self.__entries[resf] = (fingerprint, summary)
+        self.__dirty = True
+
+    def evict_missing(self):
+        """
+        Remove all entries whose file no longer exists.
+        """
+        for resf in [resf for resf in self.__entries
+                     if not path_exists(resf)]:
+            del self.__entries[resf]
+            self.__dirty = True
+
+    def save(self):
+        """
+        Write the cache back to disk if it has changed. We write to a
+        temporary file and rename, so a failed run never leaves a truncated
+        cache. Failure to write is not fatal, we just lose the benefit next
+        time.
+        """
+        if not self.__dirty:
+            return
+
+        tmpfile = f'{self.__cachefile}.tmp{os.getpid()}'
+        cache = {
+            'version': self.VERSION,
+            'content hash': self.__content_hash,
+            'entries': self.__entries,
+        }
+        try:
+            with open(tmpfile, 'wb') as fileh:
+                pickle.dump(cache, fileh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpfile, self.__cachefile)
+        except OSError as osex:
+            self.__log.warning(
+                f'Warning: Unable to write cache {self.__cachefile}: ' +
+                f'{osex.strerror}'
+            )
+            try:
+                os.remove(tmpfile)
+            except OSError:
+                pass
+            return
+
+        self.__dirty = False
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+# Module to transcribe results to CSV as part of the embres package
+
+# Copyright (C) 2019, 2020 Embecosm Limited
+#
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Module to transcribe results to CSV.
+
+Rows are written as each result is supplied, so combined with
+ResultSet.stream, any number of results can be transcribed in constant
+memory. There are two formats.
+
+- summary: one row per result, with its metadata and scores.
+
+- long: one row per benchmark per result, with the absolute and relative
+  size and speed of that benchmark.
+"""
+
+# System packages
+import csv
+import gzip
+import os
+
+
+class CsvExport:
+    """
+    A class to write results to a CSV file, one result at a time
+    """
+    # The per benchmark columns of the long format, with the JSON block each
+    # comes from.
+    BENCHMARK_COLUMNS = [
+        ('Absolute size', 'absolute size results'),
+        ('Relative size', 'relative size results'),
+        ('Absolute speed', 'absolute speed results'),
+        ('Relative speed', 'relative speed results'),
+    ]
+
+    def __init__(self, csvfile, long=False, compress=False):
+        """
+        Open the supplied CSV file and write the header row. If long is set,
+        the long format is used. If compress is set, the file is compressed
+        with gzip.
+
+        Raises OSError if the file cannot be opened.
+        """
+        self.__long = long
+
+        if compress:
+            self.__fileh = gzip.open(csvfile, 'wt', newline='')
+        else:
+            self.__fileh = open(csvfile, 'w', newline='')
+
+        self.__csvf = csv.writer(self.__fileh)
+
+        if long:
+            self.__csvf.writerow(
+                ['Name', 'Architecture', 'MHz', 'Benchmark'] +
+                [col for col, _ in self.BENCHMARK_COLUMNS]
+            )
+        else:
+            self.__csvf.writerow([
+                'Name',
+                'Description',
+                'Architecture',
+                'Embench version',
+                'MHz',
+                'Size geomean',
+                'Size geosd',
+                'Speed geomean',
+                'Speed geosd',
+                'Speed/MHz geomean',
+                'Speed/MHz geosd',
+            ])
+
+    @staticmethod
+    def __name(res):
+        """
+        The name of a result, which is its results file name without the
+        suffix.
+        """
+        name, _ = os.path.splitext(res.details_page())
+        return name
+
+    def __write_summary(self, res):
+        """
+        Write the summary row for a result.
+        """
+        row = [
+            self.__name(res),
+            res.desc(),
+            res.arch(),
+            res.embench_version(),
+            res.cpu_mhz(),
+        ]
+        for score in ['Size', 'Speed', 'Speed/MHz']:
+            rval = res.scores()[score]
+            if rval:
+                row.extend([rval.geomean(), rval.geosd()])
+            else:
+                row.extend(['', ''])
+
+        self.__csvf.writerow(row)
+
+    def __write_long(self, res):
+        """
+        Write a row for each benchmark of a result. This needs the full JSON
+        data for the result, which is only held while its rows are written.
+        """
+        json_data = res.details().json_data()
+        blocks = [
+            json_data.get(block, {}).get('detailed results', {})
+            for _, block in self.BENCHMARK_COLUMNS
+        ]
+
+        # Benchmarks in order of first appearance
+        names = dict()
+        for data in blocks:
+            names.update((name, None) for name in data)
+
+        prefix = [self.__name(res), res.arch(), res.cpu_mhz()]
+        self.__csvf.writerows(
+            prefix + [name] + [data.get(name, '') for data in blocks]
+            for name in names
+        )
+
+    def write(self, res):
+        """
+        Write out the rows for the supplied result.
+        """
+        if self.__long:
+            self.__write_long(res)
+        else:
+            self.__write_summary(res)
+
+    def close(self):
+        """
+        Close the CSV file.
+        """
+        self.__fileh.close()
+
+    def __enter__(self):
+        """
+        Context manager entry, just returns the exporter.
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Context manager exit, closes the CSV file.
+        """
+        self.close()
@@ -25,10 +25,27 @@ We have three main classes
 
 """
 
+# ProcessPoolExecutor and ResultArchive (which needs tarfile and zipfile)
+# are slow to import, and not needed to read a few plain files, so they are
+# imported where they are used.
+from array import array
+from copy import deepcopy
+from functools import partial
 from json import loads
 from json.decoder import JSONDecodeError
+import math
 import os
 import sys
+import time
+
+# Local packages
+from embres.bundle import ResultBundle
+from embres.schema import Schema, ValidationReport
+from embres.timing import Profiler
+from embres.utils import (
+    is_aggregate, is_archive, is_bundle, split_archive_path,
+    split_bundle_path
+)
 
 
 class Score:
@@ -36,6 +53,10 @@ class Score:
     A class to capture one set of scores (geometric mean and standard
     deviation) and compute the range derived from this.
     """
+    # There is one of these for each score of each result, so keep them
+    # small.
+    __slots__ = ('__geomean', '__geosd')
+
     def __init__(self, geomean, geosd):
         """
         Constructor sets the geometric mean and standard deviation.
@@ -76,31 +97,95 @@ class Score:
 class ResultDetails:
     """
     All the data on a particular run held in its JSON file.
+
+    The decoded data is only held until it is released. After that it is
+    decoded from the file afresh whenever it is needed, so that a large set
+    of results does not keep all its JSON data in memory. If created without
+    loading (as when the summary came from a ResultCache), the file is not
+    read at all until the data is first needed.
+
+    The data of a member of an archive or bundle may be held as the
+    undecoded contents of the member, since finding it in the archive or
+    bundle again could mean reading the whole archive or bundle. Once these
+    too are released, the details of many members are best worked through
+    with loaded, which reads each archive or bundle again in a single pass.
     """
-    def __init__(self, resfile):
+    __slots__ = ('__resfile', '__json_data', '__data')
+
+    def __init__(self, resfile, load=True, data=None):
         """
-        Initialize from a JSON file. If this fails, then the data will be
-        empty and we set the error fields.
+        Initialize from a JSON file. If load is not set, the file is not read
+        until the data is needed. If data is supplied, it is the contents of
+        the file as bytes, which is used instead of reading the file.
 
         Throws JSONDecodeError if the data is not valid
         """
         self.__resfile = resfile
         self.__json_data = None
+        self.__data = data
+
+        if load:
+            self.__json_data = self.__load()
+
+    def __load(self):
+        """
+        Read and decode the JSON file, or its contents if we hold them. A
+        file within an archive or bundle is read from the archive or bundle.
+
+        Throws JSONDecodeError if the data is not valid. For a line of a
+        bundle, the line number is that within the bundle.
+        """
+        data = self.__data
+        if data is None:
+            try:
+                with open(self.__resfile) as fileh:
+                    return loads(fileh.read())
+            except OSError:
+                if split_archive_path(self.__resfile)[0] is not None:
+                    from embres.archive import ResultArchive
+                    data = ResultArchive.read_member(self.__resfile)
+                elif split_bundle_path(self.__resfile)[0] is not None:
+                    data = ResultBundle.read_member(self.__resfile)
+                else:
+                    raise
 
-        with open(resfile) as fileh:
-            self.__json_data = loads(fileh.read())
+        try:
+            return loads(data)
+        except JSONDecodeError as ex:
+            _, line = split_bundle_path(self.__resfile)
+            if line is not None:
+                ex.lineno += line - 1
+            raise
 
     def desc(self):
         """
         Return the description. Only valid if we actually have data.
         """
-        assert self.json_data, "No valid JSON data"
-        return self.__json_data['description']
+        json_data = self.json_data()
+        assert json_data, "No valid JSON data"
+        return json_data['description']
+
+    def resfile(self):
+        """
+        Return the name of the file from which the data came.
+        """
+        return self.__resfile
+
+    def data(self):
+        """
+        Return the contents of the file as bytes if we hold them, otherwise
+        None.
+        """
+        return self.__data
 
     def json_data(self):
         """
-        Return the JSON data, which will be None if we have none
+        Return the JSON data, which will be None if we have none. If the data
+        has been released, it is read from the file again, but not held.
         """
+        if self.__json_data is None:
+            return self.__load()
+
         return self.__json_data
 
     def json_data_copy(self):
@@ -108,10 +193,86 @@ class ResultDetails:
         Return a copy of the JSON data, which can be safely manipulated
         without destroying the original. None if there is no data.
         """
-        if self.__json_data:
-            return self.__json_data.copy()
+        if self.__json_data is None:
+            # A fresh decode is already a copy
+            return self.__load()
 
-        return None
+        return deepcopy(self.__json_data)
+
+    def release(self):
+        """
+        Stop holding the decoded JSON data.
+        """
+        self.__json_data = None
+
+    def release_data(self):
+        """
+        Stop holding the contents of the file as well, unless this is a
+        result combining repeated runs, which has no file to read them from
+        again.
+        """
+        if not is_aggregate(self.__resfile):
+            self.__data = None
+
+    @staticmethod
+    def __reread(details, readers):
+        """
+        The supplied ResultDetails, or if it is a member of an archive or
+        bundle whose contents are not held, new ResultDetails holding them.
+        These are read with the generator for the archive or bundle in the
+        dictionary readers (as from the members method of ResultArchive or
+        ResultBundle). A generator which reaches the end without finding the
+        member is started again from the beginning, once.
+
+        If the contents cannot be read, the supplied ResultDetails are
+        returned, to fail when their data is needed.
+        """
+        resf = details.resfile()
+        if details.data() is not None:
+            return details
+
+        container, _ = split_archive_path(resf)
+        if container is None:
+            container, _ = split_bundle_path(resf)
+            if container is None:
+                return details
+
+        while True:
+            fresh = container not in readers
+            if fresh:
+                if is_bundle(container):
+                    readers[container] = ResultBundle(container).members()
+                else:
+                    from embres.archive import ResultArchive
+                    readers[container] = ResultArchive(container).members()
+
+            try:
+                for member, data in readers[container]:
+                    if member == resf:
+                        return ResultDetails(resf, load=False, data=data)
+            except OSError:
+                fresh = True
+
+            del readers[container]
+            if fresh:
+                return details
+
+    @staticmethod
+    def loaded(details_list):
+        """
+        Generator yielding each of the supplied iterable of ResultDetails in
+        turn, with the contents of any member of an archive or bundle read
+        again if they are not held. Each archive or bundle is read as the
+        members are needed, so members in the order they were first read
+        are read in a single pass, rather than each being found afresh.
+        """
+        readers = dict()
+        try:
+            for details in details_list:
+                yield ResultDetails.__reread(details, readers)
+        finally:
+            for reader in readers.values():
+                reader.close()
 
     def details_page(self):
         """
@@ -120,7 +281,14 @@ class ResultDetails:
         This is based on the JSON filename. We remove a .json suffix if it is
         there, otherwise we just use the basename.  Then add .mediawiki
         suffix.
+
+        A line of a bundle is named after the bundle and the line number.
         """
+        bundle, line = split_bundle_path(self.__resfile)
+        if bundle is not None:
+            root, _ = os.path.splitext(os.path.basename(bundle))
+            return f'{root}-{line}.mediawiki'
+
         basename = os.path.basename(self.__resfile)
         root, suffix = os.path.splitext(basename)
 
@@ -132,6 +300,11 @@ class ResultDetails:
 
         return pagename
 
+
+# The schema all results are validated against
+_SCHEMA = Schema()
+
+
 class InvalidResultError(Exception):
     """
     User exception when we have invalid JSON data for a result
@@ -155,130 +328,159 @@ class Result:
     Top level record of a result. Its contents are mostly derived from the
     ResultDetails, but potentially supplemented by a link to a page with
     details of the actual run.
+
+    We only keep the summary fields needed for the README tables. The
+    ResultDetails are released once the summary has been extracted, so the
+    full JSON data is only read again when a details page is written.
+
+    Results can be weakly referenced, so that renderings of them can be
+    cached for only as long as they are in use.
     """
-    def __validate_data(self):
+    __slots__ = (
+        '__result_details', '__desc', '__arch', '__embench_version',
+        '__cpu_mhz', '__scores', '__date_time', '__weakref__',
+    )
+
+    @staticmethod
+    def validate(json_data):
         """
-        Determine if the supplied data is valid, logging any omissions if a
-        log file is provided.
+        Determine if the supplied data is valid, against a Schema compiled
+        once for all results.
 
         Raises InvalidResultError if the JSON data is not good.
         """
-        json_data = self.__result_details.json_data()
-
-        # We shouldn't be able to get here without data
-        assert json_data, "No JSON data for Result"
-
-        # Must have key fields
-        missing_fields = set()
-        fields = {
-            'description', 'architecture family', 'Embench version',
-        }
-
-        for field in fields:
-            if not field in json_data:
-                missing_fields.add(field)
-
-        # Must have certain platform info
-        field = 'platform information'
-        missing_pfields = set()
-        if field in json_data:
-            pfields = {
-                'nominal clock rate (MHz)',
-                'max clock rate (MHz)',
-                'isa',
-                'address size (bits)',
-                'processor version',
-                'number of enabled cores',
-                'hardware threads per core',
-                'caches',
-                'thermal design power',
-                'program memory size (kB)',
-                'data memory size (kB)',
-                'storage',
-                'external memory',
-                'external buses',
-                'misc accellerators and I/O devices',
-                'OS and version',
-            }
-            pinfo = json_data[field]
-
-            for pfield in pfields:
-                if not pfield in pinfo:
-                    missing_pfields.add(pfield)
-        else:
-            missing_fields.add(field)
-
+        missing_fields, missing_pfields = _SCHEMA.check(json_data)
         if missing_fields or missing_pfields:
             raise InvalidResultError(missing_fields, missing_pfields)
 
-    def __init__(self, resfile):
+    @staticmethod
+    def summarize(json_data):
         """
-        Initialize from a JSON file.
+        Extract the summary of a result from its (valid) JSON data. This is a
+        tuple of plain values, suitable for caching, from which the Result
+        can be constructed.
+        """
+        size = None
+        if 'relative size results' in json_data:
+            size_data = json_data['relative size results']
+            size = (
+                size_data['geometric mean'],
+                size_data['geometric standard deviation']
+            )
+
+        # Speed data in file is per MHz
+        speed = None
+        if 'relative speed results' in json_data:
+            speed_data = json_data['relative speed results']
+            speed = (
+                speed_data['geometric mean'],
+                speed_data['geometric standard deviation']
+            )
+
+        return (
+            json_data['description'],
+            json_data['architecture family'],
+            json_data['Embench version'],
+            json_data['platform information']['nominal clock rate (MHz)'],
+            size,
+            speed,
+            json_data.get('date/time'),
+        )
+
+    def __init__(self, resfile, summary=None, data=None):
+        """
+        Initialize from a JSON file, or from a summary of that file (as
+        from the summary method) if supplied. If data is supplied, it is the
+        contents of the file as bytes (see ResultDetails).
 
         May pass on the following exceptions:
 
             JSONDecodeError -- the JSON file was not well formatted
             InvalidResultError -- Fields were missing or invalid in the JSON
         """
-        # Get the raw data and check it is good.
-        self.__result_details = ResultDetails(resfile)
-        self.__validate_data()
+        if summary:
+            self.__result_details = ResultDetails(
+                resfile, load=False, data=data
+            )
+        else:
+            # Get the raw data and check it is good.
+            self.__result_details = ResultDetails(resfile, data=data)
+            json_data = self.__result_details.json_data()
+            self.validate(json_data)
+            summary = self.summarize(json_data)
+            self.__result_details.release()
 
         # Now have good data.
-        json_data = self.__result_details.json_data()
+        (self.__desc, self.__arch, self.__embench_version, self.__cpu_mhz,
+         size, speed, self.__date_time) = summary
 
         # Collect data
         self.__scores = dict()
 
         # Size data
-        if 'relative size results' in json_data:
-            size_data = json_data['relative size results']
-            self.__scores['Size'] = Score(
-                size_data['geometric mean'],
-                size_data['geometric standard deviation']
-            )
+        if size:
+            self.__scores['Size'] = Score(*size)
         else:
             self.__scores['Size'] = None
 
         # Speed data in file is per MHz
-        if 'relative speed results' in json_data:
-            speed_data = json_data['relative speed results']
-            self.__scores['Speed/MHz'] = Score(
-                speed_data['geometric mean'],
-                speed_data['geometric standard deviation']
-            )
+        if speed:
+            self.__scores['Speed/MHz'] = Score(*speed)
             self.__scores['Speed'] = Score(
-                self.__scores['Speed/MHz'].geomean() * self.cpu_mhz(),
+                self.__scores['Speed/MHz'].geomean() * self.__cpu_mhz,
                 self.__scores['Speed/MHz'].geosd()
             )
         else:
             self.__scores['Speed'] = None
             self.__scores['Speed/MHz'] = None
 
+    def summary(self):
+        """
+        Return the summary of this result, from which it can be
+        reconstructed without reading the JSON file again.
+        """
+        size = None
+        if self.__scores['Size']:
+            size = (self.__scores['Size'].geomean(),
+                    self.__scores['Size'].geosd())
+
+        speed = None
+        if self.__scores['Speed/MHz']:
+            speed = (self.__scores['Speed/MHz'].geomean(),
+                     self.__scores['Speed/MHz'].geosd())
+
+        return (self.__desc, self.__arch, self.__embench_version,
+                self.__cpu_mhz, size, speed, self.__date_time)
+
     def desc(self):
         """
         Accessor for the test desc.
         """
-        return self.__result_details.json_data()['description']
+        return self.__desc
 
     def arch(self):
         """
         Accessor for the architecture family.
         """
-        return self.__result_details.json_data()['architecture family']
+        return self.__arch
 
     def embench_version(self):
         """
         Accessor for the Embench version
         """
-        return self.__result_details.json_data()['Embench version']
+        return self.__embench_version
 
     def cpu_mhz(self):
         """
         Accessor for the clock speed used for the test
         """
-        pinfo = self.__result_details.json_data()['platform information']
-        return pinfo['nominal clock rate (MHz)']
+        return self.__cpu_mhz
+
+    def date_time(self):
+        """
+        Accessor for the date and time of the test, None if not recorded
+        """
+        return self.__date_time
 
     def scores(self):
         """
@@ -299,15 +501,48 @@ class Result:
         return self.__result_details.details_page()
 
 
+def _load_result(resf, data=None, result_filter=None):
+    """
+    Read and validate a single result file, or its contents as bytes if
+    data is supplied. If a ResultFilter is supplied, a file which certainly
+    does not match it, judging by the start of the file, is not read in full.
+
+    This is a module level function, so it can be run in a worker process.
+    No logging is done here, since the log only exists in the main process.
+    Instead we return a tuple of the result, the problem with the file (as
+    from ValidationReport.problem) and the time in seconds taken. The
+    result is None if the file could not be used, and the problem is None if
+    the file is valid or was not read in full.
+    """
+    start = time.perf_counter()
+    result = None
+    problem = None
+    try:
+        if not result_filter or result_filter.might_match(resf, data):
+            result = Result(resf, data=data)
+    except (JSONDecodeError, InvalidResultError) as ex:
+        problem = ValidationReport.problem(ex)
+
+    return result, problem, time.perf_counter() - start
+
+
 class ResultSet:
     """
     Collection of results. This is primarily to encapsulate the process of
     enumerating and reading all the result files.
     """
+    # How many results of an archive or bundle to read into memory at once,
+    # for each job
+    MEMBER_BATCH = 256
+
     @staticmethod
-    def __collate_files(rootdir, log, resdir, resfiles):
+    def collate_files(rootdir, log, resdir, resfiles):
         """
         Collate all the result files. It must be a list so we can sort it.
+        Bundles are included as they are, being read later.
+
+        This is the first step of reading a set of results, the arguments
+        being as for the constructor.
         """
         # Build up a list.
         filelist = []
@@ -327,6 +562,9 @@ class ResultSet:
                         else:
                             log.warning(f'Warning: Unable to find result file '
                                         f'{resf}: ignored')
+        elif is_bundle(resdir) and os.path.isfile(resdir):
+            # Just the one bundle
+            filelist.append(resdir)
         else:
             # All results files. No need to sort them, since they'll get
             # sorted later.
@@ -334,7 +572,8 @@ class ResultSet:
             for resf in dirlist:
                 _, suffix = os.path.splitext(resf)
                 absresf = os.path.join(resdir, resf)
-                if (suffix == '.json' and os.path.isfile(absresf) and
+                if (suffix in ('.json', '.jsonl') and
+                        os.path.isfile(absresf) and
                         os.access(absresf, os.R_OK)):
                     filelist.append(absresf)
 
@@ -345,44 +584,276 @@ class ResultSet:
 
         return filelist
 
-    def __init__(self, rootdir, log, resdir, resfiles):
+    @staticmethod
+    def __load_files(filelist, jobs, result_filter=None, datalist=None,
+                     pool=None):
+        """
+        Generator yielding the (result, problem, seconds) tuple for each
+        file in filelist, in the order of filelist. Files which certainly do
+        not match the ResultFilter, if supplied, are not read in full and
+        have no result. If datalist is supplied, it is the contents of each
+        file as bytes, and no file is read.
+
+        With more than one job, the files are parsed and validated in a pool
+        of worker processes, the supplied ProcessPoolExecutor if there is
+        one. The pool returns its results in the order they were submitted,
+        so the output is the same as for a serial load.
+        """
+        load = partial(_load_result, result_filter=result_filter)
+        if datalist is None:
+            datalist = [None] * len(filelist)
+
+        if jobs > 1 and len(filelist) > 1:
+            # Hand out work in chunks to keep the interprocess traffic down,
+            # while still giving each worker several chunks to balance load.
+            chunksize = max(1, len(filelist) // (jobs * 4))
+            if pool:
+                yield from pool.map(load, filelist, datalist,
+                                    chunksize=chunksize)
+            else:
+                from concurrent.futures import ProcessPoolExecutor
+                with ProcessPoolExecutor(max_workers=jobs) as pool:
+                    yield from pool.map(load, filelist, datalist,
+                                        chunksize=chunksize)
+        else:
+            for resf, data in zip(filelist, datalist):
+                yield load(resf, data)
+
+    @staticmethod
+    def __chunks(members, size):
+        """
+        Generator grouping the (file name, contents) tuples from members into
+        batches of up to size, each a tuple of the list of file names and the
+        list of the contents.
+        """
+        filelist = []
+        datalist = []
+        for resf, data in members:
+            filelist.append(resf)
+            datalist.append(data)
+            if len(filelist) >= size:
+                yield filelist, datalist
+                filelist = []
+                datalist = []
+
+        if filelist:
+            yield filelist, datalist
+
+    @classmethod
+    def __batches(cls, log, filelist, size):
+        """
+        Generator yielding the results in the supplied list of files in
+        batches, each a tuple of a list of file names and a list of the
+        contents of each as bytes, or None if the files are to be read as
+        they are loaded.
+
+        Each run of results files is one batch, with no contents. Bundles are
+        read line by line, and yielded in batches of up to size results, so
+        only one batch need be in memory at a time.
+        """
+        files = []
+        for resf in filelist:
+            if not is_bundle(resf):
+                files.append(resf)
+                continue
+
+            if files:
+                yield files, None
+                files = []
+
+            try:
+                yield from cls.__chunks(ResultBundle(resf).members(), size)
+            except OSError as osex:
+                log.warning(f'Warning: Unable to read results bundle ' +
+                            f'{resf}: {osex.strerror}: rest of bundle ' +
+                            f'ignored')
+
+        if files:
+            yield files, None
+
+    @classmethod
+    def __archive_batches(cls, log, archive, resfiles, size):
+        """
+        Generator reading the results files from the supplied absolute
+        archive file name in a single pass, just those named in resfiles if
+        it is not empty. They are yielded in batches as for __batches.
+        """
+        from embres.archive import ResultArchive
+        found = False
+        try:
+            for batch in cls.__chunks(
+                    ResultArchive(archive).members(resfiles or None), size
+            ):
+                found = True
+                yield batch
+        except OSError as ex:
+            log.error(f'ERROR: Unable to read results archive {archive}: ' +
+                      f'{ex}: exiting')
+            sys.exit(1)
+
+        # Sanity check
+        if not found:
+            log.error(f'ERROR: No results files found')
+            sys.exit(1)
+
+    @classmethod
+    def __stream_batch(cls, log, filelist, datalist, jobs, cache, profiler,
+                       result_filter, report, pool):
+        """
+        Generator yielding each valid result from the supplied list of files,
+        and if it is not None, list of their contents as bytes. The other
+        arguments are as for stream, with the ProcessPoolExecutor to use if
+        there are several jobs.
+        """
+        # Anything already in the cache need not be read.
+        if cache:
+            summaries = [cache.lookup(resf) for resf in filelist]
+        else:
+            summaries = [None] * len(filelist)
+
+        # Now read each file not in the cache, in the background if we have
+        # several jobs.
+        misses = [idx for idx, summary in enumerate(summaries)
+                  if summary is None]
+        loaded = cls.__load_files(
+            [filelist[idx] for idx in misses], jobs, result_filter,
+            None if datalist is None else [datalist[idx] for idx in misses],
+            pool
+        )
+
+        try:
+            # Work through the files in order, taking each from the cache or
+            # the files loaded. Reading JSON data may have failed, in which
+            # case we just have the problem to report.
+            for idx, (resf, summary) in enumerate(zip(filelist, summaries)):
+                if summary is not None:
+                    data = None if datalist is None else datalist[idx]
+                    result = Result(resf, summary, data)
+                    report.add(resf)
+                else:
+                    result, problem, seconds = next(loaded)
+                    profiler.record_file(resf, seconds)
+                    if result or problem:
+                        report.add(resf, problem)
+                    else:
+                        log.debug(f'{resf}: Not selected: ignored')
+
+                    # Cache anything we have read, selected or not
+                    if result and cache:
+                        cache.store(resf, result.summary())
+
+                if result:
+                    if result_filter and not result_filter.matches(result):
+                        log.debug(f'{resf}: Not selected: ignored')
+                    else:
+                        yield result
+        finally:
+            loaded.close()
+
+    @classmethod
+    def stream(cls, rootdir, log, resdir, resfiles, jobs=1, cache=None,
+               profiler=None, result_filter=None, report=None):
+        """
+        Generator yielding each valid result in turn, as it is read. Only the
+        list of file names is held, so this can be used to process any
+        number of results in constant memory. The arguments are as for the
+        constructor.
+
+        If resdir is an archive, it is read in a single pass, a batch of
+        files at a time, each being decoded straight from memory. Bundles are
+        read the same way, a batch of lines at a time.
+        """
+        if not profiler:
+            profiler = Profiler()
+
+        own_report = report is None
+        if own_report:
+            report = ValidationReport()
+
+        # Build up a list of files that may contain results, or read the
+        # archive holding them in batches.
+        size = cls.MEMBER_BATCH * jobs
+        if is_archive(resdir) and os.path.isfile(resdir):
+            batches = cls.__archive_batches(log, resdir, resfiles, size)
+        else:
+            with profiler.phase('Enumerate results files'):
+                filelist = cls.collate_files(rootdir, log, resdir, resfiles)
+            batches = cls.__batches(log, filelist, size)
+
+        # One pool of workers for all batches, only started once there is
+        # more than one file to read.
+        pool = None
+        try:
+            for filelist, datalist in batches:
+                if pool is None and jobs > 1 and len(filelist) > 1:
+                    from concurrent.futures import ProcessPoolExecutor
+                    pool = ProcessPoolExecutor(max_workers=jobs)
+                yield from cls.__stream_batch(
+                    log, filelist, datalist, jobs, cache, profiler,
+                    result_filter, report, pool
+                )
+        finally:
+            if pool:
+                pool.shutdown()
+            if cache:
+                cache.evict_missing()
+                cache.save()
+            if own_report:
+                report.report(log)
+
+    def __init__(self, rootdir, log, resdir, resfiles, jobs=1, cache=None,
+                 profiler=None, result_filter=None, report=None):
         """
         If we are given a list of resfiles, then read each as a JSON file to
         get the result details, otherwise enumerate all files with the suffix
-        '.json' in the resdir.
+        '.json' in the resdir. Files with the suffix '.jsonl' are bundles,
+        with one result on each line.
 
         Relative files are looked for first relative to resdir, then relative
         to rootdir
+
+        If jobs is more than 1, the files are read and validated by that many
+        worker processes. Any diagnostics are still logged in file order.
+
+        If a ResultCache is supplied, files which have not changed since they
+        were cached are not read again, and the cache is updated with any
+        new results and saved.
+
+        If a Profiler is supplied, it records the time to enumerate and read
+        the files, and the time to read each file.
+
+        If a ResultFilter is supplied, only results it selects are kept. As
+        far as possible, files are rejected without being read in full.
+
+        Files which are not valid results are recorded in the supplied
+        ValidationReport, for the caller to report. If none is supplied, the
+        problems are logged as a single report once all files are read.
+
+        The contents of members of archives and bundles are not held once
+        each is read, so must be read again to get at the details of the
+        results (see ResultDetails.loaded).
         """
-        # Build up a list of files that may contain results
-        filelist = self.__collate_files(rootdir, log, resdir, resfiles)
+        if not profiler:
+            profiler = Profiler()
 
-        # Now open each in turn and build up a list of results
+        self.__filter = result_filter
         self.__results = []
-        for resf in filelist:
-            # Reading JSON data may fail and is caught here.
-            result = None
-            try:
-                result = Result(resf)
-            except JSONDecodeError as jex:
-                log.warning(
-                    f'Warning: {resf}: Invalid JSON data at line ' +
-                    f'{jex.lineno}, column {jex.colno}: {jex.msg}: ' +
-                    f'result file ignored.'
-                )
-            except InvalidResultError as irex:
-                for mfield in irex.missing_fields:
-                    log.debug(f'{resf}: Missing JSON field {mfield}')
-                for mpfield in irex.missing_platform_fields:
-                    log.debug(
-                        f'{resf}: Missing JSON plaform info field {mpfield}'
-                    )
-                log.warning(
-                    f'Warning: {resf}: Missing JSON fields: result file ignored.'
-                )
+        with profiler.phase('Read results'):
+            for res in self.stream(rootdir, log, resdir, resfiles, jobs,
+                                   cache, profiler, result_filter, report):
+                res.details().release_data()
+                self.__results.append(res)
 
-            if result:
-                self.__results.append(result)
+    @classmethod
+    def from_results(cls, results):
+        """
+        Create a set from an existing list of results, without reading any
+        files.
+        """
+        result_set = cls.__new__(cls)
+        result_set.__filter = None
+        result_set.__results = list(results)
+        return result_set
 
     def sort(self, key, reverse):
         """
@@ -391,8 +862,133 @@ class ResultSet:
         """
         self.__results = sorted(self.__results, key=key, reverse=reverse)
 
+    def rankings(self, orderings):
+        """
+        Compute several orderings of the results in one go, without sorting
+        or copying the results themselves.
+
+        Each ordering is a tuple (score, reverse, by_arch), where score is
+        the name of the score to sort by ('Size', 'Speed' or 'Speed/MHz'),
+        reverse is as for the sorted function, and by_arch, if set, groups
+        the results by architecture family, sorting within each family.
+
+        Returns a list with a permutation for each ordering. A permutation is
+        a list of indices into the list of results. The sort keys are
+        extracted once into columns, so each sort is just over indices.
+
+        Orderings are computed in sequence, each starting from the previous
+        one, so results with equal scores appear in the same order as in
+        the previous ordering, just as for successive calls to sort. Results
+        without the score come last, in the order of the previous ordering.
+        """
+        # Extract the keys we need once for all orderings, with NaN for a
+        # missing score
+        columns = dict()
+        for score, _, _ in orderings:
+            if score not in columns:
+                columns[score] = array(
+                    'd', [res.scores()[score].geomean()
+                          if res.scores()[score] else math.nan
+                          for res in self.__results]
+                )
+
+        archs = None
+        if any(by_arch for _, _, by_arch in orderings):
+            archs = [res.arch() for res in self.__results]
+
+        # Now sort indices
+        perms = []
+        perm = list(range(len(self.__results)))
+        for score, reverse, by_arch in orderings:
+            col = columns[score]
+            perm = (sorted((idx for idx in perm if not math.isnan(col[idx])),
+                           key=col.__getitem__, reverse=reverse)
+                    + [idx for idx in perm if math.isnan(col[idx])])
+            if by_arch:
+                perm.sort(key=archs.__getitem__)
+
+            perms.append(perm)
+
+        return perms
+
+    def update(self, log, changed, removed, jobs=1, cache=None,
+               report=None):
+        """
+        Bring the set up to date after the supplied lists of absolute file
+        names have changed or been removed. Only the changed files are read,
+        with jobs, cache and report as for the constructor.
+
+        Results keep their place in the set, a changed file which is no
+        longer valid, or no longer selected by the set's ResultFilter, being
+        dropped, and results from new files are added at the end. All the
+        results of a changed bundle are read again.
+        """
+        own_report = report is None
+        if own_report:
+            report = ValidationReport()
+
+        # New result for each file, None if it has gone, including each
+        # line of a changed bundle, unless it is still there.
+        replaced = dict.fromkeys(removed)
+        bundles = {resf for resf in changed + removed if is_bundle(resf)}
+        if bundles:
+            for res in self.__results:
+                resf = res.details().resfile()
+                if split_bundle_path(resf)[0] in bundles:
+                    replaced[resf] = None
+
+        for filelist, datalist in self.__batches(
+                log, changed, self.MEMBER_BATCH * jobs
+        ):
+            for resf, (result, problem, _) in zip(
+                    filelist,
+                    self.__load_files(filelist, jobs, self.__filter, datalist)
+            ):
+                if result or problem:
+                    report.add(resf, problem)
+                else:
+                    log.debug(f'{resf}: Not selected: ignored')
+
+                if result and cache:
+                    cache.store(resf, result.summary())
+
+                if (result and self.__filter and
+                        not self.__filter.matches(result)):
+                    log.debug(f'{resf}: Not selected: ignored')
+                    result = None
+
+                if result:
+                    result.details().release_data()
+
+                replaced[resf] = result
+
+        results = []
+        for res in self.__results:
+            resf = res.details().resfile()
+            if resf in replaced:
+                res = replaced.pop(resf)
+                if res is None:
+                    continue
+            results.append(res)
+
+        results.extend(res for res in replaced.values() if res)
+        self.__results = results
+
+        if cache:
+            cache.evict_missing()
+            cache.save()
+        if own_report:
+            report.report(log)
+
     def results(self):
         """
         Accessor for the list of results.
         """
         return self.__results
+
+    def replace_results(self, results):
+        """
+        Replace the list of results, for example with results rescored
+        against a different reference.
+        """
+        self.__results = results
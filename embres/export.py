@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+
+# Module to export results in columnar form as part of the embres package
+
+# Copyright (C) 2020 Embecosm Limited
+#
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Module to export a whole set of results as a columnar store.
+
+The store is a directory with two tables, each a subdirectory holding one
+file per column.
+
+- runs: one row per result, with its metadata and scores.
+
+- benchmarks: one row per benchmark per result, with the absolute and
+  relative size and speed. The run column is the row of the result in the
+  runs table. Missing values are NaN.
+
+Each column is a NumPy .npy file, written here without needing NumPy. Numbers
+are little endian doubles or 32-bit integers, strings are fixed width
+UTF-32. Since the data in a .npy file is raw and aligned, it can be memory
+mapped, for example by numpy.load(..., mmap_mode='r'), or by ColumnStore
+below. A manifest, columns.json, lists the tables, their columns and types,
+and the number of rows.
+"""
+
+# System packages
+from array import array
+import ast
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+
+# Local packages
+from embres.data import ResultDetails
+
+
+class ColumnarExport:
+    """
+    A class to write out a set of results as a columnar store.
+    """
+    # Version of the store layout, recorded in the manifest.
+    VERSION = 1
+
+    # The per benchmark columns, with the JSON block each comes from.
+    BENCHMARK_COLUMNS = [
+        ('abs_size', 'absolute size results'),
+        ('rel_size', 'relative size results'),
+        ('abs_speed', 'absolute speed results'),
+        ('rel_speed', 'relative speed results'),
+    ]
+
+    def __init__(self, exportdir):
+        """
+        Record the absolute directory in which to create the store. It is
+        created if necessary.
+        """
+        self.__exportdir = exportdir
+
+    @staticmethod
+    def __number(val):
+        """
+        A value as a float, or NaN if it is not a number.
+        """
+        if isinstance(val, (int, float)) and not isinstance(val, bool):
+            return float(val)
+
+        return math.nan
+
+    @staticmethod
+    def __flags(tcinfo):
+        """
+        All the tool chain flags as a single string, each group of flags
+        preceded by its name.
+        """
+        flags = tcinfo.get('tool chain flags', {})
+        return ' '.join(
+            f'{field}: {" ".join(str(flag) for flag in val)}'
+            for field, val in flags.items()
+        )
+
+    @staticmethod
+    def write_npy(filename, data):
+        """
+        Write a column as a .npy file. The data is either an array, or a list
+        of strings. We write to a temporary file and rename, so a reader
+        never sees a partial column. This is also used for the summary of a
+        corpus of results (see embres.CorpusSummary).
+
+        Returns the NumPy type description of the column.
+        """
+        if isinstance(data, array):
+            descr = {'d': '<f8', 'i': '<i4'}[data.typecode]
+            if sys.byteorder != 'little':
+                data = array(data.typecode, data)
+                data.byteswap()
+            body = data.tobytes()
+        else:
+            width = max([len(val) for val in data] + [1])
+            descr = f'<U{width}'
+            body = b''.join(
+                val.ljust(width, '\0').encode('utf-32-le') for val in data
+            )
+
+        # Header padded with spaces, so the data starts on a 64 byte
+        # boundary, as NumPy expects.
+        header = (f"{{'descr': '{descr}', 'fortran_order': False, " +
+                  f"'shape': ({len(data)},), }}")
+        padding = 63 - (10 + len(header)) % 64
+        header = header + ' ' * padding + '\n'
+
+        tmpfile = f'{filename}.tmp{os.getpid()}'
+        with open(tmpfile, 'wb') as fileh:
+            fileh.write(b'\x93NUMPY\x01\x00')
+            fileh.write(struct.pack('<H', len(header)))
+            fileh.write(header.encode('latin1'))
+            fileh.write(body)
+        os.replace(tmpfile, filename)
+
+        return descr
+
+    def write(self, result_set):
+        """
+        Write out all the results in the supplied ResultSet. Each result's
+        JSON data is read once, in turn.
+
+        Raises OSError if the store cannot be written.
+        """
+        runs = {
+            'details_page': [],
+            'arch': [],
+            'description': [],
+            'embench_version': [],
+            'date_time': [],
+            'processor': [],
+            'compiler_version': [],
+            'compiler_flags': [],
+            'mhz': array('d'),
+            'size_geomean': array('d'),
+            'size_geosd': array('d'),
+            'speed_geomean': array('d'),
+            'speed_geosd': array('d'),
+            'speed_mhz_geomean': array('d'),
+            'speed_mhz_geosd': array('d'),
+        }
+        benchmarks = {
+            'run': array('i'),
+            'benchmark': [],
+        }
+        for col, _ in self.BENCHMARK_COLUMNS:
+            benchmarks[col] = array('d')
+
+        results = result_set.results()
+        for run, (res, details) in enumerate(zip(
+                results, ResultDetails.loaded(res.details() for res in results)
+        )):
+            json_data = details.json_data()
+            pinfo = json_data.get('platform information', {})
+            tcinfo = json_data.get('tool chain information', {})
+            tcvinfo = tcinfo.get('tool chain version', {})
+
+            runs['details_page'].append(res.details_page())
+            runs['arch'].append(str(res.arch()))
+            runs['description'].append(str(res.desc()))
+            runs['embench_version'].append(str(res.embench_version()))
+            runs['date_time'].append(str(json_data.get('date/time', '')))
+            runs['processor'].append(
+                str(pinfo.get('processor name', pinfo.get('isa', '')))
+            )
+            runs['compiler_version'].append(
+                str(tcvinfo.get('compiler version', ''))
+            )
+            runs['compiler_flags'].append(self.__flags(tcinfo))
+            runs['mhz'].append(self.__number(res.cpu_mhz()))
+
+            for score, prefix in [('Size', 'size'), ('Speed', 'speed'),
+                                  ('Speed/MHz', 'speed_mhz')]:
+                rval = res.scores()[score]
+                runs[f'{prefix}_geomean'].append(
+                    rval.geomean() if rval else math.nan
+                )
+                runs[f'{prefix}_geosd'].append(
+                    rval.geosd() if rval else math.nan
+                )
+
+            # The long table has a row for every benchmark in any block
+            blocks = [
+                json_data.get(block, {}).get('detailed results', {})
+                for _, block in self.BENCHMARK_COLUMNS
+            ]
+            names = []
+            for data in blocks:
+                names.extend(name for name in data if name not in names)
+
+            for name in names:
+                benchmarks['run'].append(run)
+                benchmarks['benchmark'].append(name)
+                for (col, _), data in zip(self.BENCHMARK_COLUMNS, blocks):
+                    benchmarks[col].append(self.__number(data.get(name)))
+
+        # Now write out the tables, then the manifest to say they are
+        # complete.
+        manifest = {'version': self.VERSION, 'tables': dict()}
+        for table, columns in [('runs', runs), ('benchmarks', benchmarks)]:
+            tabledir = os.path.join(self.__exportdir, table)
+            os.makedirs(tabledir, exist_ok=True)
+
+            coltypes = dict()
+            rows = 0
+            for col, data in columns.items():
+                coltypes[col] = self.write_npy(
+                    os.path.join(tabledir, f'{col}.npy'), data
+                )
+                rows = len(data)
+
+            manifest['tables'][table] = {'rows': rows, 'columns': coltypes}
+
+        manifest_file = os.path.join(self.__exportdir, 'columns.json')
+        tmpfile = f'{manifest_file}.tmp{os.getpid()}'
+        with open(tmpfile, 'w') as fileh:
+            json.dump(manifest, fileh, indent=1)
+        os.replace(tmpfile, manifest_file)
+
+
+class ColumnStore:
+    """
+    A class to read a columnar store written by ColumnarExport, without
+    needing NumPy. Numeric columns are memory mapped, so no data is copied.
+    """
+    def __init__(self, exportdir):
+        """
+        Read the manifest of the store in the supplied directory.
+
+        Raises OSError if there is no manifest and ValueError if it is not
+        valid.
+        """
+        self.__exportdir = exportdir
+        with open(os.path.join(exportdir, 'columns.json')) as fileh:
+            self.__manifest = json.load(fileh)
+
+        if self.__manifest.get('version') != ColumnarExport.VERSION:
+            raise ValueError(f'{exportdir}: unknown columnar store version')
+
+        # Keep the maps open as long as we are
+        self.__maps = []
+
+    def tables(self):
+        """
+        Return a dictionary keyed by table name, whose values are
+        dictionaries of column name to NumPy type description.
+        """
+        return {table: info['columns']
+                for table, info in self.__manifest['tables'].items()}
+
+    def column(self, table, col):
+        """
+        Return the named column of the named table. Numeric columns are a
+        memoryview of the mapped file, strings are a list.
+
+        Raises KeyError if there is no such column.
+        """
+        descr = self.__manifest['tables'][table]['columns'][col]
+        filename = os.path.join(self.__exportdir, table, f'{col}.npy')
+
+        with open(filename, 'rb') as fileh:
+            fileh.seek(8)
+            (hlen,) = struct.unpack('<H', fileh.read(2))
+            header = ast.literal_eval(fileh.read(hlen).decode('latin1'))
+            offset = 10 + hlen
+
+            if header['descr'].startswith('<U'):
+                width = int(header['descr'][2:])
+                body = fileh.read().decode('utf-32-le')
+                return [body[idx:idx + width].rstrip('\0')
+                        for idx in range(0, len(body), width)]
+
+            if header['shape'][0] == 0:
+                return memoryview(b'').cast({'<f8': 'd', '<i4': 'i'}[descr])
+
+            mapped = mmap.mmap(fileh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.__maps.append(mapped)
+        view = memoryview(mapped)[offset:]
+        if sys.byteorder != 'little':
+            # Can't map, so make a copy in the right order
+            data = array({'<f8': 'd', '<i4': 'i'}[descr], view.tobytes())
+            data.byteswap()
+            return memoryview(data)
+
+        return view.cast({'<f8': 'd', '<i4': 'i'}[descr])
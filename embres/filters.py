@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+
+# Module to select results as part of the embres package
+
+# Copyright (C) 2020 Embecosm Limited
+#
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Module to select results by architecture family, Embench version, date and
+description.
+
+Selection is applied as early as possible, so results which cannot match
+are never fully decoded or validated.
+
+- Results in a ResultCache are selected on their cached summary.
+
+- Otherwise the start of the file is examined first. The top level string
+  fields which precede any nested object or list (in practice the
+  description, Embench version, architecture family and date/time) are
+  picked out with a regular expression. If any of these does not match, the
+  file is rejected without being decoded.
+
+- Anything which gets through is selected on the full result, since a field
+  may come later in the file, or not be a string.
+"""
+
+# System packages
+from json import loads
+import re
+
+
+class ResultFilter:
+    """
+    A class to select results
+    """
+    # How much of the start of a file to examine
+    PEEK_SIZE = 1024
+
+    # The fields we look for at the start of a file, as JSON strings
+    PEEK_KEYS = {
+        '"architecture family"', '"Embench version"', '"date/time"',
+        '"description"',
+    }
+
+    # A top level field with a string value, preceded by the start of the
+    # object or the end of the previous field.
+    PEEK_FIELD = re.compile(
+        r'[{,]\s*("[^"\\]*(?:\\.[^"\\]*)*")\s*:\s*' +
+        r'("[^"\\]*(?:\\.[^"\\]*)*")'
+    )
+
+    # The start of a date
+    DATE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+    def __init__(self, archs=None, embench_versions=None, since=None,
+                 until=None, desc_regex=None):
+        """
+        Select results whose architecture family is in the list archs and
+        whose Embench version is in the list embench_versions, dated on or
+        between since and until (dates as YYYY-MM-DD) and whose description
+        matches the regular expression desc_regex. Any criterion which is
+        None is not applied.
+
+        Raises re.error if desc_regex is not a valid regular expression.
+        """
+        self.__archs = None
+        if archs is not None:
+            self.__archs = set(archs)
+
+        self.__embench_versions = None
+        if embench_versions is not None:
+            self.__embench_versions = {str(ver) for ver in embench_versions}
+
+        self.__since = since
+        self.__until = until
+
+        self.__desc_regex = None
+        if desc_regex is not None:
+            self.__desc_regex = re.compile(desc_regex)
+
+        self.__active = any(
+            crit is not None
+            for crit in [archs, embench_versions, since, until, desc_regex]
+        )
+
+    def active(self):
+        """
+        Accessor for whether any results are rejected at all.
+        """
+        return self.__active
+
+    def archs(self):
+        """
+        Accessor for the sorted list of architecture families selected, None
+        if any will do.
+        """
+        if self.__archs is None:
+            return None
+
+        return sorted(self.__archs)
+
+    def embench_versions(self):
+        """
+        Accessor for the sorted list of Embench versions selected, None if
+        any will do.
+        """
+        if self.__embench_versions is None:
+            return None
+
+        return sorted(self.__embench_versions)
+
+    def since(self):
+        """
+        Accessor for the earliest date selected, None if there is none.
+        """
+        return self.__since
+
+    def until(self):
+        """
+        Accessor for the latest date selected, None if there is none.
+        """
+        return self.__until
+
+    def desc_matches(self, desc):
+        """
+        Whether the supplied description is selected.
+        """
+        return ((self.__desc_regex is None)
+                or (isinstance(desc, str)
+                    and (self.__desc_regex.search(desc) is not None)))
+
+    def __date_matches(self, date_time):
+        """
+        Whether the supplied date/time is selected. A date/time which does
+        not start with a date cannot be selected by date.
+        """
+        if self.__since is None and self.__until is None:
+            return True
+
+        if not (isinstance(date_time, str) and self.DATE.match(date_time)):
+            return False
+
+        date = date_time[:10]
+        return (((self.__since is None) or (date >= self.__since))
+                and ((self.__until is None) or (date <= self.__until)))
+
+    def __rejects(self, fields):
+        """
+        Whether any of the supplied dictionary of field values, keyed by
+        their JSON name, rules out selection. Fields not in the dictionary
+        are not known, so do not rule anything out.
+        """
+        return ((('architecture family' in fields)
+                 and (self.__archs is not None)
+                 and (fields['architecture family'] not in self.__archs))
+                or (('Embench version' in fields)
+                    and (self.__embench_versions is not None)
+                    and (str(fields['Embench version']) not in
+                         self.__embench_versions))
+                or (('date/time' in fields)
+                    and not self.__date_matches(fields['date/time']))
+                or (('description' in fields)
+                    and not self.desc_matches(fields['description'])))
+
+    def matches(self, res):
+        """
+        Whether the supplied Result is selected.
+        """
+        return (not self.__active) or not self.__rejects({
+            'architecture family': res.arch(),
+            'Embench version': res.embench_version(),
+            'date/time': res.date_time(),
+            'description': res.desc(),
+        })
+
+    def might_match(self, resf, data=None):
+        """
+        Whether the result in the supplied file might be selected, judging
+        just by the start of the file, or of data, the contents of the file
+        as bytes, if supplied. This only returns False if the result is
+        certainly not selected. A file which cannot be read might match, so
+        that the error is reported when it is read in full.
+        """
+        if not self.__active:
+            return True
+
+        if data is None:
+            try:
+                with open(resf, 'rb') as fileh:
+                    data = fileh.read(self.PEEK_SIZE)
+            except OSError:
+                return True
+
+        text = data[:self.PEEK_SIZE].decode('utf-8', 'replace')
+
+        # Only look at the top level object, up to the first nested object
+        # or list.
+        start = text.find('{')
+        if start < 0:
+            return True
+
+        ends = [idx for idx in [text.find('{', start + 1),
+                                text.find('[', start + 1)] if idx >= 0]
+        head = text[start:min(ends, default=len(text))]
+
+        fields = dict()
+        for key, val in self.PEEK_FIELD.findall(head):
+            if key in self.PEEK_KEYS:
+                if '\\' in val:
+                    try:
+                        val = loads(val)
+                    except ValueError:
+                        continue
+                else:
+                    val = val[1:-1]
+
+                fields[key[1:-1]] = val
+
+        return not self.__rejects(fields)
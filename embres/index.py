@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+
+# Module to index results in SQLite as part of the embres package
+
+# Copyright (C) 2020 Embecosm Limited
+#
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Module to hold an index of results in a SQLite database.
+
+Once built, the index answers queries about the results without reading any
+results files. It is kept up to date incrementally: each file is recorded
+with its fingerprint (see embres.utils.file_fingerprint), and only files
+whose fingerprint has changed are read again. The tables are
+
+- runs: one row per valid result, with its metadata and scores.
+
+- platform: one row per field of the platform information of each run.
+
+- toolchain: one row per field of the tool chain version of each run.
+
+- toolchain_flags: one row per flag passed to each tool for each run, in
+  order.
+
+- benchmarks: one row per benchmark per run, with the absolute and relative
+  size and speed. Missing values are NULL.
+
+- rejected: results files which are not valid, so we need not read them
+  again until they change.
+
+Every table other than rejected is keyed by the id of the run. Runs are
+indexed by architecture, Embench version and clock rate, and benchmarks by
+name.
+"""
+
+# System packages
+from concurrent.futures import ProcessPoolExecutor
+from json import dumps
+from json.decoder import JSONDecodeError
+import sqlite3
+
+# Local packages
+from embres.bundle import ResultBundle
+from embres.data import InvalidResultError, Result, ResultDetails
+from embres.schema import ValidationReport
+from embres.utils import file_fingerprint, is_bundle, split_bundle_path
+
+
+def _sql_value(val):
+    """
+    A JSON value as something SQLite can hold. Structured values are held as
+    their JSON text.
+    """
+    if val is None or isinstance(val, (str, int, float)):
+        return val
+
+    return dumps(val)
+
+
+def _sql_number(val):
+    """
+    A JSON value as a number, or None if it is not a number.
+    """
+    if isinstance(val, (int, float)) and not isinstance(val, bool):
+        return val
+
+    return None
+
+
+def _index_record(resf, data=None):
+    """
+    Read and validate a single result file, or its contents as bytes if
+    data is supplied, extracting everything the index needs from it.
+
+    This is a module level function, so it can be run in a worker process.
+    Returns a tuple of the record (None if the file could not be used) and
+    the problem with the file (as from ValidationReport.problem, None if it
+    is valid). The record is a dictionary of the rows for each table,
+    without the run id.
+    """
+    try:
+        json_data = ResultDetails(resf, data=data).json_data()
+        Result.validate(json_data)
+    except (JSONDecodeError, InvalidResultError) as ex:
+        return None, ValidationReport.problem(ex)
+
+    res = Result(resf, Result.summarize(json_data))
+    scores = []
+    for score in ['Size', 'Speed', 'Speed/MHz']:
+        rval = res.scores()[score]
+        scores.extend([rval.geomean(), rval.geosd()] if rval else [None, None])
+
+    tcinfo = json_data.get('tool chain information', {})
+    blocks = [
+        json_data.get(block, {}).get('detailed results', {})
+        for block in ['absolute size results', 'relative size results',
+                      'absolute speed results', 'relative speed results']
+    ]
+
+    # Benchmarks in order of first appearance
+    names = dict()
+    for data in blocks:
+        names.update((name, None) for name in data)
+
+    record = {
+        'runs': [
+            res.details_page(),
+            _sql_value(res.desc()),
+            _sql_value(res.arch()),
+            _sql_value(res.embench_version()),
+            _sql_value(json_data.get('date/time')),
+            _sql_number(res.cpu_mhz()),
+        ] + scores,
+        'platform': [
+            (field, _sql_value(val))
+            for field, val in json_data['platform information'].items()
+        ],
+        'toolchain': [
+            (field, _sql_value(val))
+            for field, val in tcinfo.get('tool chain version', {}).items()
+        ],
+        'toolchain_flags': [
+            (tool, pos, _sql_value(flag))
+            for tool, flags in tcinfo.get('tool chain flags', {}).items()
+            for pos, flag in enumerate(flags)
+        ],
+        'benchmarks': [
+            [name] + [_sql_number(data.get(name)) for data in blocks]
+            for name in names
+        ],
+    }
+
+    return record, None
+
+
+class ResultIndex:
+    """
+    A class to build and query an index of results
+    """
+    # Bump this whenever the layout of the database changes, or results are
+    # validated differently, so that any old index is rebuilt rather than
+    # misinterpreted.
+    VERSION = 2
+
+    # The tables and indexes of the database.
+    SCHEMA = [
+        '''CREATE TABLE meta (
+             key TEXT PRIMARY KEY,
+             value
+           )''',
+        '''CREATE TABLE runs (
+             id INTEGER PRIMARY KEY,
+             file TEXT UNIQUE NOT NULL,
+             fingerprint TEXT NOT NULL,
+             details_page TEXT,
+             description TEXT,
+             arch TEXT,
+             embench_version TEXT,
+             date_time TEXT,
+             cpu_mhz REAL,
+             size_geomean REAL,
+             size_geosd REAL,
+             speed_geomean REAL,
+             speed_geosd REAL,
+             speed_mhz_geomean REAL,
+             speed_mhz_geosd REAL
+           )''',
+        '''CREATE TABLE platform (
+             run INTEGER NOT NULL REFERENCES runs(id),
+             field TEXT NOT NULL,
+             value
+           )''',
+        '''CREATE TABLE toolchain (
+             run INTEGER NOT NULL REFERENCES runs(id),
+             field TEXT NOT NULL,
+             value
+           )''',
+        '''CREATE TABLE toolchain_flags (
+             run INTEGER NOT NULL REFERENCES runs(id),
+             tool TEXT NOT NULL,
+             position INTEGER NOT NULL,
+             flag TEXT
+           )''',
+        '''CREATE TABLE benchmarks (
+             run INTEGER NOT NULL REFERENCES runs(id),
+             benchmark TEXT NOT NULL,
+             abs_size REAL,
+             rel_size REAL,
+             abs_speed REAL,
+             rel_speed REAL
+           )''',
+        '''CREATE TABLE rejected (
+             file TEXT PRIMARY KEY,
+             fingerprint TEXT NOT NULL
+           )''',
+        'CREATE INDEX runs_arch ON runs(arch)',
+        'CREATE INDEX runs_embench_version ON runs(embench_version)',
+        'CREATE INDEX runs_cpu_mhz ON runs(cpu_mhz)',
+        'CREATE INDEX platform_run ON platform(run)',
+        'CREATE INDEX toolchain_run ON toolchain(run)',
+        'CREATE INDEX toolchain_flags_run ON toolchain_flags(run)',
+        'CREATE INDEX benchmarks_run ON benchmarks(run)',
+        'CREATE INDEX benchmarks_benchmark ON benchmarks(benchmark)',
+    ]
+
+    # Tables holding data for each run, other than runs itself
+    RUN_TABLES = ['platform', 'toolchain', 'toolchain_flags', 'benchmarks']
+
+    # For each score, the column holding it in the runs table, the column
+    # holding it for a single benchmark, and whether larger is better.
+    SCORES = {
+        'Size': ('size_geomean', 'rel_size', False),
+        'Speed': ('speed_geomean', 'rel_speed * runs.cpu_mhz', True),
+        'Speed/MHz': ('speed_mhz_geomean', 'rel_speed', True),
+    }
+
+    def __init__(self, dbfile, log, content_hash=False):
+        """
+        Open the index in the supplied absolute file name, creating it if it
+        does not exist. An index of the wrong version, or using a different
+        fingerprint, is emptied, to be rebuilt by the next update.
+
+        If content_hash is set, files are fingerprinted by a digest of their
+        contents rather than their modification time.
+
+        Raises sqlite3.Error if the database cannot be opened.
+        """
+        self.__log = log
+        self.__content_hash = content_hash
+        self.__db = sqlite3.connect(dbfile)
+
+        version = self.__db.execute('PRAGMA user_version').fetchone()[0]
+        meta = dict()
+        if version == self.VERSION:
+            meta = dict(self.__db.execute('SELECT key, value FROM meta'))
+
+        if meta.get('content hash') != int(content_hash):
+            if version:
+                log.debug(f'Index {dbfile} is out of date: rebuilt')
+            self.__create()
+
+    def __create(self):
+        """
+        Create all the tables and indexes, dropping any there already.
+        """
+        with self.__db:
+            tables = [name for (name,) in self.__db.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"
+            )]
+            for table in tables:
+                self.__db.execute(f'DROP TABLE {table}')
+
+            for stmt in self.SCHEMA:
+                self.__db.execute(stmt)
+
+            self.__db.execute('INSERT INTO meta VALUES (?, ?)',
+                              ('content hash', int(self.__content_hash)))
+            self.__db.execute(f'PRAGMA user_version = {self.VERSION}')
+
+    @staticmethod
+    def __read_files(filelist, jobs, datalist=None):
+        """
+        Generator yielding the (record, problem) tuple for each file in
+        filelist, in the order of filelist, using a pool of worker processes
+        if there is more than one job. If datalist is supplied, it is the
+        contents of each file as bytes, and no file is read.
+        """
+        if datalist is None:
+            datalist = [None] * len(filelist)
+
+        if jobs > 1 and len(filelist) > 1:
+            chunksize = max(1, len(filelist) // (jobs * 4))
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                yield from pool.map(_index_record, filelist, datalist,
+                                    chunksize=chunksize)
+        else:
+            for resf, data in zip(filelist, datalist):
+                yield _index_record(resf, data)
+
+    def __record(self, report, resf, fingerprint, record, problem):
+        """
+        Record the supplied record (or problem) read from a file with the
+        supplied fingerprint, replacing anything recorded before.
+        """
+        report.add(resf, problem)
+        self.__remove(resf)
+        if record:
+            self.__insert(resf, fingerprint, record)
+        else:
+            self.__db.execute('INSERT INTO rejected VALUES (?, ?)',
+                              (resf, fingerprint))
+
+    def __remove(self, resf):
+        """
+        Remove everything recorded for the supplied file.
+        """
+        row = self.__db.execute('SELECT id FROM runs WHERE file = ?',
+                                (resf,)).fetchone()
+        if row:
+            for table in self.RUN_TABLES:
+                self.__db.execute(f'DELETE FROM {table} WHERE run = ?', row)
+            self.__db.execute('DELETE FROM runs WHERE id = ?', row)
+
+        self.__db.execute('DELETE FROM rejected WHERE file = ?', (resf,))
+
+    def __insert(self, resf, fingerprint, record):
+        """
+        Insert the record for the supplied file.
+        """
+        run = self.__db.execute(
+            'INSERT INTO runs VALUES (NULL, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ' +
+            '?, ?, ?, ?)',
+            [resf, fingerprint] + record['runs']
+        ).lastrowid
+
+        self.__db.executemany('INSERT INTO platform VALUES (?, ?, ?)',
+                              [(run,) + row for row in record['platform']])
+        self.__db.executemany('INSERT INTO toolchain VALUES (?, ?, ?)',
+                              [(run,) + row for row in record['toolchain']])
+        self.__db.executemany(
+            'INSERT INTO toolchain_flags VALUES (?, ?, ?, ?)',
+            [(run,) + row for row in record['toolchain_flags']]
+        )
+        self.__db.executemany(
+            'INSERT INTO benchmarks VALUES (?, ?, ?, ?, ?, ?)',
+            [[run] + row for row in record['benchmarks']]
+        )
+
+    def update(self, filelist, jobs=1, report=None, prune=True):
+        """
+        Bring the index up to date with the supplied list of absolute file
+        names. Only files which are new or have changed since they were
+        indexed are read, using that many worker processes if jobs is more
+        than 1. If prune is set, the list is all the results files, and files
+        no longer in the list are removed from the index. Otherwise only the
+        files in the list are updated, and the rest of the index is left
+        alone. The update is a single transaction, so an index is never left
+        partly updated.
+
+        Each line of a bundle is indexed as a file of its own (see
+        embres.utils.split_bundle_path), with the fingerprint of the bundle.
+        If the bundle changes, all its lines are read again.
+
+        Files read which are not valid results are recorded in the supplied
+        ValidationReport. If none is supplied, they are logged as a single
+        report at the end.
+
+        Returns a tuple of the number of files read and the number removed.
+        """
+        own_report = report is None
+        if own_report:
+            report = ValidationReport()
+
+        known = dict(self.__db.execute('SELECT file, fingerprint FROM runs'))
+        known.update(
+            self.__db.execute('SELECT file, fingerprint FROM rejected')
+        )
+
+        # The lines of each bundle indexed
+        lines = dict()
+        for resf in known:
+            bundle, _ = split_bundle_path(resf)
+            if bundle is not None:
+                lines.setdefault(bundle, []).append(resf)
+
+        changed = []
+        bundles = []
+        stale = []
+        for resf in filelist:
+            try:
+                fingerprint = dumps(
+                    file_fingerprint(resf, self.__content_hash)
+                )
+            except OSError as osex:
+                self.__log.warning(f'Warning: {resf}: {osex.strerror}: ' +
+                                   f'result file ignored.')
+                continue
+
+            if not is_bundle(resf):
+                if known.pop(resf, None) != fingerprint:
+                    changed.append((resf, fingerprint))
+                continue
+
+            # Lines of a bundle are read again together.
+            indexed = [known.pop(line) for line in lines.get(resf, [])]
+            if (not indexed) or any(old != fingerprint for old in indexed):
+                bundles.append((resf, fingerprint))
+                stale.extend(lines.get(resf, []))
+
+        # Anything left in known is no longer in the list, so has gone if
+        # the list is all the results files.
+        removed = list(known) if prune else []
+        read = len(changed)
+        with self.__db:
+            for resf in removed + stale:
+                self.__remove(resf)
+
+            records = self.__read_files([resf for resf, _ in changed], jobs)
+            for (resf, fingerprint), (record, problem) in zip(changed,
+                                                              records):
+                self.__record(report, resf, fingerprint, record, problem)
+
+            for bundle, fingerprint in bundles:
+                try:
+                    for resf, data in ResultBundle(bundle).members():
+                        record, problem = _index_record(resf, data)
+                        self.__record(report, resf, fingerprint, record,
+                                      problem)
+                        read += 1
+                except OSError as osex:
+                    self.__log.warning(f'Warning: Unable to read results ' +
+                                       f'bundle {bundle}: {osex.strerror}: ' +
+                                       f'rest of bundle ignored')
+
+        if own_report:
+            report.report(self.__log)
+
+        return read, len(removed)
+
+    def __filter_conds(self, result_filter, conds, params):
+        """
+        Add the conditions and their parameters to select the results
+        selected by the supplied ResultFilter to the lists supplied.
+        """
+        for column, vals in [('arch', result_filter.archs()),
+                             ('embench_version',
+                              result_filter.embench_versions())]:
+            if vals is not None:
+                conds.append(f'runs.{column} IN ' +
+                             f'({", ".join("?" * len(vals))})')
+                params.extend(vals)
+
+        since = result_filter.since()
+        until = result_filter.until()
+        if since is not None or until is not None:
+            conds.append("runs.date_time GLOB " +
+                         "'[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*'")
+            if since is not None:
+                conds.append('substr(runs.date_time, 1, 10) >= ?')
+                params.append(since)
+            if until is not None:
+                conds.append('substr(runs.date_time, 1, 10) <= ?')
+                params.append(until)
+
+        # Regular expressions are matched by the filter itself
+        self.__db.create_function('desc_matches', 1,
+                                  result_filter.desc_matches)
+        conds.append('desc_matches(runs.description)')
+
+    def top(self, score='Speed/MHz', count=20, result_filter=None,
+            benchmark=None):
+        """
+        Return the best count results for the named score ('Size', 'Speed'
+        or 'Speed/MHz'), optionally only those selected by the supplied
+        ResultFilter. If a benchmark is named, results are ranked by their
+        relative score for that benchmark alone.
+
+        The result is a list of tuples of details page, description,
+        architecture family, Embench version, clock rate and score.
+        """
+        column, bench_column, larger = self.SCORES[score]
+        if benchmark:
+            column = f'benchmarks.{bench_column}'
+            tables = 'runs JOIN benchmarks ON benchmarks.run = runs.id'
+            conds = ['benchmarks.benchmark = ?']
+            params = [benchmark]
+        else:
+            column = f'runs.{column}'
+            tables = 'runs'
+            conds = []
+            params = []
+
+        conds.append(f'{column} IS NOT NULL')
+        if result_filter and result_filter.active():
+            self.__filter_conds(result_filter, conds, params)
+
+        order = 'DESC' if larger else 'ASC'
+        return self.__db.execute(
+            f'SELECT runs.details_page, runs.description, runs.arch, ' +
+            f'runs.embench_version, runs.cpu_mhz, {column} ' +
+            f'FROM {tables} WHERE {" AND ".join(conds)} ' +
+            f'ORDER BY {column} {order}, runs.details_page LIMIT ?',
+            params + [count]
+        ).fetchall()
+
+    def execute(self, sql):
+        """
+        Run an arbitrary SQL query against the index, which is not allowed
+        to change it.
+
+        Returns a tuple of the list of column names and the list of rows.
+        Raises sqlite3.Error if the query is not valid.
+        """
+        self.__db.execute('PRAGMA query_only = ON')
+        try:
+            cursor = self.__db.execute(sql)
+            rows = cursor.fetchall()
+        finally:
+            self.__db.execute('PRAGMA query_only = OFF')
+
+        columns = [desc[0] for desc in cursor.description or []]
+        return columns, rows
+
+    def close(self):
+        """
+        Close the database.
+        """
+        self.__db.close()
@@ -102,3 +102,20 @@ class Logger:
         Log an error message to the console and log file.
         """
         self.__log.error(msg)
+
+    def table(self, headings, rows):
+        """
+        Log a table with the supplied column headings and rows to the console
+        and log file, each column as wide as its widest entry.
+        """
+        rows = [['' if val is None else str(val) for val in row]
+                for row in rows]
+        widths = [
+            max([len(heading)] + [len(row[col]) for row in rows])
+            for col, heading in enumerate(headings)
+        ]
+
+        for row in [headings, ['-' * width for width in widths]] + rows:
+            self.__log.info('  '.join(
+                f'{val:{width}}' for val, width in zip(row, widths)
+            ).rstrip())
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+# Module to select the best results as part of the embres package
+
+# Copyright (C) 2020 Embecosm Limited
+#
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Module to select the best results for each of several orderings, as results
+are read, holding just those selected, however many results there are.
+
+Each ordering has a heap of the results selected so far, with the worst at
+the top, so a new result need only be compared with that. An ordering
+grouped by architecture family has a heap for each family.
+
+The orderings are exactly those of ResultSet.rankings, ties included, so a
+table of the selected results is the start of the full table (or for an
+ordering grouped by architecture family, the start of each family's part of
+it). ResultSet.rankings sorts each ordering starting from the previous one,
+so ties are broken by the previous ordering, and ties in the first ordering
+by the order the results were read. Here each result has a key for each
+ordering which captures this, made up of its architecture family if the
+ordering is grouped by family, 0 and its score, negated if the best score is
+the largest, and then its key for the previous ordering. A result without
+the score has 1 in place of 0 and the score, so it comes after all those
+with it, just as in ResultSet.rankings. The key for the first ordering ends
+with the number of the result in the order read.
+"""
+
+# System packages
+import heapq
+
+# Local packages
+from embres.data import ResultSet
+
+
+class _Entry:
+    """
+    A result in a heap, with its key for the heap's ordering. The comparison
+    is reversed, so the heap has the worst result at the top.
+    """
+    __slots__ = ('key', 'res')
+
+    def __init__(self, key, res):
+        """
+        Hold the supplied key and result.
+        """
+        self.key = key
+        self.res = res
+
+    def __lt__(self, other):
+        """
+        Whether this entry should be nearer the top of the heap, which it
+        should if its result is worse.
+        """
+        return self.key > other.key
+
+
+class TopRankings:
+    """
+    A class to select the best results for each of several orderings
+    """
+    def __init__(self, orderings, count):
+        """
+        Select the best count results for each of the orderings, each a tuple
+        (score, reverse, by_arch) as for ResultSet.rankings. For an ordering
+        grouped by architecture family, the best count results of each family
+        are selected.
+        """
+        self.__orderings = orderings
+        self.__count = count
+
+        # For each ordering, a dictionary of heaps keyed by architecture
+        # family, or with a single heap keyed by None if the ordering is not
+        # grouped by family.
+        self.__heaps = [dict() for _ in orderings]
+
+        # Number of results added
+        self.__added = 0
+
+    def add(self, res):
+        """
+        Consider the supplied Result for selection.
+        """
+        key = (self.__added,)
+        self.__added += 1
+
+        scores = res.scores()
+        arch = res.arch()
+        for (score, reverse, by_arch), heaps in zip(self.__orderings,
+                                                    self.__heaps):
+            if scores[score]:
+                geomean = scores[score].geomean()
+                rank = (0, -geomean if reverse else geomean)
+            else:
+                rank = (1,)
+
+            if by_arch:
+                key = (arch,) + rank + key
+                heap = heaps.setdefault(arch, [])
+            else:
+                key = rank + key
+                heap = heaps.setdefault(None, [])
+
+            if len(heap) < self.__count:
+                heapq.heappush(heap, _Entry(key, res))
+            elif key < heap[0].key:
+                heapq.heapreplace(heap, _Entry(key, res))
+
+    def added(self):
+        """
+        Accessor for the number of results considered.
+        """
+        return self.__added
+
+    def result_set(self):
+        """
+        Return a ResultSet of all the results selected for any ordering, in
+        the order they were added, together with a list with a permutation
+        of its results for each ordering, as from ResultSet.rankings, with
+        just the results selected for that ordering.
+        """
+        # The number of each result in the order added is the last part of
+        # any of its keys.
+        selected = dict()
+        for heaps in self.__heaps:
+            for heap in heaps.values():
+                for entry in heap:
+                    selected[entry.key[-1]] = entry.res
+
+        numbers = sorted(selected)
+        index = {num: idx for idx, num in enumerate(numbers)}
+
+        perms = []
+        for heaps in self.__heaps:
+            keys = sorted(entry.key for heap in heaps.values()
+                          for entry in heap)
+            perms.append([index[key[-1]] for key in keys])
+
+        return ResultSet.from_results(selected[num] for num in numbers), perms
@@ -18,18 +18,63 @@ sections based on different orderings.
 """
 
 # System packages
+from concurrent.futures import ThreadPoolExecutor
+import io
+from itertools import islice
+import json
+import os
 import os.path
+from weakref import WeakKeyDictionary
+
+# Local packages
+from embres.data import ResultDetails, ResultSet
+from embres.utils import (
+    data_fingerprint, file_fingerprint, is_aggregate, path_exists
+)
+from embres.writer import BufferedWriter
 
 
 class Readme:
     """
     A class to handle README file generation
     """
-    def __init__(self, readme_hdr, readme, absdetailsdir, detailsdir):
+    # Version of the details page rendering. Bump this whenever the content
+    # generated for a details page changes, so that incremental runs
+    # regenerate every page.
+    RENDERER_VERSION = 1
+
+    # Name of the manifest of details pages, held in the details directory
+    MANIFEST = '.manifest.json'
+
+    # The tables in the README, each with its title, the score to sort by,
+    # whether to reverse the sort (large is good) and whether to group by
+    # architecture. The last three are as for ResultSet.rankings.
+    TABLES = [
+        ('Results sorted by Embench speed score',
+         'Speed', True, False),
+        ('Results sorted by Embench speed score/MHz',
+         'Speed/MHz', True, False),
+        ('Results sorted by Embench size score',
+         'Size', False, False),
+        ('Per architecture results sorted by Embench speed score',
+         'Speed', True, True),
+        ('Per architecture results sorted by Embench speed score/MHz',
+         'Speed/MHz', True, True),
+        ('Per achitecture results sorted by Embench size score',
+         'Size', False, True),
+    ]
+
+    def __init__(self, readme_hdr, readme, absdetailsdir, detailsdir,
+                 atomic=False):
         """
         The constructor just keeps a copy of the file handles, creates a
         writer for details pages and the relative directory with pages of
         details.
+
+        The README handle will usually be a BufferedWriter, or None if it is
+        only opened when the README is written (see reopen). If atomic is
+        set, details pages are written to a temporary file and renamed into
+        place.
         """
         # Sanity check
         assert os.path.isabs(absdetailsdir), f'{absdetailsdir} is relative'
@@ -39,60 +84,118 @@ class Readme:
         self.__readme = readme
         self.__absdetailsdir = absdetailsdir
         self.__detailsdir = detailsdir
+        self.__atomic = atomic
+
+        # The header, once read, so the README can be written again
+        self.__header = None
+
+        # Each result's block of rows in a table, once rendered. Every
+        # table has the same rows for a result, just in a different
+        # order, so each is only rendered once. The rendering only
+        # depends on the result and our settings, which are fixed, so
+        # the cache is ours and keyed by the result itself. It is weak,
+        # so results which are no longer used (for example when watching
+        # for changes) are dropped.
+        self.__rows = WeakKeyDictionary()
 
-    def __wiki_tblhdr(self):
+    @staticmethod
+    def __wiki_tblhdr():
         """
-        Private method to write out the standard wiki table header.
+        Private method to generate the standard wiki table header.
         """
         # Header is all fixed.
-        self.__readme.writelines('{| class="wikitable sortable"\n')
-        self.__readme.writelines('! align="left"  | Architecture\n')
-        self.__readme.writelines('! align="left"  | Benchmark description\n')
-        self.__readme.writelines('! align="right" | MHz\n')
-        self.__readme.writelines('! align="left"  | Type\n')
-        self.__readme.writelines('! align="right" | Score\n')
-        self.__readme.writelines('! align="center" | Range\n')
-
-    def __wiki_tblrow(self, res):
+        return ('{| class="wikitable sortable"\n'
+                '! align="left"  | Architecture\n'
+                '! align="left"  | Benchmark description\n'
+                '! align="right" | MHz\n'
+                '! align="left"  | Type\n'
+                '! align="right" | Score\n'
+                '! align="center" | Range\n')
+
+    def __render_tblrow(self, res):
         """
-        Private method to write out one row of wiki table data for the
+        Private method to render one row of wiki table data for the
         supplied result file.
         """
-        # Put out the lines
-        self.__readme.writelines(f'|- align="left"\n')
-        self.__readme.writelines(f'|  rowspan="3" | {res.arch()}\n')
+        # The lines common to all types of result
         dref = f'{self.__detailsdir}/{res.details_page()}'
-        self.__readme.writelines(f'|  rowspan="3" | [[{dref}|{res.desc()}]]\n')
-        self.__readme.writelines(f'|  align="right" rowspan="3" | '
-                                 f'{res.cpu_mhz()}\n')
+        lines = [
+            f'|- align="left"\n'
+            f'|  rowspan="3" | {res.arch()}\n'
+            f'|  rowspan="3" | [[{dref}|{res.desc()}]]\n'
+            f'|  align="right" rowspan="3" | {res.cpu_mhz()}\n'
+        ]
 
         # Line for each type of result
         resvals = res.scores()
 
         for rtype in ['Size', 'Speed', 'Speed/MHz']:
             rval = resvals[rtype]
+            if not rval:
+                lines.append(
+                    f'|  {rtype}\n'
+                    '|  align="right" | -\n'
+                    '|  align="center" | -\n'
+                    '|-\n'
+                )
+                continue
 
-            self.__readme.writelines(f'|  {rtype}\n')
-            self.__readme.writelines(f'|  align="right" | '
-                                     f'{rval.geomean():.2f}\n')
-            self.__readme.writelines(f'|  align="center" | '
-                                     f'{rval.range_lo():.2f}'
-                                     f'- {rval.range_hi():.2f}\n')
-            self.__readme.writelines(f'|-\n')
+            lines.append(
+                f'|  {rtype}\n'
+                f'|  align="right" | {rval.geomean():.2f}\n'
+                f'|  align="center" | {rval.range_lo():.2f}'
+                f'- {rval.range_hi():.2f}\n'
+                f'|-\n'
+            )
 
-    def __wiki_tblftr(self):
+        return ''.join(lines)
+
+    def __wiki_tblrows(self, results):
+        """
+        Private method to generate the rows of wiki table data for each of
+        the supplied list of results, rendering only those not already in
+        the cache.
+        """
+        cache = self.__rows
+        rows = []
+        for res in results:
+            row = cache.get(res)
+            if row is None:
+                row = self.__render_tblrow(res)
+                cache[res] = row
+            rows.append(row)
+
+        return rows
+
+    @staticmethod
+    def __wiki_tblftr():
         """
-        Private method to write out the standard wiki footer.
+        Private method to generate the standard wiki footer.
         """
         # Footer
-        self.__readme.writelines('|}\n')
+        return '|}\n'
 
     def write_header(self):
         """
         Copy the fixed pre-header into the README.
         """
-        for line in self.__readme_hdr:
-            self.__readme.writelines(line)
+        if self.__header is None:
+            self.__header = self.__readme_hdr.read()
+
+        self.__readme.write(self.__header)
+
+    def close(self):
+        """
+        Close the README, which ensures all of it has been written out.
+        """
+        self.__readme.close()
+
+    def reopen(self, readme):
+        """
+        Start writing the README afresh to the supplied handle, once the
+        previous README has been closed.
+        """
+        self.__readme = readme
 
     @staticmethod
     def __write_general_details(fileh, json_data):
@@ -103,18 +206,18 @@ class Readme:
         """
         # Page title is the description
         desc = json_data.pop('description')
-        fileh.writelines(f'== {desc} ==\n\n')
+        fileh.write(f'== {desc} ==\n\n')
 
         # Table for the info
-        fileh.writelines('{| class="wikitable sortable"\n')
+        fileh.write('{| class="wikitable sortable"\n')
 
         fields = ['Embench version', 'architecture family', 'date/time',]
         for field in fields:
             val = json_data.pop(field, '')
-            fileh.writelines(f'|- align="left"\n')
-            fileh.writelines(f'| {field} || {val}\n')
+            fileh.write(f'|- align="left"\n')
+            fileh.write(f'| {field} || {val}\n')
 
-        fileh.writelines('|}\n\n')
+        fileh.write('|}\n\n')
 
     @staticmethod
     def __write_platform_info(fileh, json_data):
@@ -125,16 +228,16 @@ class Readme:
         """
         # Section title is the description
         pinfo = json_data.pop('platform information')
-        fileh.writelines('== Platform information ==\n\n')
+        fileh.write('== Platform information ==\n\n')
 
         # Table for the info
-        fileh.writelines('{| class="wikitable sortable"\n')
+        fileh.write('{| class="wikitable sortable"\n')
 
         for field, val in pinfo.items():
-            fileh.writelines(f'|- align="left"\n')
-            fileh.writelines(f'| {field} || {val}\n')
+            fileh.write(f'|- align="left"\n')
+            fileh.write(f'| {field} || {val}\n')
 
-        fileh.writelines('|}\n\n')
+        fileh.write('|}\n\n')
 
     @staticmethod
     def __write_tool_chain_info(fileh, json_data):
@@ -146,27 +249,27 @@ class Readme:
         """
         # Main section title
         tcinfo = json_data.pop('tool chain information')
-        fileh.writelines('== Tool chain information ==\n\n')
+        fileh.write('== Tool chain information ==\n\n')
 
         # Section for tool chain version
         tcvinfo = tcinfo.pop('tool chain version')
-        fileh.writelines('=== Tool chain versions ===\n\n')
+        fileh.write('=== Tool chain versions ===\n\n')
 
         # Table for the tool chain version info
-        fileh.writelines('{| class="wikitable sortable"\n')
+        fileh.write('{| class="wikitable sortable"\n')
 
         for field, val in tcvinfo.items():
-            fileh.writelines(f'|- align="left"\n')
-            fileh.writelines(f'| {field} || {val}\n')
+            fileh.write(f'|- align="left"\n')
+            fileh.write(f'| {field} || {val}\n')
 
-        fileh.writelines('|}\n\n')
+        fileh.write('|}\n\n')
 
         # Section for tool chain flags
         tcfinfo = tcinfo.pop('tool chain flags')
-        fileh.writelines('=== Tool chain flags used in benchmarking ===\n\n')
+        fileh.write('=== Tool chain flags used in benchmarking ===\n\n')
 
         # Table for the tool chain flags info
-        fileh.writelines('{| class="wikitable sortable"\n')
+        fileh.write('{| class="wikitable sortable"\n')
 
         for field, val in tcfinfo.items():
             # Flag values are a list of flags
@@ -176,23 +279,23 @@ class Readme:
                     flagstr = f'{flagstr} {flag}'
                 else:
                     flagstr = f'{flag}'
-            fileh.writelines(f'|- align="left"\n')
-            fileh.writelines(f'| {field} || {flagstr}\n')
+            fileh.write(f'|- align="left"\n')
+            fileh.write(f'| {field} || {flagstr}\n')
 
-        fileh.writelines('|}\n\n')
+        fileh.write('|}\n\n')
 
         # Section for any other tool chain info
         if tcinfo:
-            fileh.writelines('=== Other tool chain information ===\n\n')
+            fileh.write('=== Other tool chain information ===\n\n')
 
             # Table for the other tool chain info
-            fileh.writelines('{| class="wikitable sortable"\n')
+            fileh.write('{| class="wikitable sortable"\n')
 
             for field, val in tcinfo.items():
-                fileh.writelines(f'|- align="left"\n')
-                fileh.writelines(f'| {field} || {val}\n')
+                fileh.write(f'|- align="left"\n')
+                fileh.write(f'| {field} || {val}\n')
 
-            fileh.writelines('|}\n\n')
+            fileh.write('|}\n\n')
 
     @staticmethod
     def __write_detailed_results(fileh, json_data):
@@ -200,7 +303,7 @@ class Readme:
         Static method to write out detailed results.
         """
         # Section title
-        fileh.writelines('== Detailed Embench results ==\n\n')
+        fileh.write('== Detailed Embench results ==\n\n')
 
         # What section types are included in size data
         sectypes = json_data.pop('sections in size results', None)
@@ -213,7 +316,7 @@ class Readme:
                     secstr = f'{secstr} {sec}'
                 else:
                     secstr = f'{sec}'
-            fileh.writelines(f'Section types included in size data: {secstr}\n')
+            fileh.write(f'Section types included in size data: {secstr}\n')
 
         # Collate data, so we can tabulate. This is a dictionary keyed by the
         # benchmark name. The values are themselves 4 element dictionaries,
@@ -235,43 +338,43 @@ class Readme:
                 results[benchmark][restype] = val
 
         # Put the results in a table
-        fileh.writelines('{| class="wikitable sortable"\n')
-        fileh.writelines('! align="left"  |\n')
-        fileh.writelines('! colspan="2" align="center" | Size\n')
-        fileh.writelines('! colspan="2" align="center" | Speed/MHz\n')
-        fileh.writelines('|- align="left"\n')
-        fileh.writelines('! align="left" | Benchmark\n')
-        fileh.writelines('! align="right"  | Absolute\n')
-        fileh.writelines('! align="right" | Relative\n')
-        fileh.writelines('! align="right"  | Absolute\n')
-        fileh.writelines('! align="right" | Relative\n')
+        fileh.write('{| class="wikitable sortable"\n')
+        fileh.write('! align="left"  |\n')
+        fileh.write('! colspan="2" align="center" | Size\n')
+        fileh.write('! colspan="2" align="center" | Speed/MHz\n')
+        fileh.write('|- align="left"\n')
+        fileh.write('! align="left" | Benchmark\n')
+        fileh.write('! align="right"  | Absolute\n')
+        fileh.write('! align="right" | Relative\n')
+        fileh.write('! align="right"  | Absolute\n')
+        fileh.write('! align="right" | Relative\n')
 
         for benchmark, res in results.items():
-            fileh.writelines(f'|- align="left"\n')
-            fileh.writelines(f'| {benchmark}\n')
+            fileh.write(f'|- align="left"\n')
+            fileh.write(f'| {benchmark}\n')
             for restype in ['abs_size', 'rel_size', 'abs_speed', 'rel_speed']:
                 # Absolute values are large, relative small.
                 if restype in ['abs_size', 'abs_speed']:
-                    fileh.writelines(f'| align="right" | {res[restype]:,}\n')
+                    fileh.write(f'| align="right" | {res[restype]:,}\n')
                 else:
-                    fileh.writelines(f'| align="right" | {res[restype]:,.2f}\n')
+                    fileh.write(f'| align="right" | {res[restype]:,.2f}\n')
 
         # Geometric mean and SD
-        fileh.writelines(f'|- align="left"\n')
-        fileh.writelines(f'! Geometric mean\n')
+        fileh.write(f'|- align="left"\n')
+        fileh.write(f'! Geometric mean\n')
         for restype in ['rel_size', 'rel_speed']:
             geomean = all_res[restype].pop('geometric mean')
-            fileh.writelines(f'!\n')
-            fileh.writelines(f'! align="right" | {geomean:,.2f}\n')
+            fileh.write(f'!\n')
+            fileh.write(f'! align="right" | {geomean:,.2f}\n')
 
-        fileh.writelines(f'|- align="left"\n')
-        fileh.writelines(f'! Geometric standard deviation\n')
+        fileh.write(f'|- align="left"\n')
+        fileh.write(f'! Geometric standard deviation\n')
         for restype in ['rel_size', 'rel_speed']:
             geosd = all_res[restype].pop('geometric standard deviation')
-            fileh.writelines(f'!\n')
-            fileh.writelines(f'! align="right" | {geosd:,.2f}\n')
+            fileh.write(f'!\n')
+            fileh.write(f'! align="right" | {geosd:,.2f}\n')
 
-        fileh.writelines('|}\n\n')
+        fileh.write('|}\n\n')
 
     @staticmethod
     def __write_other(fileh, json_data, hdr_intro, title):
@@ -286,7 +389,7 @@ class Readme:
             return
 
         # Have something, give it a title
-        fileh.writelines(f'{hdr_intro} {title} {hdr_intro}\n\n')
+        fileh.write(f'{hdr_intro} {title} {hdr_intro}\n\n')
 
         # Deal with scalar values first.
         scalar_vals = dict()
@@ -296,11 +399,11 @@ class Readme:
 
         # Write out a table of scalar values
         if scalar_vals:
-            fileh.writelines('{| class="wikitable sortable"\n')
+            fileh.write('{| class="wikitable sortable"\n')
             for key, val in scalar_vals.items():
-                fileh.writelines(f'|- align="left"\n')
-                fileh.writelines(f'| {key} || {val}\n')
-            fileh.writelines('|}\n\n')
+                fileh.write(f'|- align="left"\n')
+                fileh.write(f'| {key} || {val}\n')
+            fileh.write('|}\n\n')
 
 
         # Now write any dictionaries in their own subsections.
@@ -310,47 +413,228 @@ class Readme:
                     fileh, val, hdr_intro + '=', key
                 )
 
-    def __write_details(self, details):
+    def __render_details(self, details):
         """
-        Write out a file with all the details for a set of results.
+        Render all the details for a set of results as a string.
 
-        Raises OSError if there is a problem opening the file. We work with a
-        copy of the details, from which we delete elements as they are
-        printed. This allows us to print any remaining general information at
-        the end, thus allowing arbitary information to be recorded.
+        We work with a copy of the details, from which we delete elements as
+        they are printed. This allows us to print any remaining general
+        information at the end, thus allowing arbitary information to be
+        recorded.
         """
-        fileh = open(
-            os.path.join(self.__absdetailsdir, details.details_page()), 'w'
-        )
+        fileh = io.StringIO()
         json_data = details.json_data_copy()
         self.__write_general_details(fileh, json_data)
         self.__write_platform_info(fileh, json_data)
         self.__write_tool_chain_info(fileh, json_data)
         self.__write_detailed_results(fileh, json_data)
         self.__write_other(fileh, json_data, '==', 'Other information')
-        fileh.close()
+        return fileh.getvalue()
 
-    def write_all_details(self, result_set):
+    def __write_details(self, details, skip_identical=False):
         """
-        Write out all the details files for the supplied set of results
+        Write out a file with all the details for a set of results.
+
+        If skip_identical is set, an existing file is left untouched if its
+        contents would not change, so its modification time is preserved.
+
+        Raises OSError if there is a problem opening the file.
         """
-        for res in result_set.results():
-            self.__write_details(res.details())
+        pagefile = os.path.join(self.__absdetailsdir, details.details_page())
+        page = self.__render_details(details)
+
+        if skip_identical:
+            try:
+                with open(pagefile, 'r') as fileh:
+                    if fileh.read() == page:
+                        return
+            except OSError:
+                pass
+
+        with BufferedWriter(pagefile, self.__atomic) as fileh:
+            fileh.write(page)
+
+    def __read_manifest(self):
+        """
+        Read the manifest of details pages from a previous incremental run.
+        This is a dictionary keyed by page name, whose values are the source
+        file and its fingerprint. If there is no usable manifest, or it was
+        created by a different version of the renderer, then we return an
+        empty dictionary, so everything is regenerated.
+        """
+        manifest_file = os.path.join(self.__absdetailsdir, self.MANIFEST)
+        try:
+            with open(manifest_file, 'r') as fileh:
+                manifest = json.load(fileh)
+        except (OSError, ValueError):
+            return dict()
+
+        if ((not isinstance(manifest, dict))
+                or (manifest.get('renderer version') !=
+                    self.RENDERER_VERSION)):
+            return dict()
+
+        return manifest.get('pages', dict())
+
+    def __write_manifest(self, pages):
+        """
+        Write out the manifest of details pages. We write to a temporary file
+        and rename, so an interrupted run never leaves a truncated manifest.
+        """
+        manifest_file = os.path.join(self.__absdetailsdir, self.MANIFEST)
+        tmpfile = f'{manifest_file}.tmp{os.getpid()}'
+        manifest = {
+            'renderer version': self.RENDERER_VERSION,
+            'pages': pages,
+        }
+        with open(tmpfile, 'w') as fileh:
+            json.dump(manifest, fileh, indent=1, sort_keys=True)
+        os.replace(tmpfile, manifest_file)
 
-    def write_table(self, title, result_set):
+    def __write_pages(self, details_list, skip_identical, jobs):
+        """
+        Write out the details page for each of the supplied list of
+        ResultDetails, as for __write_details. If jobs is more than 1, pages
+        are rendered and written by that many threads, so the time spent
+        opening and closing files is overlapped. The pages written are the
+        same either way. The details are read a batch at a time, so only one
+        batch need be held in memory at once.
+
+        A failure to write one page does not stop the others being written.
+        Returns a list of (page, exception) tuples for the pages which could
+        not be written, in the order of details_list.
+        """
+        def write(details):
+            try:
+                self.__write_details(details, skip_identical)
+            except (OSError, KeyError, ValueError, TypeError,
+                    AttributeError) as ex:
+                # A results file may be valid, yet not have everything a
+                # details page needs.
+                return ex
+
+            return None
+
+        loaded = ResultDetails.loaded(details_list)
+        try:
+            if jobs > 1 and len(details_list) > 1:
+                # The pool takes all its work at once, so give it a batch at
+                # a time.
+                errors = []
+                with ThreadPoolExecutor(max_workers=jobs) as pool:
+                    while True:
+                        batch = list(islice(loaded,
+                                            ResultSet.MEMBER_BATCH * jobs))
+                        if not batch:
+                            break
+                        errors.extend(pool.map(write, batch))
+            else:
+                errors = [write(details) for details in loaded]
+        finally:
+            loaded.close()
+
+        return [(details.details_page(), ex)
+                for details, ex in zip(details_list, errors) if ex]
+
+    def write_all_details(self, result_set, incremental=False, jobs=1,
+                          content_hash=False):
+        """
+        Write out all the details files for the supplied set of results,
+        using up to jobs threads.
+
+        If incremental is set, a manifest of the source file fingerprints is
+        kept in the details directory, and a page is only regenerated if its
+        source file has changed, the page is missing or the renderer has
+        changed. Source files are fingerprinted as by ResultCache, by a
+        digest of their contents if content_hash is set. Pages whose source
+        file no longer exists are deleted. A result combining repeated runs
+        has no source file, so is fingerprinted by its contents.
+
+        Returns a list of (page, exception) tuples for any pages which could
+        not be written. These are left out of the manifest, so they are
+        tried again next time.
+        """
+        if not incremental:
+            return self.__write_pages(
+                [res.details() for res in result_set.results()], False, jobs
+            )
+
+        old_pages = self.__read_manifest()
+        new_pages = dict()
+        to_write = []
+        failures = []
+
+        for res in result_set.results():
+            details = res.details()
+            page = details.details_page()
+            resfile = details.resfile()
+            try:
+                if is_aggregate(resfile):
+                    fingerprint = list(data_fingerprint(details.data()))
+                else:
+                    fingerprint = list(
+                        file_fingerprint(resfile, content_hash)
+                    )
+            except OSError as osex:
+                failures.append((page, osex))
+                continue
+
+            entry = {'source': resfile, 'fingerprint': fingerprint}
+            new_pages[page] = entry
+
+            if ((old_pages.get(page) != entry)
+                    or not os.path.isfile(
+                        os.path.join(self.__absdetailsdir, page))):
+                to_write.append(details)
+
+        failures.extend(self.__write_pages(to_write, True, jobs))
+        failed = set()
+        for page, _ in failures:
+            new_pages.pop(page, None)
+            failed.add(page)
+
+        # Carry forward pages not in this run, unless their source has gone,
+        # in which case the page goes too.
+        for page, entry in old_pages.items():
+            if page in new_pages or page in failed:
+                continue
+
+            if path_exists(entry['source']):
+                new_pages[page] = entry
+            else:
+                try:
+                    os.remove(os.path.join(self.__absdetailsdir, page))
+                except FileNotFoundError:
+                    pass
+
+        self.__write_manifest(new_pages)
+        return failures
+
+    def write_table(self, title, result_set, order=None):
         """
         Given a list of results generate them as a mediawiki table, preceded
-        by the supplied level 3 title
+        by the supplied level 3 title.
+
+        If order is supplied, it is a permutation of the results (as from
+        ResultSet.rankings), giving the order of the rows in the table.
+        Otherwise the results are tabulated in their current order.
         """
-        # The title, preceded and followed by a blank line
-        self.__readme.writelines(f'\n=== {title} ===\n\n')
+        # The table is built up as a list of strings, and written out in one
+        # go. The title is preceded and followed by a blank line.
+        table = [f'\n=== {title} ===\n\n']
 
         # The wiki table header
-        self.__wiki_tblhdr()
+        table.append(self.__wiki_tblhdr())
 
         # The wiki table body - one row for each entry
-        for res in result_set.results():
-            self.__wiki_tblrow(res)
+        results = result_set.results()
+        if order is None:
+            order = range(len(results))
+
+        rows = self.__wiki_tblrows(results)
+        table.extend(rows[idx] for idx in order)
 
         # The wiki table footer
-        self.__wiki_tblftr()
+        table.append(self.__wiki_tblftr())
+
+        self.__readme.write(''.join(table))
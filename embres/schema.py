@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+
+# Module to validate results as part of the embres package
+
+# Copyright (C) 2020 Embecosm Limited
+#
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Module to validate the JSON data of results, and report on those which are
+not valid.
+
+- Schema: the fields a result must have, compiled once into a list of
+  checks, each of a whole object at a time.
+
+- ValidationReport: an aggregated report of the files which could not be
+  used, with the number of files missing each field, so that the log stays
+  readable however many files are bad.
+"""
+
+# System packages
+import json
+from json.decoder import JSONDecodeError
+
+
+class Schema:
+    """
+    A class to check the JSON data of a result has all the fields needed
+    """
+    # Fields which a result must have. Each value is None if any value
+    # will do, 'number' for a number, or a dictionary for an object, giving
+    # the fields it in turn must have.
+    REQUIRED = {
+        'description': None,
+        'architecture family': None,
+        'Embench version': None,
+        'platform information': {
+            'nominal clock rate (MHz)': 'number',
+            'max clock rate (MHz)': None,
+            'isa': None,
+            'address size (bits)': None,
+            'processor version': None,
+            'number of enabled cores': None,
+            'hardware threads per core': None,
+            'caches': None,
+            'thermal design power': None,
+            'program memory size (kB)': None,
+            'data memory size (kB)': None,
+            'storage': None,
+            'external memory': None,
+            'external buses': None,
+            'misc accellerators and I/O devices': None,
+            'OS and version': None,
+        },
+        'tool chain information': {
+            'tool chain version': {},
+            'tool chain flags': {},
+        },
+    }
+
+    # Fields which a result need not have, but which must be as described
+    # if it does.
+    OPTIONAL = {
+        'absolute size results': {
+            'detailed results': {},
+        },
+        'relative size results': {
+            'detailed results': {},
+            'geometric mean': 'number',
+            'geometric standard deviation': 'number',
+        },
+        'absolute speed results': {
+            'detailed results': {},
+        },
+        'relative speed results': {
+            'detailed results': {},
+            'geometric mean': 'number',
+            'geometric standard deviation': 'number',
+        },
+    }
+
+    # The object whose missing fields are reported separately
+    PLATFORM = 'platform information'
+
+    def __init__(self):
+        """
+        Compile the schema into a list of checks, one for each object, each
+        after the check of the object containing it.
+        """
+        self.__checks = []
+        self.__compile(None, None, self.REQUIRED, self.OPTIONAL)
+
+    def __compile(self, parent, field, required, optional):
+        """
+        Add the checks for an object and for any objects nested in it. The
+        object is the field of that name in the object checked by the check
+        with index parent, or the top level object if parent is None.
+
+        Each check is a tuple of the parent and field, the tuple of fields
+        which must be present, the tuple of fields which must be numbers if
+        present, the tuple of fields which must be objects if present and
+        the prefix for the names of fields reported.
+        """
+        fields = dict(required)
+        fields.update(optional)
+        if parent is None:
+            prefix = ''
+        elif field == self.PLATFORM:
+            # Reported separately, without a prefix
+            prefix = None
+        else:
+            prefix = (self.__checks[parent][5] or '') + f'{field}: '
+
+        index = len(self.__checks)
+        self.__checks.append((
+            parent,
+            field,
+            tuple(required),
+            tuple(name for name, kind in fields.items() if kind == 'number'),
+            tuple(name for name, kind in fields.items()
+                  if isinstance(kind, dict)),
+            prefix,
+        ))
+
+        # Objects with no fields of their own need no check.
+        for name, kind in fields.items():
+            if isinstance(kind, dict) and kind:
+                self.__compile(index, name, kind, {})
+
+    def check(self, json_data):
+        """
+        Check the supplied JSON data. Returns a tuple of a set of fields
+        missing or of the wrong kind, and a set of such fields of the
+        platform information. Both are empty if the data is valid. Nested
+        fields are named by their path, separated by colons.
+        """
+        missing_fields = set()
+        missing_pfields = set()
+        if not isinstance(json_data, dict):
+            missing_fields.add('result (not an object)')
+            return missing_fields, missing_pfields
+
+        # The object checked by each check so far, None if it is missing or
+        # not an object, which has already been reported.
+        objects = []
+        for parent, field, required, numbers, subobjects, prefix in (
+                self.__checks
+        ):
+            if parent is None:
+                obj = json_data
+            else:
+                obj = objects[parent]
+                if obj is not None:
+                    obj = obj.get(field)
+                    if not isinstance(obj, dict):
+                        obj = None
+            objects.append(obj)
+            if obj is None:
+                continue
+
+            bad = [name for name in required if name not in obj]
+            for name in numbers:
+                if name in obj:
+                    val = obj[name]
+                    if (isinstance(val, bool) or
+                            not isinstance(val, (int, float))):
+                        bad.append(f'{name} (not a number)')
+            for name in subobjects:
+                if name in obj and not isinstance(obj[name], dict):
+                    bad.append(f'{name} (not an object)')
+
+            if bad:
+                if prefix is None:
+                    missing_pfields.update(bad)
+                else:
+                    missing_fields.update(prefix + name for name in bad)
+
+        return missing_fields, missing_pfields
+
+
+class ValidationReport:
+    """
+    A class to collect the problems with many results files into a single
+    report.
+    """
+    # How many offending files to name in the log summary. All of them are
+    # named in the log file and the machine readable report.
+    SHOW_FILES = 10
+
+    def __init__(self):
+        """
+        Start with nothing checked.
+        """
+        self.__checked = 0
+
+        # Message for each file with invalid JSON
+        self.__invalid_json = dict()
+
+        # Sorted list of missing fields for each file missing fields
+        self.__missing = dict()
+
+    @staticmethod
+    def problem(ex):
+        """
+        Describe the problem with a file, given the JSONDecodeError or
+        InvalidResultError raised reading it, as plain data which can be
+        passed between processes.
+
+        The description is a tuple of 'json' and the message for invalid
+        JSON, or 'fields' and a sorted list of the missing fields, with
+        platform information fields named by their path.
+        """
+        if isinstance(ex, JSONDecodeError):
+            return ('json', f'line {ex.lineno}, column {ex.colno}: {ex.msg}')
+
+        fields = list(ex.missing_fields)
+        fields.extend(f'{Schema.PLATFORM}: {field}'
+                      for field in ex.missing_platform_fields)
+        return ('fields', sorted(fields))
+
+    def add(self, resf, problem=None):
+        """
+        Record that the supplied file has been checked, and its problem (as
+        from the problem method) if it was not valid.
+        """
+        self.__checked += 1
+        if problem:
+            kind, details = problem
+            if kind == 'json':
+                self.__invalid_json[resf] = details
+            else:
+                self.__missing[resf] = details
+
+    def failures(self):
+        """
+        The number of files which were not valid.
+        """
+        return len(self.__invalid_json) + len(self.__missing)
+
+    def __field_counts(self):
+        """
+        Return a list of (field, number of files missing it, or with it not
+        valid) tuples, most often missing first.
+        """
+        counts = dict()
+        for fields in self.__missing.values():
+            for field in fields:
+                counts[field] = counts.get(field, 0) + 1
+
+        return sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+
+    def report(self, log, json_file=None):
+        """
+        Report the files which were not valid to the log, and as JSON to
+        json_file if supplied. The detail of each file goes only to the log
+        file, while the console just gets a summary.
+
+        Raises OSError if the JSON file cannot be written.
+        """
+        for resf, msg in self.__invalid_json.items():
+            log.debug(f'{resf}: Invalid JSON data at {msg}')
+        for resf, fields in self.__missing.items():
+            for field in fields:
+                log.debug(f'{resf}: Missing JSON field {field}')
+
+        failures = self.failures()
+        if failures:
+            log.warning(f'Warning: {failures} of {self.__checked} results ' +
+                        f'files are not valid and have been ignored')
+            if self.__invalid_json:
+                log.warning(
+                    f'  {len(self.__invalid_json):6} with invalid JSON'
+                )
+            counts = self.__field_counts()
+            if counts:
+                log.warning('Fields missing or not valid:')
+            for field, count in counts:
+                log.warning(f'  {count:6} {field}')
+
+            files = sorted(list(self.__invalid_json) + list(self.__missing))
+            log.warning('Files ignored:')
+            for resf in files[:self.SHOW_FILES]:
+                log.warning(f'  {resf}')
+            if len(files) > self.SHOW_FILES:
+                log.warning(f'  ... and {len(files) - self.SHOW_FILES} ' +
+                            f'more (see log file)')
+
+        if json_file:
+            summary = {
+                'files checked': self.__checked,
+                'files ignored': failures,
+                'missing fields': dict(self.__field_counts()),
+                'invalid JSON': dict(sorted(self.__invalid_json.items())),
+                'files missing fields': dict(sorted(self.__missing.items())),
+            }
+            with open(json_file, 'w') as fileh:
+                json.dump(summary, fileh, indent=1)
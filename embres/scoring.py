@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+
+# Module to compute Embench scores as part of the embres package
+
+# Copyright (C) 2020 Embecosm Limited
+#
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Module to compute Embench scores from the detailed results.
+
+Each result file carries the per benchmark results as well as the geometric
+mean and geometric standard deviation computed from them. Here we gather the
+per benchmark results of a whole set of results into a (results x
+benchmarks) matrix of logarithms, from which the scores can be recomputed
+for all the results in one pass. This lets us check the scores in the files,
+and rescore every result against a different reference platform without
+reading any file again. The values of other fields can be gathered at the
+same time, for example to group results by configuration (see
+embres.aggregate).
+
+The geometric standard deviation is computed from the population standard
+deviation of the logarithms, as the Embench scripts do.
+"""
+
+# System packages
+from array import array
+import json
+import math
+
+# Local packages
+from embres.data import Result, ResultDetails
+
+
+class ScoreMatrix:
+    """
+    A class holding the per benchmark results for a set of results
+    """
+    # The blocks of detailed results we hold, with the name of the score
+    # they contribute to.
+    BLOCKS = {
+        'absolute size results': 'Size',
+        'relative size results': 'Size',
+        'absolute speed results': 'Speed/MHz',
+        'relative speed results': 'Speed/MHz',
+    }
+
+    def __init__(self, result_set, fields=None):
+        """
+        Read the detailed results for every result in the supplied ResultSet
+        in one pass. This is the only time the JSON data is read.
+
+        Each block of results is held as a list of rows, one per result, of
+        the logarithms of the values for each benchmark. A missing or non
+        positive value is held as NaN.
+
+        If fields is supplied, it is a list of fields of the JSON data, each
+        a list of the names of the fields leading to it, whose values are
+        gathered for each result too (see values).
+        """
+        self.__results = list(result_set.results())
+
+        # Gather the data, noting every benchmark seen.
+        raw = {block: [] for block in self.BLOCKS}
+        benchmarks = set()
+        self.__values = []
+        for details in ResultDetails.loaded(
+                res.details() for res in self.__results
+        ):
+            json_data = details.json_data()
+            for block, rows in raw.items():
+                data = json_data.get(block, {}).get('detailed results', {})
+                rows.append(data)
+                benchmarks.update(data)
+
+            if fields:
+                self.__values.append(tuple(self.__value(json_data, path)
+                                           for path in fields))
+
+        self.__benchmarks = sorted(benchmarks)
+
+        # Now build the matrices
+        self.__logs = dict()
+        for block, rows in raw.items():
+            self.__logs[block] = [
+                array('d', [self.__log(data.get(bench))
+                            for bench in self.__benchmarks])
+                for data in rows
+            ]
+
+    @staticmethod
+    def __log(val):
+        """
+        Logarithm of a value, or NaN if there is no sensible logarithm.
+        """
+        if isinstance(val, (int, float)) and val > 0:
+            return math.log(val)
+
+        return math.nan
+
+    @staticmethod
+    def __value(json_data, path):
+        """
+        The value of the field of the JSON data at the end of the supplied
+        list of field names, as JSON text so that values can be compared
+        whatever their type, or None if there is no such field.
+        """
+        val = json_data
+        for field in path:
+            if not (isinstance(val, dict) and field in val):
+                return None
+
+            val = val[field]
+
+        return json.dumps(val, sort_keys=True)
+
+    @staticmethod
+    def geo_stats(logs):
+        """
+        Compute the geometric mean and geometric standard deviation from a
+        sequence of logarithms, ignoring NaNs. Returns None if there are no
+        values at all.
+        """
+        vals = [val for val in logs if not math.isnan(val)]
+        if not vals:
+            return None
+
+        mean = math.fsum(vals) / len(vals)
+        var = math.fsum((val - mean) ** 2 for val in vals) / len(vals)
+        return (math.exp(mean), math.exp(math.sqrt(var)))
+
+    def benchmarks(self):
+        """
+        Accessor for the sorted list of all benchmark names, which are the
+        columns of the matrix.
+        """
+        return self.__benchmarks
+
+    def results(self):
+        """
+        Accessor for the list of results, which are the rows of the matrix.
+        """
+        return self.__results
+
+    def logs(self, block):
+        """
+        Accessor for the rows of logarithms of the values of the named block
+        of detailed results, one row per result, with a column for each
+        benchmark.
+        """
+        return self.__logs[block]
+
+    def values(self):
+        """
+        Accessor for the values of the fields gathered, as a list with a
+        tuple for each result. Each value is JSON text, or None if the result
+        does not have the field.
+        """
+        return self.__values
+
+    def index(self, name):
+        """
+        Return the row of the result whose details page, or results file
+        name without its suffix, is the supplied name. Raises KeyError if
+        there is no such result.
+        """
+        for idx, res in enumerate(self.__results):
+            page = res.details_page()
+            if name in (page, page[:-len('.mediawiki')]):
+                return idx
+
+        raise KeyError(name)
+
+    def recompute(self):
+        """
+        Recompute the Size and Speed/MHz scores of every result from its
+        relative detailed results.
+
+        Returns a dictionary keyed by score name, with a list of
+        (geometric mean, geometric standard deviation) tuples, one per
+        result (None if the result has no values).
+        """
+        return {
+            score: [self.geo_stats(row) for row in self.__logs[block]]
+            for block, score in self.BLOCKS.items()
+            if block.startswith('relative')
+        }
+
+    def check(self, tolerance=0.01):
+        """
+        Compare the scores recorded in each result with those recomputed
+        from its detailed results. Since the detailed results are usually
+        rounded, we allow the supplied relative tolerance.
+
+        Returns a list of (result, score name, recorded, recomputed)
+        tuples, where recorded and recomputed are (geometric mean, geometric
+        standard deviation) tuples, for every score that disagrees.
+        """
+        disagree = []
+        for score, stats in self.recompute().items():
+            for res, computed in zip(self.__results, stats):
+                recorded = res.scores()[score]
+                if not (recorded and computed):
+                    continue
+
+                recorded = (recorded.geomean(), recorded.geosd())
+                if any(abs(rec - comp) > tolerance * abs(rec)
+                       for rec, comp in zip(recorded, computed)):
+                    disagree.append((res, score, recorded, computed))
+
+        return disagree
+
+    def rebase(self, ref):
+        """
+        Compute the Size and Speed/MHz scores of every result relative to
+        the absolute results of the result in row ref, rather than the
+        Embench reference platform. Only benchmarks for which both have
+        results contribute.
+
+        Relative size is the absolute size divided by that of the
+        reference. Relative speed is the absolute time of the reference
+        divided by the absolute time. Since we hold logarithms, these are
+        just differences.
+
+        Returns a dictionary as for recompute.
+        """
+        rebased = dict()
+        for block, score, sign in [
+                ('absolute size results', 'Size', 1.0),
+                ('absolute speed results', 'Speed/MHz', -1.0),
+        ]:
+            rows = self.__logs[block]
+            reflogs = rows[ref]
+            rebased[score] = [
+                self.geo_stats([sign * (val - refval)
+                                  for val, refval in zip(row, reflogs)])
+                for row in rows
+            ]
+
+        return rebased
+
+    def rescored_results(self, ref):
+        """
+        Return a new list of results, whose scores are relative to the
+        result in row ref, as computed by rebase. The new results share the
+        details of the originals, so no file is read.
+
+        A result with no benchmarks in common with the reference for a score
+        has no such score in the new result, rather than keeping a score
+        relative to something else.
+        """
+        rebased = self.rebase(ref)
+        results = []
+        for idx, res in enumerate(self.__results):
+            (desc, arch, version, mhz, _, _, date_time) = res.summary()
+            size = rebased['Size'][idx]
+            speed = rebased['Speed/MHz'][idx]
+            results.append(
+                Result(res.details().resfile(),
+                       (desc, arch, version, mhz, size, speed, date_time),
+                       res.details().data())
+            )
+
+        return results
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+
+# Module to summarize a corpus of results as part of the embres package
+
+# Copyright (C) 2020 Embecosm Limited
+#
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Module to hold a summary of the scores of a corpus of results, from which
+the rank of a new result is found without reading the corpus.
+
+The summary is a columnar store (see embres.ColumnarExport), with a table
+for each score holding two columns of the scores of every result which has
+that score.
+
+- all: the scores, sorted from lowest to highest.
+
+- by_arch: the scores, sorted by architecture family, and then from lowest
+  to highest.
+
+The manifest of the store also records the number of results, and for each
+table, the rows of each architecture family in its by_arch column. Since
+the columns are memory mapped and sorted, a rank is found by a binary
+search, which reads a handful of pages of each column, however large the
+corpus.
+
+Ranks are as in the README, where the best result comes first. A result
+equal to one in the corpus ranks alongside it.
+"""
+
+# System packages
+from array import array
+import bisect
+import json
+import os
+
+# Local packages
+from embres.export import ColumnarExport, ColumnStore
+
+
+class CorpusSummary:
+    """
+    A class to write and read the summary of a corpus of results
+    """
+    # For each score, the table holding it, and whether larger is better.
+    SCORES = {
+        'Size': ('size', False),
+        'Speed': ('speed', True),
+        'Speed/MHz': ('speed_mhz', True),
+    }
+
+    def __init__(self, summarydir):
+        """
+        Use the summary in the supplied absolute directory, which need not
+        exist until the summary is written.
+        """
+        self.__summarydir = summarydir
+
+        # Summary of the corpus, the store and the columns of the store
+        # used so far, read when first needed
+        self.__summary = None
+        self.__store = None
+        self.__columns = dict()
+
+    def write(self, result_set):
+        """
+        Write out the summary of all the results in the supplied ResultSet,
+        replacing any summary there already. Only the summary of each result
+        is needed, so no results file is read.
+
+        Raises OSError if the summary cannot be written.
+        """
+        os.makedirs(self.__summarydir, exist_ok=True)
+
+        manifest = {'version': ColumnarExport.VERSION, 'tables': dict()}
+        archs = dict()
+        for score, (table, _) in self.SCORES.items():
+            scored = sorted(
+                (str(res.arch()), res.scores()[score].geomean())
+                for res in result_set.results() if res.scores()[score]
+            )
+
+            ranges = dict()
+            for row, (arch, _) in enumerate(scored):
+                ranges.setdefault(arch, [row, row])[1] = row + 1
+
+            tabledir = os.path.join(self.__summarydir, table)
+            os.makedirs(tabledir, exist_ok=True)
+            coltypes = dict()
+            for col, data in [
+                    ('all', array('d', sorted(val for _, val in scored))),
+                    ('by_arch', array('d', (val for _, val in scored))),
+            ]:
+                coltypes[col] = ColumnarExport.write_npy(
+                    os.path.join(tabledir, f'{col}.npy'), data
+                )
+
+            manifest['tables'][table] = {'rows': len(scored),
+                                         'columns': coltypes}
+            archs[table] = ranges
+
+        manifest['summary'] = {
+            'results': len(result_set.results()),
+            'archs': archs,
+        }
+
+        # The manifest goes last, to say the summary is complete
+        manifest_file = os.path.join(self.__summarydir, 'columns.json')
+        tmpfile = f'{manifest_file}.tmp{os.getpid()}'
+        with open(tmpfile, 'w') as fileh:
+            json.dump(manifest, fileh, indent=1)
+        os.replace(tmpfile, manifest_file)
+
+    def __load(self):
+        """
+        Read the manifest of the summary, if not already read.
+
+        Raises OSError if there is no summary and ValueError if it is not
+        valid.
+        """
+        if self.__store is None:
+            store = ColumnStore(self.__summarydir)
+            manifest_file = os.path.join(self.__summarydir, 'columns.json')
+            with open(manifest_file) as fileh:
+                summary = json.load(fileh).get('summary')
+
+            if not (isinstance(summary, dict)
+                    and set(store.tables()) == {table for table, _
+                                                in self.SCORES.values()}):
+                raise ValueError(f'{self.__summarydir}: not a summary of ' +
+                                 f'results')
+
+            self.__store = store
+            self.__summary = summary
+
+    def __column(self, table, col):
+        """
+        The named column of the named table, mapped the first time it is
+        used.
+        """
+        if (table, col) not in self.__columns:
+            self.__columns[(table, col)] = self.__store.column(table, col)
+
+        return self.__columns[(table, col)]
+
+    def results(self):
+        """
+        The number of results summarized.
+
+        Raises OSError if there is no summary and ValueError if it is not
+        valid.
+        """
+        self.__load()
+        return self.__summary['results']
+
+    def rank(self, score, value, arch=None):
+        """
+        Rank the supplied value of the named score ('Size', 'Speed' or
+        'Speed/MHz') against all the results summarized with that score, or
+        if arch is supplied, against those of that architecture family.
+
+        The result is a tuple of the rank, the number of results it is
+        ranked against, and the percentage of them it is at least as good
+        as (None if there are none).
+
+        Raises OSError if there is no summary and ValueError if it is not
+        valid.
+        """
+        self.__load()
+        table, larger = self.SCORES[score]
+        if arch is None:
+            col = self.__column(table, 'all')
+            low, high = 0, len(col)
+        else:
+            col = self.__column(table, 'by_arch')
+            low, high = self.__summary['archs'][table].get(str(arch), (0, 0))
+
+        if larger:
+            better = high - bisect.bisect_right(col, value, low, high)
+        else:
+            better = bisect.bisect_left(col, value, low, high) - low
+
+        total = high - low
+        percentile = None
+        if total:
+            percentile = 100 * (total - better) / total
+
+        return better + 1, total, percentile
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+# Module to time the phases of processing as part of the embres package
+
+# Copyright (C) 2020 Embecosm Limited
+#
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Module to time the phases of processing results.
+
+The Profiler records the wall time of each named phase of a run, and the time
+taken to read each results file. At the end of the run it can report these,
+including percentiles of the per file times and the slowest files, to the
+log and as JSON. Optionally it also runs the Python profiler over the whole
+run, saving the statistics for pstats.
+"""
+
+# System packages. The Python profiler is slow to import, and only needed
+# when its statistics are saved, so it is imported where it is used.
+from contextlib import contextmanager
+import json
+import time
+
+
+class Profiler:
+    """
+    A class to time the phases of a run
+    """
+    # Percentiles of per file times to report
+    PERCENTILES = [50, 90, 99]
+
+    # Number of slowest files to report
+    SLOWEST = 10
+
+    def __init__(self, enabled=False, stats_file=None):
+        """
+        Start timing the run. Nothing is reported unless enabled is set. If
+        stats_file is supplied, the Python profiler is run until the report
+        is made, and its statistics saved to that file.
+        """
+        self.__enabled = enabled or bool(stats_file)
+        self.__stats_file = stats_file
+        self.__start = time.perf_counter()
+
+        # Phases in the order first seen, with their total time
+        self.__phases = dict()
+
+        # Pairs of file name and time to read it
+        self.__files = []
+
+        self.__cprofile = None
+        if stats_file:
+            import cProfile
+            self.__cprofile = cProfile.Profile()
+            self.__cprofile.enable()
+
+    def enabled(self):
+        """
+        Accessor for whether we are reporting.
+        """
+        return self.__enabled
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Context manager to time the named phase. Time for phases of the same
+        name accumulates.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.__phases[name] = (self.__phases.get(name, 0.0) +
+                                   time.perf_counter() - start)
+
+    def record_file(self, resf, seconds):
+        """
+        Record the time taken to read and validate a results file.
+        """
+        self.__files.append((resf, seconds))
+
+    def __summary(self):
+        """
+        Summarize everything recorded as a dictionary.
+        """
+        summary = {
+            'wall time': time.perf_counter() - self.__start,
+            'phases': dict(self.__phases),
+            'files': {'count': len(self.__files)},
+            'slowest files': [],
+        }
+
+        if self.__files:
+            times = sorted(secs for _, secs in self.__files)
+            for pct in self.PERCENTILES:
+                idx = min(len(times) - 1, (len(times) * pct) // 100)
+                summary['files'][f'p{pct}'] = times[idx]
+            summary['files']['max'] = times[-1]
+            summary['files']['mean'] = sum(times) / len(times)
+
+            slowest = sorted(self.__files, key=lambda rec: rec[1],
+                             reverse=True)
+            summary['slowest files'] = slowest[:self.SLOWEST]
+
+        return summary
+
+    def report(self, log, json_file=None):
+        """
+        Report everything recorded to the log, and as JSON to json_file if
+        supplied. The Python profiler, if running, is stopped and its
+        statistics saved. Does nothing if we are not enabled.
+
+        Raises OSError if a file cannot be written.
+        """
+        if not self.__enabled:
+            return
+
+        if self.__cprofile:
+            self.__cprofile.disable()
+            self.__cprofile.dump_stats(self.__stats_file)
+            self.__cprofile = None
+
+        summary = self.__summary()
+
+        log.info('')
+        log.info('Timing')
+        log.info('======')
+        log.info(f'{"Wall time":50} {summary["wall time"]:10.3f}s')
+        for name, secs in summary['phases'].items():
+            log.info(f'{name[:50]:50} {secs:10.3f}s')
+
+        files = summary['files']
+        if files['count']:
+            log.info('')
+            log.info(f'Per file times for {files["count"]} files read')
+            for stat in [f'p{pct}' for pct in self.PERCENTILES] + ['max']:
+                log.info(f'  {stat:6} {files[stat] * 1000:10.3f}ms')
+
+            log.info('Slowest files')
+            for resf, secs in summary['slowest files']:
+                log.info(f'  {secs * 1000:10.3f}ms {resf}')
+
+        if self.__stats_file:
+            log.info(f'Profile statistics written to {self.__stats_file}')
+
+        if json_file:
+            with open(json_file, 'w') as fileh:
+                json.dump(summary, fileh, indent=1)
+            log.info(f'Timing report written to {json_file}')
@@ -0,0 +1,516 @@
+#!/usr/bin/env python3
+
+# Module to hold the history of results as part of the embres package
+
+# Copyright (C) 2020 Embecosm Limited
+#
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Module to hold the history of each configuration in a SQLite database, and
+to detect regressions in it.
+
+A configuration is identified as for combining repeated runs (see
+embres.Aggregation), by its architecture family, processor version, nominal
+clock rate and tool chain versions and flags. Each run of a configuration
+is recorded with its date/time, its scores and the relative size and speed
+of each benchmark.
+
+Unlike the index of results (see embres.ResultIndex), the store is only
+ever appended to. A run stays in the history when its results file is
+removed, and a run already recorded, that is with the same configuration,
+date/time and details page, is not recorded again when its file changes.
+Each file is recorded with its fingerprint (see embres.utils.file_fingerprint),
+so only files which are new or have changed are read, and appending takes
+time in proportion to the number of new runs, not the length of the
+history. Results without a date/time have no place in the history, so are
+not recorded. The tables are
+
+- configs: one row per configuration, with the description of its latest
+  run.
+
+- runs: one row per run, with its metadata and scores.
+
+- samples: one row per benchmark per run, with the relative size and
+  speed. Missing values are NULL.
+
+- ingested: the files read, with their fingerprints.
+
+Runs are indexed by configuration and date/time, so the latest runs of a
+configuration are found without reading the rest of its history. Dates are
+compared as text, as they are when selecting results.
+
+A regression is a run whose score or value for a benchmark is worse than
+the runs before it, by more than chance would explain. The latest run of
+each configuration is compared with a rolling baseline of the runs
+preceding it. Values are compared as logarithms, so that a change is
+relative. The change is significant if it is more than a number of
+standard deviations of the baseline (allowing for the uncertainty of its
+mean, so the bound is that of a prediction interval for a new run), and
+more than a minimum change, so that noise in a very steady baseline is
+ignored.
+"""
+
+# System packages
+from concurrent.futures import ProcessPoolExecutor
+from json import dumps
+from json.decoder import JSONDecodeError
+import math
+import sqlite3
+
+# Local packages
+from embres.aggregate import Aggregation
+from embres.bundle import ResultBundle
+from embres.data import InvalidResultError, Result, ResultDetails
+from embres.schema import ValidationReport
+from embres.utils import file_fingerprint, is_bundle
+
+
+def _number(val):
+    """
+    A JSON value as a number, or None if it is not a number.
+    """
+    if isinstance(val, (int, float)) and not isinstance(val, bool):
+        return val
+
+    return None
+
+
+def _trend_record(resf, data=None):
+    """
+    Read and validate a single result file, or its contents as bytes if
+    data is supplied, extracting everything the store needs from it.
+
+    This is a module level function, so it can be run in a worker process.
+    Returns a tuple of the record (None if the file could not be used, or
+    the result has no date/time) and the problem with the file (as from
+    ValidationReport.problem, None if it is valid). The record is a
+    dictionary with the key of the configuration, the row for the runs
+    table, without its ids, and the rows for the samples table, without the
+    run id.
+    """
+    try:
+        json_data = ResultDetails(resf, data=data).json_data()
+        Result.validate(json_data)
+    except (JSONDecodeError, InvalidResultError) as ex:
+        return None, ValidationReport.problem(ex)
+
+    res = Result(resf, Result.summarize(json_data))
+    if not isinstance(res.date_time(), str):
+        return None, None
+
+    # The configuration, as the JSON text of its identifying fields
+    config = []
+    for field in Aggregation.IDENTITY:
+        val = json_data
+        for name in field.split(': '):
+            val = val.get(name) if isinstance(val, dict) else None
+        config.append(val)
+
+    scores = []
+    for score in ['Size', 'Speed/MHz']:
+        rval = res.scores()[score]
+        scores.append(rval.geomean() if rval else None)
+
+    sizes, speeds = [
+        json_data.get(block, {}).get('detailed results', {})
+        for block in ['relative size results', 'relative speed results']
+    ]
+    names = dict.fromkeys(list(sizes) + list(speeds))
+
+    record = {
+        'config': dumps(config, sort_keys=True),
+        'desc': res.desc() if isinstance(res.desc(), str) else None,
+        'runs': [
+            res.date_time(),
+            resf,
+            res.details_page(),
+            res.arch() if isinstance(res.arch(), str) else None,
+            (str(res.embench_version())
+             if res.embench_version() is not None else None),
+        ] + scores,
+        'samples': [
+            (name, _number(sizes.get(name)), _number(speeds.get(name)))
+            for name in names
+        ],
+    }
+
+    return record, None
+
+
+class TrendStore:
+    """
+    A class to record the history of results, and detect regressions in it
+    """
+    # Bump this whenever the layout of the database changes. Since the
+    # history cannot be recreated if results files have gone, a store of
+    # any other version is refused rather than rebuilt.
+    VERSION = 1
+
+    # The tables and indexes of the database.
+    SCHEMA = [
+        '''CREATE TABLE meta (
+             key TEXT PRIMARY KEY,
+             value
+           )''',
+        '''CREATE TABLE configs (
+             id INTEGER PRIMARY KEY,
+             key TEXT UNIQUE NOT NULL,
+             description TEXT
+           )''',
+        '''CREATE TABLE runs (
+             id INTEGER PRIMARY KEY,
+             config INTEGER NOT NULL REFERENCES configs(id),
+             date_time TEXT NOT NULL,
+             file TEXT NOT NULL,
+             details_page TEXT NOT NULL,
+             arch TEXT,
+             embench_version TEXT,
+             size_geomean REAL,
+             speed_mhz_geomean REAL,
+             UNIQUE (config, date_time, details_page)
+           )''',
+        '''CREATE TABLE samples (
+             run INTEGER NOT NULL REFERENCES runs(id),
+             benchmark TEXT NOT NULL,
+             rel_size REAL,
+             rel_speed REAL
+           )''',
+        '''CREATE TABLE ingested (
+             file TEXT PRIMARY KEY,
+             fingerprint TEXT NOT NULL
+           )''',
+        'CREATE INDEX runs_config_date ON runs(config, date_time, id)',
+        'CREATE INDEX samples_run ON samples(run)',
+    ]
+
+    # For each score, in the order of the columns holding it in the runs
+    # and samples tables, whether larger is better.
+    SCORES = {
+        'Size': False,
+        'Speed/MHz': True,
+    }
+
+    # The name given to a score in place of a benchmark
+    GEOMEAN = 'geometric mean'
+
+    def __init__(self, dbfile, log, content_hash=False):
+        """
+        Open the store in the supplied absolute file name, creating it if it
+        does not exist.
+
+        If content_hash is set, files are fingerprinted by a digest of their
+        contents rather than their modification time. If the store was
+        last updated using the other fingerprint, all files are read again
+        at the next update, but no run is recorded twice.
+
+        Raises sqlite3.Error if the database cannot be opened, or is not a
+        store this version can use.
+        """
+        self.__log = log
+        self.__content_hash = content_hash
+        self.__db = sqlite3.connect(dbfile)
+
+        version = self.__db.execute('PRAGMA user_version').fetchone()[0]
+        if version == 0:
+            self.__create()
+        elif version != self.VERSION:
+            self.__db.close()
+            raise sqlite3.DatabaseError(
+                f'trend store version {version} is not supported'
+            )
+
+        meta = dict(self.__db.execute('SELECT key, value FROM meta'))
+        if meta.get('content hash') != int(content_hash):
+            if meta:
+                log.debug(f'Trend store {dbfile} fingerprints files ' +
+                          f'differently: all files will be read again')
+            with self.__db:
+                self.__db.execute('DELETE FROM ingested')
+                self.__db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                                  ('content hash', int(content_hash)))
+
+    def __create(self):
+        """
+        Create all the tables and indexes of a new store.
+        """
+        with self.__db:
+            for stmt in self.SCHEMA:
+                self.__db.execute(stmt)
+            self.__db.execute(f'PRAGMA user_version = {self.VERSION}')
+
+    @staticmethod
+    def __read_files(filelist, jobs):
+        """
+        Generator yielding the (record, problem) tuple for each file in
+        filelist, in the order of filelist, using a pool of worker processes
+        if there is more than one job.
+        """
+        if jobs > 1 and len(filelist) > 1:
+            chunksize = max(1, len(filelist) // (jobs * 4))
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                yield from pool.map(_trend_record, filelist,
+                                    chunksize=chunksize)
+        else:
+            for resf in filelist:
+                yield _trend_record(resf)
+
+    def __append(self, record):
+        """
+        Append the supplied record to the history, unless its run is
+        already recorded.
+
+        Returns whether the run was appended.
+        """
+        self.__db.execute(
+            'INSERT OR IGNORE INTO configs VALUES (NULL, ?, ?)',
+            (record['config'], record['desc'])
+        )
+        config = self.__db.execute('SELECT id FROM configs WHERE key = ?',
+                                   (record['config'],)).fetchone()[0]
+
+        run = self.__db.execute(
+            'INSERT OR IGNORE INTO runs VALUES (NULL, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [config] + record['runs']
+        )
+        if not run.rowcount:
+            return False
+
+        self.__db.executemany(
+            'INSERT INTO samples VALUES (?, ?, ?, ?)',
+            [(run.lastrowid,) + row for row in record['samples']]
+        )
+
+        # The configuration is described by its latest run
+        self.__db.execute(
+            'UPDATE configs SET description = ? WHERE id = ? AND ? >= ' +
+            '(SELECT max(date_time) FROM runs WHERE config = ?)',
+            (record['desc'], config, record['runs'][0], config)
+        )
+        return True
+
+    def update(self, filelist, jobs=1, report=None):
+        """
+        Append the runs in the supplied list of absolute file names to the
+        history. Only files which are new or have changed since they were
+        last read are read, using that many worker processes if jobs is more
+        than 1. The update is a single transaction, so a store is never left
+        partly updated.
+
+        A bundle is read again in full if it changes, but only the runs not
+        already recorded are appended.
+
+        Files read which are not valid results are recorded in the supplied
+        ValidationReport. If none is supplied, they are logged as a single
+        report at the end.
+
+        Returns a tuple of the number of files read and the number of runs
+        appended.
+        """
+        own_report = report is None
+        if own_report:
+            report = ValidationReport()
+
+        known = dict(
+            self.__db.execute('SELECT file, fingerprint FROM ingested')
+        )
+
+        changed = []
+        bundles = []
+        for resf in filelist:
+            try:
+                fingerprint = dumps(
+                    file_fingerprint(resf, self.__content_hash)
+                )
+            except OSError as osex:
+                self.__log.warning(f'Warning: {resf}: {osex.strerror}: ' +
+                                   f'result file ignored.')
+                continue
+
+            if known.get(resf) != fingerprint:
+                if is_bundle(resf):
+                    bundles.append((resf, fingerprint))
+                else:
+                    changed.append((resf, fingerprint))
+
+        read = len(changed)
+        appended = 0
+        with self.__db:
+            records = self.__read_files([resf for resf, _ in changed], jobs)
+            for (resf, fingerprint), (record, problem) in zip(changed,
+                                                              records):
+                report.add(resf, problem)
+                if record:
+                    appended += self.__append(record)
+                self.__db.execute(
+                    'INSERT OR REPLACE INTO ingested VALUES (?, ?)',
+                    (resf, fingerprint)
+                )
+
+            for bundle, fingerprint in bundles:
+                try:
+                    for resf, data in ResultBundle(bundle).members():
+                        record, problem = _trend_record(resf, data)
+                        report.add(resf, problem)
+                        if record:
+                            appended += self.__append(record)
+                        read += 1
+                except OSError as osex:
+                    self.__log.warning(f'Warning: Unable to read results ' +
+                                       f'bundle {bundle}: {osex.strerror}: ' +
+                                       f'rest of bundle ignored')
+                    continue
+
+                self.__db.execute(
+                    'INSERT OR REPLACE INTO ingested VALUES (?, ?)',
+                    (bundle, fingerprint)
+                )
+
+        if own_report:
+            report.report(self.__log)
+
+        return read, appended
+
+    def __filter_conds(self, result_filter, conds, params):
+        """
+        Add the conditions and their parameters to select the runs selected
+        by the supplied ResultFilter to the lists supplied.
+        """
+        for column, vals in [('arch', result_filter.archs()),
+                             ('embench_version',
+                              result_filter.embench_versions())]:
+            if vals is not None:
+                conds.append(f'{column} IN ({", ".join("?" * len(vals))})')
+                params.extend(vals)
+
+        since = result_filter.since()
+        until = result_filter.until()
+        if since is not None or until is not None:
+            conds.append("date_time GLOB " +
+                         "'[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*'")
+            if since is not None:
+                conds.append('substr(date_time, 1, 10) >= ?')
+                params.append(since)
+            if until is not None:
+                conds.append('substr(date_time, 1, 10) <= ?')
+                params.append(until)
+
+    def runs(self):
+        """
+        The number of runs recorded.
+        """
+        return self.__db.execute('SELECT count(*) FROM runs').fetchone()[0]
+
+    @staticmethod
+    def __test(baseline, latest, sigma, min_change, larger):
+        """
+        Test whether the supplied latest value is a regression from the
+        supplied list of baseline values, ignoring any which are missing,
+        as described above. Larger values are better if larger is set.
+
+        Returns None if it is not, or a tuple of the geometric mean of the
+        baseline, the change as a percentage, and the number of standard
+        deviations it represents (None if the baseline does not vary).
+        """
+        logs = [math.log(val) for val in baseline if val and val > 0]
+        if not (logs and latest and latest > 0):
+            return None
+
+        mean = sum(logs) / len(logs)
+        diff = math.log(latest) - mean
+        if larger:
+            diff = -diff
+
+        if diff <= math.log1p(min_change / 100):
+            return None
+
+        devs = None
+        if min(logs) != max(logs):
+            var = sum((val - mean) ** 2 for val in logs) / (len(logs) - 1)
+            devs = diff / math.sqrt(var * (1 + 1 / len(logs)))
+            if devs < sigma:
+                return None
+
+        change = (latest / math.exp(mean) - 1) * 100
+        return math.exp(mean), change, devs
+
+    def regressions(self, window=10, min_runs=3, sigma=3.0, min_change=1.0,
+                    result_filter=None):
+        """
+        Compare the latest run of each configuration with a baseline of the
+        window runs preceding it, and find its regressions, optionally only
+        using runs selected by the supplied ResultFilter. A configuration
+        with fewer than min_runs runs in its baseline is not compared. A
+        regression must be more than sigma standard deviations, and more
+        than min_change percent, from the geometric mean of the baseline.
+
+        Only the latest runs of each configuration are read, however long
+        its history.
+
+        The result is a list of tuples of description, details page of the
+        latest run, its date/time, score, benchmark (GEOMEAN for the score
+        itself), geometric mean of the baseline, latest value, change as a
+        percentage and number of standard deviations (None if the baseline
+        does not vary), in order of description and then details page.
+        """
+        conds = ['config = ?']
+        params = []
+        if result_filter and result_filter.active():
+            self.__filter_conds(result_filter, conds, params)
+
+        regressions = []
+        for config, desc in self.__db.execute(
+                'SELECT id, description FROM configs').fetchall():
+            if result_filter and not result_filter.desc_matches(desc):
+                continue
+
+            runs = self.__db.execute(
+                f'SELECT id, details_page, date_time, size_geomean, ' +
+                f'speed_mhz_geomean FROM runs ' +
+                f'WHERE {" AND ".join(conds)} ' +
+                f'ORDER BY date_time DESC, id DESC LIMIT ?',
+                [config] + params + [window + 1]
+            ).fetchall()
+            if len(runs) <= min_runs:
+                continue
+
+            # Values of each benchmark in each run, latest run first
+            ids = [row[0] for row in runs]
+            values = dict()
+            for run, bench, rel_size, rel_speed in self.__db.execute(
+                    f'SELECT run, benchmark, rel_size, rel_speed ' +
+                    f'FROM samples WHERE run IN ' +
+                    f'({", ".join("?" * len(ids))})', ids):
+                values[(run, bench)] = (rel_size, rel_speed)
+
+            benches = sorted({bench for _, bench in values})
+            latest = runs[0]
+            for col, (score, larger) in enumerate(self.SCORES.items()):
+                series = [(self.GEOMEAN, [row[3 + col] for row in runs])]
+                series.extend(
+                    (bench, [values.get((run, bench), (None, None))[col]
+                             for run in ids])
+                    for bench in benches
+                )
+                for bench, vals in series:
+                    found = self.__test(vals[1:], vals[0], sigma, min_change,
+                                        larger)
+                    if found:
+                        base, change, devs = found
+                        regressions.append(
+                            (desc, latest[1], latest[2], score, bench, base,
+                             vals[0], change, devs)
+                        )
+
+        regressions.sort(key=lambda reg: (str(reg[0]), reg[1]))
+        return regressions
+
+    def close(self):
+        """
+        Close the database.
+        """
+        self.__db.close()
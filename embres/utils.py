@@ -13,12 +13,56 @@
 """
 Module with useful static functions
 
-For now just one function to check we have new enough Python
+- check_python_version: check we have new enough Python
+
+- file_fingerprint: a cheap identity for the contents of a file
+
+- is_archive: whether a file is an archive of results files
+
+- split_archive_path: the archive and member named by a path into an
+  archive
+
+- is_bundle: whether a file is a bundle of results in JSON Lines format
+
+- split_bundle_path: the bundle and line number named by a path into a
+  bundle
+
+- is_aggregate: whether a result combines repeated runs, so has no file of
+  its own
+
+- data_fingerprint: an identity for contents held in memory
+
+- record_members: record all the members of an archive or bundle, as it is
+  read
+
+- path_exists: whether a file, or member of an archive or bundle, exists
+
+A member of an archive is named as though the archive were a directory, for
+example results.tar.gz/nightly/result.json. Similarly the result on a line
+of a bundle is named as though it were a file named after the line number in
+a directory, for example nightly.jsonl/17. A result combining repeated runs
+is named after the first run, with a suffix no file of results has, for
+example results/nightly-run.aggregate.
 """
 
 # System packages
+from functools import lru_cache
+import os
 import sys
 
+# Suffixes of the archives results may be read from
+ARCHIVE_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.zip')
+
+# Suffix of bundles of results
+BUNDLE_SUFFIX = '.jsonl'
+
+# Suffix of results combining repeated runs
+AGGREGATE_SUFFIX = '.aggregate'
+
+# The members of each archive or bundle read in full, keyed by its file
+# name, with the fingerprint it had when read (see record_members).
+_MEMBERS = dict()
+
 
 def check_python_version(major, minor):
     """
@@ -31,3 +75,192 @@ def check_python_version(major, minor):
                 and (sys.version_info[1] < minor))):
         print(f'ERROR: Requires Python {major}.{minor} or later')
         sys.exit(1)
+
+
+def is_archive(path):
+    """
+    Whether the file name path is that of an archive of results files,
+    judging by its suffix.
+    """
+    return path.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def split_archive_path(path):
+    """
+    If path names a member of an existing archive, return a tuple of the
+    archive file name and the member name within the archive (with '/' as
+    the separator). Otherwise return (None, None).
+    """
+    start = 0
+    while True:
+        sep = path.find(os.sep, start + 1)
+        if sep < 0:
+            return None, None
+
+        archive = path[:sep]
+        if is_archive(archive) and os.path.isfile(archive):
+            return archive, path[sep + 1:].replace(os.sep, '/')
+
+        start = sep
+
+
+def is_bundle(path):
+    """
+    Whether the file name path is that of a bundle of results, judging by
+    its suffix.
+    """
+    return path.lower().endswith(BUNDLE_SUFFIX)
+
+
+def split_bundle_path(path):
+    """
+    If path names a line of a bundle, return a tuple of the bundle file name
+    and the line number. Otherwise return (None, None). This is judged by
+    the name alone, without checking the bundle exists.
+    """
+    bundle, name = os.path.split(path)
+    if is_bundle(bundle) and name.isdigit():
+        return bundle, int(name)
+
+    return None, None
+
+
+def is_aggregate(path):
+    """
+    Whether the file name path is that of a result combining repeated runs
+    (see embres.aggregate), which has no file of its own.
+    """
+    return path.endswith(AGGREGATE_SUFFIX)
+
+
+def _container(path):
+    """
+    The archive or bundle holding the member named by path, or None if it is
+    not a member of an existing archive or bundle.
+    """
+    archive, _ = split_archive_path(path)
+    if archive is not None:
+        return archive
+
+    bundle, _ = split_bundle_path(path)
+    if bundle is not None and os.path.isfile(bundle):
+        return bundle
+
+    return None
+
+
+def record_members(container, fingerprint, members):
+    """
+    Record the file names of all the members of the supplied archive or
+    bundle, just read in full, when it had the supplied fingerprint (as
+    from file_fingerprint). This is how path_exists knows which members
+    still exist, without reading the archive or bundle again.
+    """
+    _MEMBERS[container] = (fingerprint, frozenset(members))
+
+
+def path_exists(path):
+    """
+    Whether the file path exists. A result combining repeated runs never
+    exists, having no file of its own.
+
+    A member of an archive or bundle exists if it was there when the archive
+    or bundle was last read in full (see record_members), provided it has
+    not changed since. Otherwise it is taken to exist if the archive or
+    bundle does, since checking the member would mean reading the archive
+    or bundle.
+    """
+    if is_aggregate(path):
+        return False
+
+    if os.path.exists(path):
+        return True
+
+    container = _container(path)
+    if container is None:
+        return False
+
+    if container not in _MEMBERS:
+        return True
+
+    fingerprint, members = _MEMBERS[container]
+    try:
+        if file_fingerprint(container) != fingerprint:
+            return True
+    except OSError:
+        return False
+
+    return path in members
+
+
+def _digest(path):
+    """
+    Return the SHA-256 digest of the contents of the file at path.
+    """
+    # Only needed with --cache-hash, and slow to import.
+    import hashlib
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fileh:
+        for block in iter(lambda: fileh.read(1 << 20), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def data_fingerprint(data):
+    """
+    Return a fingerprint for the supplied contents as bytes, for a result
+    which has no file of its own. This is a tuple of the size and a SHA-256
+    digest of the contents, as from file_fingerprint with content_hash set.
+    """
+    # Only needed with --aggregate, and slow to import.
+    import hashlib
+    return (len(data), hashlib.sha256(data).hexdigest())
+
+
+@lru_cache(maxsize=16)
+def _container_digest(container, size, mtime_ns):
+    """
+    Return the SHA-256 digest of the contents of the archive or bundle,
+    which has the supplied size and modification time. These are just part
+    of the key, so that it is only hashed once for all its members, unless
+    it changes.
+    """
+    return _digest(container)
+
+
+def file_fingerprint(path, content_hash=False):
+    """
+    Return a fingerprint for the file at path, which will change if the file
+    changes.
+
+    By default this is the size and modification time of the file, which
+    only needs a stat. If content_hash is set, the modification time is
+    replaced by a SHA-256 digest of the contents, which is immune to files
+    being touched or checked out again, at the cost of reading the file.
+
+    A member of an archive or bundle has the fingerprint of the whole
+    archive or bundle, so it can be fingerprinted without reading it.
+
+    The fingerprint is a tuple, which can be compared for equality and
+    pickled. Raises OSError if the file cannot be accessed.
+    """
+    try:
+        statinfo = os.stat(path)
+    except OSError:
+        container = _container(path)
+        if container is None:
+            raise
+
+        statinfo = os.stat(container)
+        if not content_hash:
+            return (statinfo.st_size, statinfo.st_mtime_ns)
+
+        return (statinfo.st_size, _container_digest(
+            container, statinfo.st_size, statinfo.st_mtime_ns
+        ))
+
+    if not content_hash:
+        return (statinfo.st_size, statinfo.st_mtime_ns)
+
+    return (statinfo.st_size, _digest(path))
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+# Module to watch for changed results as part of the embres package
+
+# Copyright (C) 2020 Embecosm Limited
+#
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Module to watch for results files being added, changed or removed.
+
+The results are polled, which works on any file system, including network
+file systems where change notification is unreliable. Each poll is just a
+directory listing and a stat of each file (see embres.utils.file_fingerprint).
+Changes are batched: once a change is seen, we keep polling until there have
+been no further changes for a while, so a burst of many new files is
+reported as a single batch.
+"""
+
+# System packages
+import os
+import time
+
+# Local packages
+from embres.utils import file_fingerprint
+
+
+class ResultWatcher:
+    """
+    A class to watch a set of results files for changes
+    """
+    def __init__(self, resdir, resfiles=None, content_hash=False):
+        """
+        Start watching. If resfiles is supplied, it is a list of absolute
+        file names, and just those files are watched. Otherwise all files
+        with the suffix '.json' or '.jsonl' in the absolute directory resdir
+        are watched, including any added later. If resdir is a bundle, just
+        it is watched.
+
+        The state of the files now is the starting point, so this should be
+        created before the files are first read, to be sure no change is
+        missed. If content_hash is set, files are fingerprinted by a digest
+        of their contents rather than their modification time.
+        """
+        self.__resdir = resdir
+        self.__resfiles = resfiles
+        self.__content_hash = content_hash
+        self.__known = self.__scan()
+
+    def __scan(self):
+        """
+        Return a dictionary of the fingerprint of every file being watched,
+        keyed by its absolute file name.
+        """
+        if self.__resfiles:
+            filelist = self.__resfiles
+        elif os.path.isfile(self.__resdir):
+            filelist = [self.__resdir]
+        else:
+            try:
+                dirlist = os.listdir(self.__resdir)
+            except OSError:
+                dirlist = []
+
+            filelist = [os.path.join(self.__resdir, resf) for resf in dirlist
+                        if os.path.splitext(resf)[1] in ('.json', '.jsonl')]
+
+        fingerprints = dict()
+        for resf in filelist:
+            try:
+                if os.path.isfile(resf) and os.access(resf, os.R_OK):
+                    fingerprints[resf] = file_fingerprint(
+                        resf, self.__content_hash
+                    )
+            except OSError:
+                # Gone since the listing, so treat as removed.
+                pass
+
+        return fingerprints
+
+    def changes(self):
+        """
+        Poll for changes since the last poll. Returns a tuple of the list of
+        files added or changed and the list of files removed.
+        """
+        current = self.__scan()
+        changed = [resf for resf, fingerprint in current.items()
+                   if self.__known.get(resf) != fingerprint]
+        removed = [resf for resf in self.__known if resf not in current]
+        self.__known = current
+
+        return changed, removed
+
+    def wait(self, interval, debounce):
+        """
+        Poll every interval seconds until something changes, then carry on
+        polling until nothing has changed for debounce seconds. Returns a
+        tuple of the sorted list of files added or changed and the sorted
+        list of files removed over the whole batch.
+        """
+        # The state of each file with a change pending, True if it is
+        # present.
+        pending = dict()
+        last_change = None
+        while True:
+            time.sleep(interval)
+            changed, removed = self.changes()
+            if changed or removed:
+                pending.update((resf, True) for resf in changed)
+                pending.update((resf, False) for resf in removed)
+                last_change = time.monotonic()
+            elif (pending and
+                  (time.monotonic() - last_change >= debounce)):
+                break
+
+        return (sorted(resf for resf, present in pending.items()
+                       if present),
+                sorted(resf for resf, present in pending.items()
+                       if not present))
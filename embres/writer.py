@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+# Module to write out generated pages as part of the embres package
+
+# Copyright (C) 2020 Embecosm Limited
+#
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Module to write generated pages in large blocks.
+
+Pages are built up from many small pieces of text. Rather than write each
+piece to the file as it is generated, we collect them in memory and write
+them out in large blocks. Optionally the page is written to a temporary file
+in the same directory, which is renamed over the real file when it is
+closed, so a reader never sees a partly written page.
+"""
+
+# System packages
+import os
+
+
+class BufferedWriter:
+    """
+    A file like object, which buffers text in memory and writes it out in
+    large blocks.
+    """
+    def __init__(self, filename, atomic=False, bufsize=1 << 20):
+        """
+        Open the supplied file for writing. If atomic is set, we actually
+        open a temporary file alongside it, which replaces it on close.
+        Text is buffered until there is at least bufsize characters.
+
+        Raises OSError if the file cannot be opened.
+        """
+        self.__filename = filename
+        self.__bufsize = bufsize
+        self.__chunks = []
+        self.__size = 0
+        self.__tmpfile = None
+
+        if atomic:
+            # Only needed with --atomic, and slow to import.
+            import tempfile
+            dirname, basename = os.path.split(filename)
+            fdesc, self.__tmpfile = tempfile.mkstemp(
+                dir=dirname, prefix=f'.{basename}.', suffix='.tmp'
+            )
+            self.__fileh = os.fdopen(fdesc, 'w')
+        else:
+            self.__fileh = open(filename, 'w')
+
+    def write(self, text):
+        """
+        Add text to the buffer, writing the buffer out if it is full.
+        """
+        self.__chunks.append(text)
+        self.__size += len(text)
+        if self.__size >= self.__bufsize:
+            self.flush()
+
+    def writelines(self, lines):
+        """
+        Add each of an iterable of strings to the buffer. A single string is
+        treated as one line, rather than a sequence of characters.
+        """
+        if isinstance(lines, str):
+            self.write(lines)
+        else:
+            for line in lines:
+                self.write(line)
+
+    def flush(self):
+        """
+        Write out anything in the buffer as a single block.
+        """
+        if self.__chunks:
+            self.__fileh.write(''.join(self.__chunks))
+            self.__chunks = []
+            self.__size = 0
+
+    def close(self):
+        """
+        Write out anything remaining and close the file. If we are writing
+        atomically, this is when the real file is replaced.
+        """
+        if self.__fileh.closed:
+            return
+
+        self.flush()
+        self.__fileh.close()
+        if self.__tmpfile:
+            # mkstemp creates the file readable only by us.
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(self.__tmpfile, 0o666 & ~umask)
+            os.replace(self.__tmpfile, self.__filename)
+            self.__tmpfile = None
+
+    def discard(self):
+        """
+        Close the file without committing anything further. If we are writing
+        atomically, the original file is left untouched.
+        """
+        if self.__fileh.closed:
+            return
+
+        self.__chunks = []
+        self.__size = 0
+        self.__fileh.close()
+        if self.__tmpfile:
+            os.remove(self.__tmpfile)
+            self.__tmpfile = None
+
+    def __enter__(self):
+        """
+        Context manager entry, just returns the writer.
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Context manager exit. Commit the file, unless there was an exception.
+        """
+        if exc_type:
+            self.discard()
+        else:
+            self.close()
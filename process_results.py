@@ -15,6 +15,18 @@ Collate all Embench benchmark results
 
 Data are held in files in the results directory of the form
 <arch>-<description>.json.  Each defines a set of results in a JSON file.
+
+With --watch, the script keeps running, regenerating the README and any
+changed details pages whenever results files are added, changed or removed.
+
+With --aggregate, repeated runs of the same configuration are combined into
+a single result.
+
+With --top, each table only lists the best results, and only those are held
+in memory, so any number of results can be collated.
+
+With --summary, the scores of all the results are summarized, so that new
+results can be ranked against them by compare_results.py.
 """
 
 # System packages
@@ -23,6 +35,192 @@ import sys
 
 # Local packages
 import embres
+from embres.writer import BufferedWriter
+
+
+def rescore(log, reslist, arglist):
+    """
+    Recompute the scores of all the results from their detailed results.
+    Optionally check them against the scores in the results files, and
+    optionally replace them with scores against a different reference.
+    """
+    matrix = embres.ScoreMatrix(reslist)
+
+    if arglist['check_scores']:
+        for res, score, recorded, computed in matrix.check(
+                arglist['score_tolerance']
+        ):
+            log.warning(
+                f'Warning: {res.details().resfile()}: {score} score ' +
+                f'{recorded[0]} (SD {recorded[1]}) does not match ' +
+                f'{computed[0]:.4f} (SD {computed[1]:.4f}) computed from ' +
+                f'detailed results'
+            )
+
+    if arglist['reference']:
+        try:
+            ref = matrix.index(arglist['reference'])
+        except KeyError:
+            log.error(f'ERROR: Reference result {arglist["reference"]} ' +
+                      f'not found: exiting')
+            sys.exit(1)
+
+        rescored = matrix.rescored_results(ref)
+        for res, new in zip(reslist.results(), rescored):
+            for score in ['Size', 'Speed/MHz']:
+                if res.scores()[score] and not new.scores()[score]:
+                    log.warning(
+                        f'Warning: {res.details().resfile()}: no ' +
+                        f'benchmarks in common with reference for ' +
+                        f'{score} score: score dropped'
+                    )
+
+        reslist.replace_results(rescored)
+
+
+def generate(log, readme, reslist, arglist, profiler, perms=None):
+    """
+    Generate the README and details pages from the supplied set of results,
+    which is left unchanged. If perms is supplied, it is the ordering of the
+    results for each table, as from ResultSet.rankings, otherwise all the
+    results are ranked for each table.
+
+    The README is only opened once everything else is done, so any error
+    before then leaves it untouched. Raises OSError if it cannot be written.
+    """
+    # Combine repeated runs of the same configuration if asked. This
+    # replaces the results, so work on a new set.
+    if arglist['aggregate']:
+        with profiler.phase('Aggregate results'):
+            aggregation = embres.Aggregation(reslist, arglist['aggregate_by'])
+            reslist = embres.ResultSet.from_results(aggregation.results())
+
+        log.debug(f'{aggregation.configurations()} configurations')
+
+    # Recompute scores from the detailed results if needed. This replaces
+    # the results, so work on a copy of the set.
+    if arglist['check_scores'] or arglist['reference']:
+        with profiler.phase('Rescore results'):
+            reslist = embres.ResultSet.from_results(reslist.results())
+            rescore(log, reslist, arglist)
+
+    # Export all the results if needed
+    if arglist['absexportdir']:
+        try:
+            with profiler.phase('Export results'):
+                embres.ColumnarExport(arglist['absexportdir']).write(reslist)
+        except OSError as osex:
+            log.error(f'ERROR: Unable to export results: {osex}: exiting')
+            sys.exit(1)
+
+    # Summarize the scores of all the results if needed, for comparing new
+    # results with
+    if arglist['abssummarydir']:
+        try:
+            with profiler.phase('Summarize results'):
+                embres.CorpusSummary(arglist['abssummarydir']).write(reslist)
+        except OSError as osex:
+            log.error(f'ERROR: Unable to write summary: {osex}: exiting')
+            sys.exit(1)
+
+    # Create all the details files, unless we are only updating the tables.
+    # Only the details pages need the full JSON data for each result.
+    if not arglist['tables_only']:
+        with profiler.phase('Write details pages'):
+            failures = readme.write_all_details(
+                reslist, arglist['incremental'], arglist['details_jobs'],
+                arglist['cache_hash']
+            )
+
+        for page, ex in failures:
+            log.warning(f'Warning: Unable to write details page {page}: ' +
+                        f'{ex}')
+
+    # Header for the main README
+    readme.reopen(BufferedWriter(arglist['readme_file'], arglist['atomic']))
+    readme.write_header()
+
+    # Compute the orderings of all the tables in one go, if not already
+    # done, and write out each table
+    if perms is None:
+        with profiler.phase('Rank results'):
+            perms = reslist.rankings([table[1:] for table in readme.TABLES])
+
+    for (title, _, _, _), perm in zip(readme.TABLES, perms):
+        with profiler.phase(f'Write table: {title}'):
+            readme.write_table(title, reslist, perm)
+
+    # Make sure it is all written out
+    with profiler.phase('Close README'):
+        readme.close()
+
+
+def report_validation(log, validation, arglist):
+    """
+    Report any results files which were not valid, as JSON too if asked.
+    """
+    try:
+        validation.report(log, arglist['validation_report'])
+    except OSError as osex:
+        log.warning(f'Warning: Unable to write validation report: {osex}')
+
+
+def select_top(rootdir, log, arglist, cache, profiler, validation):
+    """
+    Read the results as a stream, keeping just the best for each table.
+    Returns the set of results kept and the ordering of the results for each
+    table.
+    """
+    top = embres.TopRankings(
+        [table[1:] for table in embres.Readme.TABLES], arglist['top']
+    )
+    with profiler.phase('Read results'):
+        for res in embres.ResultSet.stream(
+                rootdir, log, arglist['absresdir'], arglist['resfiles'],
+                arglist['jobs'], cache, profiler, arglist['result_filter'],
+                validation
+        ):
+            top.add(res)
+
+    with profiler.phase('Rank results'):
+        reslist, perms = top.result_set()
+
+    log.debug(f'{len(reslist.results())} of {top.added()} results listed')
+    return reslist, perms
+
+
+def watch(log, watcher, readme, reslist, arglist, cache):
+    """
+    Keep the README and details pages up to date as results files change,
+    until interrupted. Only the changed files are read again, and with
+    incremental details, only their pages are written again.
+    """
+    log.info('Watching for changed results files')
+    try:
+        while True:
+            changed, removed = watcher.wait(
+                arglist['poll_interval'], arglist['debounce']
+            )
+            log.info(f'{len(changed)} results files added or changed, ' +
+                     f'{len(removed)} removed: regenerating')
+            validation = embres.ValidationReport()
+            reslist.update(log, changed, removed, arglist['jobs'], cache,
+                           validation)
+            report_validation(log, validation, arglist)
+
+            if not reslist.results():
+                log.warning('Warning: No results found: README not ' +
+                            'regenerated')
+                continue
+
+            try:
+                generate(log, readme, reslist, arglist, embres.Profiler())
+            except OSError as osex:
+                log.warning(f'Warning: Unable to write ' +
+                            f'{arglist["readme_file"]}: {osex}: README not ' +
+                            f'regenerated')
+    except KeyboardInterrupt:
+        log.info('Stopped watching')
 
 
 def main():
@@ -36,70 +234,75 @@ def main():
     arglist = args.all_args(log)
     args.log_args(log)
 
-    # Read all the data
-    reslist = embres.ResultSet(
-        rootdir, log, arglist['absresdir'], arglist['resfiles']
-    )
+    # Time everything, although we only report if asked
+    profiler = embres.Profiler(arglist['profile'], arglist['profile_stats'])
+
+    # If we are going to watch for changes, start watching before we read
+    # anything, so no change is missed.
+    resfiles = arglist['resfiles']
+    watcher = None
+    if arglist['watch']:
+        if resfiles:
+            resfiles = embres.ResultSet.collate_files(
+                rootdir, log, arglist['absresdir'], resfiles
+            )
+        watcher = embres.ResultWatcher(
+            arglist['absresdir'], resfiles, arglist['cache_hash']
+        )
+
+    # Read all the data, using the cache of previously parsed results if we
+    # have one.
+    cache = None
+    if arglist['cachefile']:
+        cache = embres.ResultCache(
+            arglist['cachefile'], log, arglist['cache_hash']
+        )
 
-    # Create the new readme
+    validation = embres.ValidationReport()
+    perms = None
+    if arglist['top']:
+        reslist, perms = select_top(
+            rootdir, log, arglist, cache, profiler, validation
+        )
+    else:
+        reslist = embres.ResultSet(
+            rootdir, log, arglist['absresdir'], resfiles, arglist['jobs'],
+            cache, profiler, arglist['result_filter'], validation
+        )
+    report_validation(log, validation, arglist)
+
+    # Create the new readme, which opens the README itself when generated
     readme = embres.Readme(
         arglist['readme_hdr'],
-        arglist['readme'],
+        None,
         arglist['absdetailsdir'],
-        arglist['detailsdir']
+        arglist['detailsdir'],
+        arglist['atomic']
     )
 
-    # Create all the details files
-    if reslist:
-        readme.write_all_details(reslist)
-    else:
+    # Must have some results
+    if not reslist.results():
         log.error('ERROR: No results found')
         sys.exit(1)
 
-    # Header for the main README
-    readme.write_header()
-
-    # Results sorted by speed (large is good)
-    reslist.sort(
-        key=lambda rec: rec.scores()['Speed'].geomean(), reverse=True
-    )
-    readme.write_table('Results sorted by Embench speed score', reslist)
-
-    # Results sorted by speed/MHz (large is good)
-    reslist.sort(
-        key=lambda rec: rec.scores()['Speed/MHz'].geomean(), reverse=True
-    )
-    readme.write_table('Results sorted by Embench speed score/MHz', reslist)
-
-    # Results sorted by size (small is good)
-    reslist.sort(key=lambda rec: rec.scores()['Size'].geomean(), reverse=False)
-    readme.write_table('Results sorted by Embench size score', reslist)
-
-    # Per architecture results sorted by speed (large is good)
-    reslist.sort(key=lambda rec: rec.scores()['Speed'].geomean(), reverse=True)
-    reslist.sort(key=lambda rec: rec.arch(), reverse=False)
-    readme.write_table(
-        'Per architecture results sorted by Embench speed score', reslist
-    )
+    try:
+        generate(log, readme, reslist, arglist, profiler, perms)
+    except OSError as osex:
+        log.error(f'ERROR: Unable to write {arglist["readme_file"]}: ' +
+                  f'{osex}: exiting')
+        sys.exit(1)
 
-    # Per architecture results sorted by speed/MHz (large is good)
-    reslist.sort(
-        key=lambda rec: rec.scores()['Speed/MHz'].geomean(), reverse=True
-    )
-    reslist.sort(key=lambda rec: rec.arch(), reverse=False)
-    readme.write_table(
-        'Per architecture results sorted by Embench speed score/MHz', reslist
-    )
+    # Report timing if required
+    try:
+        profiler.report(log, arglist['profile_json'])
+    except OSError as osex:
+        log.warning(f'Warning: Unable to write timing report: {osex}')
 
-    # Per architecture results sorted by size (small is good)
-    reslist.sort(key=lambda rec: rec.scores()['Size'].geomean(), reverse=False)
-    reslist.sort(key=lambda rec: rec.arch(), reverse=False)
-    readme.write_table(
-        'Per achitecture results sorted by Embench size score', reslist
-    )
+    if watcher:
+        watch(log, watcher, readme, reslist, arglist, cache)
 
 
 # Make sure we have new enough Python and only run if this is the main package
-embres.check_python_version(3, 6)
+embres.check_python_version(3, 7)
 if __name__ == '__main__':
     sys.exit(main())
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+# Script to query an index of benchmark results
+
+# Copyright (C) 2020 Embecosm Limited
+#
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Query an index of all Embench benchmark results
+
+The index is a SQLite database (see embres.ResultIndex), which is brought up
+to date with the results directory before each query. Only results files
+which have changed since the last query are read, so once built, queries
+take milliseconds however many results there are. For example
+
+  ./query_results.py --score speed-mhz --top 20 --arch RV32 \\
+      --embench-version 0.5 --since 2020-01-01
+
+Arbitrary SQL queries can be made with --sql.
+"""
+
+# System packages
+import os.path
+import sqlite3
+import sys
+
+# Local packages
+import embres
+
+
+def main():
+    """
+    Main program to drive querying of results.
+    """
+    # Parse the arguments, set up logging and then validate the arguments
+    rootdir = os.path.abspath(os.path.dirname(__file__))
+    args = embres.Args(rootdir, 'query')
+    log = embres.Logger(args.abslogdir(), 'query')
+    arglist = args.all_args(log)
+    args.log_args(log)
+
+    try:
+        index = embres.ResultIndex(
+            arglist['indexfile'], log, arglist['cache_hash']
+        )
+
+        # Bring the index up to date
+        if arglist['update']:
+            filelist = embres.ResultSet.collate_files(
+                rootdir, log, arglist['absresdir'], arglist['resfiles']
+            )
+            validation = embres.ValidationReport()
+            # Only a scan of the whole results directory shows which files
+            # have gone.
+            read, removed = index.update(
+                filelist, arglist['jobs'], validation,
+                prune=not arglist['resfiles']
+            )
+            log.debug(f'Index updated: {read} files read, {removed} removed')
+            try:
+                validation.report(log, arglist['validation_report'])
+            except OSError as osex:
+                log.warning(f'Warning: Unable to write validation report: ' +
+                            f'{osex}')
+
+        if arglist['sql']:
+            headings, rows = index.execute(arglist['sql'])
+        else:
+            headings = ['Page', 'Description', 'Architecture', 'Version',
+                        'MHz', arglist['score']]
+            rows = index.top(
+                arglist['score'], arglist['top'], arglist['result_filter'],
+                arglist['benchmark']
+            )
+
+        index.close()
+    except sqlite3.Error as sqlex:
+        log.error(f'ERROR: {arglist["indexfile"]}: {sqlex}: exiting')
+        sys.exit(1)
+
+    log.table(headings, rows)
+
+
+# Make sure we have new enough Python and only run if this is the main package
+embres.check_python_version(3, 7)
+if __name__ == '__main__':
+    sys.exit(main())
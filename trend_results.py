@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+# Script to detect regressions in the history of benchmark results
+
+# Copyright (C) 2020 Embecosm Limited
+#
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+#
+# This file is part of Embench.
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+Detect regressions in the history of Embench benchmark results
+
+The history is a SQLite database (see embres.TrendStore), to which the runs
+in any results files which are new or have changed are appended before each
+check. The latest run of each configuration is then compared with the runs
+before it, so a nightly check takes the same time however long the history.
+For example
+
+  ./trend_results.py --window 10 --sigma 3 --min-change 2
+
+The exit status is 1 if there are any regressions.
+"""
+
+# System packages
+import os.path
+import sqlite3
+import sys
+
+# Local packages
+import embres
+
+
+def main():
+    """
+    Main program to drive detecting regressions.
+    """
+    # Parse the arguments, set up logging and then validate the arguments
+    rootdir = os.path.abspath(os.path.dirname(__file__))
+    args = embres.Args(rootdir, 'trend')
+    log = embres.Logger(args.abslogdir(), 'trend')
+    arglist = args.all_args(log)
+    args.log_args(log)
+
+    try:
+        store = embres.TrendStore(
+            arglist['storefile'], log, arglist['cache_hash']
+        )
+
+        # Append any new runs
+        if arglist['update']:
+            filelist = embres.ResultSet.collate_files(
+                rootdir, log, arglist['absresdir'], arglist['resfiles']
+            )
+            validation = embres.ValidationReport()
+            read, appended = store.update(
+                filelist, arglist['jobs'], validation
+            )
+            log.debug(f'Trend store updated: {read} files read, ' +
+                      f'{appended} runs appended')
+            try:
+                validation.report(log, arglist['validation_report'])
+            except OSError as osex:
+                log.warning(f'Warning: Unable to write validation report: ' +
+                            f'{osex}')
+
+        regressions = store.regressions(
+            arglist['window'], arglist['min_runs'], arglist['sigma'],
+            arglist['min_change'], arglist['result_filter']
+        )
+        log.debug(f'{store.runs()} runs in history')
+        store.close()
+    except sqlite3.Error as sqlex:
+        log.error(f'ERROR: {arglist["storefile"]}: {sqlex}: exiting')
+        sys.exit(1)
+
+    if not regressions:
+        log.info('No regressions')
+        return 0
+
+    log.table(
+        ['Description', 'Page', 'Date/time', 'Score', 'Benchmark',
+         'Baseline', 'Latest', 'Change %', 'SDs'],
+        [row[:5] + (f'{row[5]:.2f}', f'{row[6]:.2f}', f'{row[7]:+.1f}',
+                    None if row[8] is None else f'{row[8]:.1f}')
+         for row in regressions]
+    )
+    return 1
+
+
+# Make sure we have new enough Python and only run if this is the main package
+embres.check_python_version(3, 7)
+if __name__ == '__main__':
+    sys.exit(main())